@@ -0,0 +1,61 @@
+"""
+Offline batch analysis, for packs no one is waiting on (e.g. a whole
+auction catalogue the day before).
+
+    python -m app.batch lots/*.zip
+    python -m app.batch lots/                # every .pdf and .zip in it
+
+Ingests the packs in parallel, sends their prompts through the Anthropic
+Message Batches and OpenAI Batch APIs at batch prices, polls until the
+batches end (up to BATCH_MAX_WAIT_HOURS) and saves every Analysis row in
+one transaction. Prints one JSON line per pack and exits 1 if any failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import List
+from app.database import init_db
+from app.services.batch import analyze_batch
+from app.services.http_clients import provider_clients
+from app.services.pool import shutdown_process_pool
+
+PACK_EXTENSIONS = (".pdf", ".zip")
+
+def pack_paths(args: List[str]) -> List[str]:
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            paths.extend(sorted(
+                os.path.join(arg, name) for name in os.listdir(arg) if name.lower().endswith(PACK_EXTENSIONS)
+            ))
+        else:
+            paths.append(arg)
+    return paths
+
+async def run(paths: List[str]) -> List[dict]:
+    provider_clients.start()
+    try:
+        return await analyze_batch(paths)
+    finally:
+        await provider_clients.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Analyse many packs at batch prices.")
+    parser.add_argument("packs", nargs="+", help="PDF or ZIP packs, or directories of them")
+    paths = pack_paths(parser.parse_args().packs)
+    if not paths:
+        parser.error("no .pdf or .zip packs found")
+
+    init_db()
+    try:
+        outcomes = asyncio.run(run(paths))
+    finally:
+        shutdown_process_pool()
+    for outcome in outcomes:
+        print(json.dumps({key: outcome[key] for key in ("path", "route", "analysis_id", "cost_usd", "error")}))
+    sys.exit(1 if any(outcome["error"] for outcome in outcomes) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,31 @@
+import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+_pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_pre_ping": True,
+}
+
+def _async_url(url: str):
+    """The same database through psycopg 3, which has a native asyncio driver."""
+    return make_url(url).set(drivername="postgresql+psycopg")
+
+# Sync engine: Alembic, the job workers' claim loop and the cache backends
+# that run inside the ingestion process pool
+engine = create_engine(settings.DATABASE_URL, **_pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: request handlers and the analysis pipeline
+async_engine = create_async_engine(_async_url(settings.DATABASE_URL), **_pool_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -12,6 +33,14 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
-    from app.models.analysis import Base
-    Base.metadata.create_all(bind=engine)
+    """Bring the schema up to date with the Alembic migrations."""
+    from alembic import command
+    from alembic.config import Config
+    cfg = Config()
+    cfg.set_main_option("script_location", os.path.join(os.path.dirname(__file__), "migrations"))
+    command.upgrade(cfg, "head")
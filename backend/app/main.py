@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import analyze
-from app.database import init_db
+from app.database import init_db, async_engine
+from app.services.pool import get_process_pool, shutdown_process_pool
+from app.services.http_clients import provider_clients
+from app.services.prompts import check_prompt_budget
+from app.services.rag import KNOWLEDGE_BASE
+from app.services.response_cache import purge_stale_responses
+from app.services.metrics import render_metrics
+from app.utils.log import log_event
 
 app = FastAPI(title="PKH Legal Brain API", version="1.0.0")
 
@@ -16,11 +23,28 @@ app.add_middleware(
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
+    check_prompt_budget(KNOWLEDGE_BASE)
     init_db()
-    print("✅ Database initialized")
+    log_event("database_initialized")
+    # Reports generated under an older NICK_SYSTEM must not be served
+    purge_stale_responses()
+    get_process_pool()
+    log_event("process_pool_started")
+    provider_clients.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await provider_clients.aclose()
+    await async_engine.dispose()
+    shutdown_process_pool()
 
 app.include_router(analyze.router, prefix="/analyze", tags=["analyze"])
 
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
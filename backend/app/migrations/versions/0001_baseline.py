@@ -0,0 +1,63 @@
+"""Baseline schema: analyses and extraction_cache
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+
+Databases created before migrations existed already have these tables
+(via Base.metadata.create_all), so each table is only created if missing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "analyses" not in existing:
+        op.create_table(
+            "analyses",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("filename", sa.String(255), nullable=False),
+            sa.Column("file_size_bytes", sa.BigInteger(), nullable=False),
+            sa.Column("property_address", sa.String(500)),
+            sa.Column("anthropic_input_tokens", sa.Integer()),
+            sa.Column("anthropic_output_tokens", sa.Integer()),
+            sa.Column("openai_input_tokens", sa.Integer()),
+            sa.Column("openai_output_tokens", sa.Integer()),
+            sa.Column("anthropic_cost_usd", sa.Numeric(10, 6)),
+            sa.Column("openai_cost_usd", sa.Numeric(10, 6)),
+            sa.Column("total_cost_usd", sa.Numeric(10, 6)),
+            sa.Column("summary_text", sa.Text()),
+        )
+        op.create_index("ix_analyses_id", "analyses", ["id"])
+        op.create_index("ix_analyses_created_at", "analyses", ["created_at"])
+        op.create_index("ix_analyses_property_address", "analyses", ["property_address"])
+
+    if "extraction_cache" not in existing:
+        op.create_table(
+            "extraction_cache",
+            sa.Column("cache_key", sa.String(100), primary_key=True),
+            sa.Column("pages", sa.JSON(), nullable=False),
+            sa.Column("size_bytes", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("last_used_at", sa.DateTime()),
+        )
+        op.create_index("ix_extraction_cache_last_used_at", "extraction_cache", ["last_used_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("extraction_cache")
+    op.drop_table("analyses")
@@ -0,0 +1,49 @@
+"""LLM response cache table and cache-savings columns on analyses
+
+Revision ID: 0002_response_cache
+Revises: 0001_baseline
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_response_cache"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "llm_response_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("provider", sa.String(20), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("system_hash", sa.String(64), nullable=False),
+        sa.Column("report_text", sa.Text(), nullable=False),
+        sa.Column("usage", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_llm_response_cache_system_hash", "llm_response_cache", ["system_hash"])
+    op.create_index("ix_llm_response_cache_expires_at", "llm_response_cache", ["expires_at"])
+
+    op.add_column("analyses", sa.Column("cache_hit", sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column("analyses", sa.Column("saved_input_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("saved_output_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("saved_cost_usd", sa.Numeric(10, 6), server_default="0"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("analyses", "saved_cost_usd")
+    op.drop_column("analyses", "saved_output_tokens")
+    op.drop_column("analyses", "saved_input_tokens")
+    op.drop_column("analyses", "cache_hit")
+    op.drop_table("llm_response_cache")
@@ -0,0 +1,49 @@
+"""Background analysis job queue
+
+Revision ID: 0003_analysis_jobs
+Revises: 0002_response_cache
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_analysis_jobs"
+down_revision: Union[str, Sequence[str], None] = "0002_response_cache"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("stage", sa.String(40)),
+        sa.Column("upload_sha256", sa.String(64), nullable=False),
+        sa.Column("upload_path", sa.String(500), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("file_size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text()),
+        sa.Column("analysis_id", sa.Integer(), sa.ForeignKey("analyses.id")),
+        sa.Column("run_after", sa.DateTime(), nullable=False),
+        sa.Column("locked_at", sa.DateTime()),
+        sa.Column("locked_by", sa.String(100)),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_analysis_jobs_id", "analysis_jobs", ["id"])
+    op.create_index("ix_analysis_jobs_status", "analysis_jobs", ["status"])
+    op.create_index("ix_analysis_jobs_upload_sha256", "analysis_jobs", ["upload_sha256"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("analysis_jobs")
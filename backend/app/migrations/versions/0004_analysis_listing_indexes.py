@@ -0,0 +1,36 @@
+"""Indexes for keyset listing and address-prefix search on analyses
+
+Revision ID: 0004_analysis_listing_indexes
+Revises: 0003_analysis_jobs
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_analysis_listing_indexes"
+down_revision: Union[str, Sequence[str], None] = "0003_analysis_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination orders and seeks on (created_at, id)
+    op.create_index("ix_analyses_created_at_id", "analyses", ["created_at", "id"])
+    # Case-insensitive prefix match: lower(property_address) LIKE 'abc%'
+    op.create_index(
+        "ix_analyses_property_address_prefix",
+        "analyses",
+        [sa.text("lower(property_address) text_pattern_ops")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_analyses_property_address_prefix", table_name="analyses")
+    op.drop_index("ix_analyses_created_at_id", table_name="analyses")
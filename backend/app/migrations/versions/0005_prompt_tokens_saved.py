@@ -0,0 +1,28 @@
+"""Prompt token savings column on analyses
+
+Revision ID: 0005_prompt_tokens_saved
+Revises: 0004_analysis_listing_indexes
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_prompt_tokens_saved"
+down_revision: Union[str, Sequence[str], None] = "0004_analysis_listing_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("analyses", sa.Column("prompt_tokens_saved", sa.Integer(), server_default="0"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("analyses", "prompt_tokens_saved")
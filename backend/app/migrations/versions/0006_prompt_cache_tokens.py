@@ -0,0 +1,32 @@
+"""Provider prompt-cache token columns on analyses
+
+Revision ID: 0006_prompt_cache_tokens
+Revises: 0005_prompt_tokens_saved
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_prompt_cache_tokens"
+down_revision: Union[str, Sequence[str], None] = "0005_prompt_tokens_saved"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("analyses", sa.Column("anthropic_cache_read_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("anthropic_cache_write_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("openai_cache_read_tokens", sa.Integer(), server_default="0"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("analyses", "openai_cache_read_tokens")
+    op.drop_column("analyses", "anthropic_cache_write_tokens")
+    op.drop_column("analyses", "anthropic_cache_read_tokens")
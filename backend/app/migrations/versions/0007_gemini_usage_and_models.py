@@ -0,0 +1,51 @@
+"""Gemini usage and cost, per-provider model and page count on analyses
+
+Revision ID: 0007_gemini_usage_and_models
+Revises: 0006_prompt_cache_tokens
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_gemini_usage_and_models"
+down_revision: Union[str, Sequence[str], None] = "0006_prompt_cache_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("analyses", sa.Column("page_count", sa.Integer(), nullable=True))
+    op.add_column("analyses", sa.Column("anthropic_model", sa.String(100), nullable=True))
+    op.add_column("analyses", sa.Column("openai_model", sa.String(100), nullable=True))
+    op.add_column("analyses", sa.Column("gemini_model", sa.String(100), nullable=True))
+    op.add_column("analyses", sa.Column("gemini_input_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("gemini_output_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("gemini_cache_read_tokens", sa.Integer(), server_default="0"))
+    op.add_column("analyses", sa.Column("gemini_cost_usd", sa.Numeric(10, 6), server_default="0"))
+    # Input token columns now exclude cached tokens for every provider
+    op.execute(
+        "UPDATE analyses SET openai_input_tokens = openai_input_tokens - openai_cache_read_tokens "
+        "WHERE openai_cache_read_tokens > 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE analyses SET openai_input_tokens = openai_input_tokens + openai_cache_read_tokens "
+        "WHERE openai_cache_read_tokens > 0"
+    )
+    op.drop_column("analyses", "gemini_cost_usd")
+    op.drop_column("analyses", "gemini_cache_read_tokens")
+    op.drop_column("analyses", "gemini_output_tokens")
+    op.drop_column("analyses", "gemini_input_tokens")
+    op.drop_column("analyses", "gemini_model")
+    op.drop_column("analyses", "openai_model")
+    op.drop_column("analyses", "anthropic_model")
+    op.drop_column("analyses", "page_count")
@@ -0,0 +1,44 @@
+"""At most one queued, running or succeeded job per upload
+
+Revision ID: 0008_unique_live_job_upload
+Revises: 0007_gemini_usage_and_models
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_unique_live_job_upload"
+down_revision: Union[str, Sequence[str], None] = "0007_gemini_usage_and_models"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Duplicates left by concurrent uploads: enqueue_job returned the newest,
+    # so the older ones are failed as superseded
+    op.execute(
+        "UPDATE analysis_jobs AS old SET status = 'failed', locked_at = NULL, "
+        "error = 'Superseded by job ' || newer.id "
+        "FROM analysis_jobs AS newer "
+        "WHERE newer.upload_sha256 = old.upload_sha256 AND newer.id > old.id "
+        "AND old.status IN ('queued', 'running', 'succeeded') "
+        "AND newer.status IN ('queued', 'running', 'succeeded')"
+    )
+    op.create_index(
+        "uq_analysis_jobs_live_upload",
+        "analysis_jobs",
+        ["upload_sha256"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running', 'succeeded')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_analysis_jobs_live_upload", table_name="analysis_jobs")
@@ -0,0 +1,4 @@
+from app.models.analysis import Base, Analysis
+from app.models.extraction_cache import ExtractionCacheEntry
+from app.models.response_cache import ResponseCacheEntry
+from app.models.job import AnalysisJob
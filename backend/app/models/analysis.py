@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, Numeric, Boolean, Index, false
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -6,17 +6,38 @@ Base = declarative_base()
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    # Keyset listing; the lower(property_address) prefix index is in migration 0004
+    __table_args__ = (Index("ix_analyses_created_at_id", "created_at", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     filename = Column(String(255), nullable=False)
     file_size_bytes = Column(BigInteger, nullable=False)
     property_address = Column(String(500), nullable=True, index=True)
+    page_count = Column(Integer, nullable=True)
+    anthropic_model = Column(String(100), nullable=True)
     anthropic_input_tokens = Column(Integer, default=0)
     anthropic_output_tokens = Column(Integer, default=0)
+    openai_model = Column(String(100), nullable=True)
     openai_input_tokens = Column(Integer, default=0)
     openai_output_tokens = Column(Integer, default=0)
+    gemini_model = Column(String(100), nullable=True)
+    gemini_input_tokens = Column(Integer, default=0)
+    gemini_output_tokens = Column(Integer, default=0)
+    # Provider prompt-cache tokens, on top of the *_input_tokens (uncached) counts
+    anthropic_cache_read_tokens = Column(Integer, default=0)
+    anthropic_cache_write_tokens = Column(Integer, default=0)
+    openai_cache_read_tokens = Column(Integer, default=0)
+    gemini_cache_read_tokens = Column(Integer, default=0)
     anthropic_cost_usd = Column(Numeric(10, 6), default=0)
     openai_cost_usd = Column(Numeric(10, 6), default=0)
+    gemini_cost_usd = Column(Numeric(10, 6), default=0)
     total_cost_usd = Column(Numeric(10, 6), default=0)
     summary_text = Column(Text, nullable=True)
+    # Set when the report came from the LLM response cache
+    cache_hit = Column(Boolean, default=False, server_default=false(), nullable=False)
+    saved_input_tokens = Column(Integer, default=0)
+    saved_output_tokens = Column(Integer, default=0)
+    saved_cost_usd = Column(Numeric(10, 6), default=0)
+    # Estimated input tokens the compact, deduplicated prompt saved
+    prompt_tokens_saved = Column(Integer, default=0)
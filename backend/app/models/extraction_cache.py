@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from datetime import datetime
+from app.models.analysis import Base
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+    
+    cache_key = Column(String(100), primary_key=True)
+    pages = Column(JSON, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, ForeignKey, Index, text
+from datetime import datetime
+from app.models.analysis import Base
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    # At most one queued, running or succeeded job per upload (enqueue_job's ON CONFLICT target)
+    __table_args__ = (
+        Index("uq_analysis_jobs_live_upload", "upload_sha256", unique=True,
+              postgresql_where=text("status IN ('queued', 'running', 'succeeded')")),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued | running | succeeded | failed
+    stage = Column(String(40), nullable=True)
+    upload_sha256 = Column(String(64), nullable=False, index=True)
+    upload_path = Column(String(500), nullable=False)
+    filename = Column(String(255), nullable=False)
+    file_size_bytes = Column(BigInteger, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    error = Column(Text, nullable=True)
+    analysis_id = Column(Integer, ForeignKey("analyses.id"), nullable=True)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, Text, JSON
+from datetime import datetime
+from app.models.analysis import Base
+
+class ResponseCacheEntry(Base):
+    __tablename__ = "llm_response_cache"
+    
+    cache_key = Column(String(64), primary_key=True)
+    provider = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    system_hash = Column(String(64), nullable=False, index=True)
+    report_text = Column(Text, nullable=False)
+    usage = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
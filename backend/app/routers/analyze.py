@@ -1,21 +1,25 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+import asyncio
+import json
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from app.services.ocr import ocr_extract
-from app.services.classify import classify_documents
-from app.services.chunker import chunk_documents
-from app.services.rag import enrich_with_rag
-from app.services.model_router import analyze_with_router
-from app.services.prompts import build_prompt
-from app.services.redact import redact_sensitive
-from app.services.pdf_generator import markdown_to_pdf
-from app.utils.citations import attach_citations
-from app.utils.address_extractor import extract_property_address
-from app.utils.cost_calculator import calculate_costs
-from app.database import get_db
+from app.services.ingest import spool_upload, discard_spool
+from app.services.pipeline import analyze_spooled, PackError
+from app.services.jobs import enqueue_job, job_status
+from app.services.analyses import list_page, daily_stats, InvalidCursor
+from app.services.extract_cache import cache_stats
+from app.services.http_clients import provider_clients
+from app.services.routing import router as provider_router
+from app.services.report_cache import get_report_pdf, report_key, report_etag, etag_matches, report_filename
+from app.services.report_export import count_exports, iter_exports, stream_export_zip
+from app.config import settings
+from app.database import get_async_db
 from app.models.analysis import Analysis
+from app.models.job import AnalysisJob
+from app.utils.log import log_event, log_error
 
 router = APIRouter()
 
@@ -24,10 +28,16 @@ class AnalysisResponse(BaseModel):
     flags: list[dict]
     confidence: float
     analysis_id: int
+    prompt_tokens_saved: int = 0
 
 
-@router.post("/pack", response_model=AnalysisResponse)
-async def analyze_pack(file: UploadFile = File(...), db: Session = Depends(get_db)):
+class ExportRequest(BaseModel):
+    ids: list[int] | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+
+
+def _validate_upload(file: UploadFile):
     allowed_types = {
         "application/pdf",
         "application/zip",
@@ -45,129 +55,232 @@ async def analyze_pack(file: UploadFile = File(...), db: Session = Depends(get_d
     if not is_valid:
         raise HTTPException(status_code=400, detail="Upload a PDF or ZIP of PDFs.")
 
+
+@router.post("/pack", response_model=AnalysisResponse)
+async def analyze_pack(file: UploadFile = File(...), mode: str = "sync", db: AsyncSession = Depends(get_async_db)):
+    """
+    Analyse a pack. With `?mode=job` the pack is queued for the background
+    workers instead and a 202 with the job id is returned at once; poll
+    GET /analyze/jobs/{job_id}.
+    """
+    _validate_upload(file)
+
+    spooled = None
     try:
-        content = await file.read()
-        file_size = len(content)
-        await file.seek(0)
-
-        pages = await ocr_extract(file)
-        if not pages:
-            raise HTTPException(status_code=422, detail="Could not read any pages from the file.")
-
-        docs = classify_documents(pages)
-        chunks = chunk_documents(docs)
-
-        if not chunks:
-            raise HTTPException(status_code=422, detail="No readable text extracted. Try enabling OCR.")
-
-        safe_chunks = [redact_sensitive(c) for c in chunks]
-        context = enrich_with_rag(safe_chunks)
-
-        prompt = build_prompt(context)
-
-        llm_result, usage_stats = await analyze_with_router(prompt, meta={
-            "page_map": [c["meta"] for c in chunks],
-            "size": len(pages)
-        })
-
-        report_md, flags, confidence = attach_citations(llm_result, chunks)
-        property_address = extract_property_address(report_md)
-
-        if property_address:
-            print(f"✅ Extracted address: {property_address}")
-
-        # Calculate costs
-        costs = calculate_costs(usage_stats)
-        print(f"💰 Anthropic cost: ${costs['anthropic_cost']:.4f}")
-        print(f"💰 OpenAI cost: ${costs['openai_cost']:.4f}")
-        print(f"💰 Total cost: ${costs['total_cost']:.4f}")
-
-        analysis_record = Analysis(
-            filename=file.filename or "unknown",
-            file_size_bytes=file_size,
-            property_address=property_address,
-            anthropic_input_tokens=usage_stats.get("anthropic_input_tokens", 0),
-            anthropic_output_tokens=usage_stats.get("anthropic_output_tokens", 0),
-            openai_input_tokens=usage_stats.get("openai_input_tokens", 0),
-            openai_output_tokens=usage_stats.get("openai_output_tokens", 0),
-            anthropic_cost_usd=costs['anthropic_cost'],
-            openai_cost_usd=costs['openai_cost'],
-            total_cost_usd=costs['total_cost'],
-            summary_text=report_md[:10000]
-        )
+        # Stream the upload to disk once (hashing and sizing it on the way)
+        # instead of holding it in memory
+        spooled = await spool_upload(file)
 
-        db.add(analysis_record)
-        db.commit()
-        db.refresh(analysis_record)
+        if mode == "job":
+            job, created = await enqueue_job(db, spooled)
+            if created:
+                log_event("job_queued", job_id=job.id, filename=job.filename)
+            return JSONResponse(status_code=202, content=job_status(job))
 
-        print(f"💾 Saved analysis #{analysis_record.id} - Cost: ${analysis_record.total_cost_usd}")
+        result = await analyze_spooled(spooled)
+        return AnalysisResponse(**result)
+
+    except PackError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        return AnalysisResponse(
-            report_markdown=report_md,
-            flags=flags,
-            confidence=confidence,
-            analysis_id=analysis_record.id
-        )
-    
     finally:
-        # Ensure file is always closed
+        # Ensure file is always closed and the spool removed
+        if spooled:
+            discard_spool(spooled)
         await file.close()
-        print("🔒 File handle closed")
+
+
+# Strong references to detached streaming analyses
+_background_tasks: set = set()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/pack/stream")
+async def analyze_pack_stream(file: UploadFile = File(...)):
+    """
+    Same analysis as POST /pack, streamed as Server-Sent Events:
+    `stage` events (extract, classify, chunk, redact, analyze), `token`
+    events with report text as the model writes it, then a `result` event
+    with flags, confidence and analysis_id (or an `error` event).
+    """
+    _validate_upload(file)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data: dict):
+        await queue.put(_sse(event, data))
+
+    async def run(spooled: dict):
+        try:
+            result = await analyze_spooled(spooled, emit=emit)
+            await emit("result", {k: v for k, v in result.items() if k != "report_markdown"})
+        except PackError as e:
+            await emit("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            log_error("stream_analysis_failed", e)
+            await emit("error", {"status": 500, "detail": "Analysis failed."})
+        finally:
+            discard_spool(spooled)
+            await queue.put(None)
+
+    spooled = None
+    try:
+        spooled = await spool_upload(file)
+        # Started now rather than when the response is first read: if the
+        # client disconnects the task still finishes and saves the analysis,
+        # so paid model work is not thrown away. It owns the spool from here
+        task = asyncio.create_task(run(spooled))
+        spooled = None
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    finally:
+        if spooled:
+            discard_spool(spooled)
+        await file.close()
+
+    async def events():
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            yield message
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Progress of a queued analysis, with the report once it has succeeded
+    """
+    job = await db.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    report_markdown = None
+    if job.status == "succeeded" and job.analysis_id:
+        analysis = await db.get(Analysis, job.analysis_id)
+        report_markdown = analysis.summary_text if analysis else None
+    return job_status(job, report_markdown)
 
 
 @router.get("/download-pdf/{analysis_id}")
-async def download_pdf(analysis_id: int, db: Session = Depends(get_db)):
+async def download_pdf(
+    analysis_id: int,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
     Download the analysis report as a PDF.
+
+    Saved reports never change: the PDF is rendered once (usually right
+    after the analysis is saved) and served from the report store with an
+    ETag, so a conditional GET for a copy the client already has gets a 304.
     """
-    # Fetch the analysis from database
-    analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+    row = (await db.execute(
+        select(Analysis.summary_text, Analysis.property_address, Analysis.created_at)
+        .where(Analysis.id == analysis_id)
+    )).first()
 
-    if not analysis:
+    if not row:
         raise HTTPException(status_code=404, detail="Analysis not found")
 
-    # Generate PDF from the stored markdown
-    pdf_buffer = markdown_to_pdf(
-        report_markdown=analysis.summary_text,
-        property_address=analysis.property_address
-    )
+    etag = report_etag(report_key(analysis_id, row.created_at))
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    pdf = await get_report_pdf(analysis_id, row.summary_text, row.property_address, row.created_at)
+
+    filename = report_filename(row.property_address, row.created_at)
+
+    # Response sets Content-Length from the body
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+
+@router.post("/export")
+async def export_pdfs(request: ExportRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Download many reports as one ZIP of PDFs, selected by `ids` and/or a
+    `since`/`until` created_at range (at most EXPORT_MAX_REPORTS; larger
+    selections get a 413). The ZIP streams out as each PDF is ready.
+    """
+    if not (request.ids or request.since or request.until):
+        raise HTTPException(status_code=400, detail="Give analysis ids or a date range.")
 
-    # Create filename
-    if analysis.property_address:
-        # Clean address for filename
-        clean_address = "".join(c for c in analysis.property_address if c.isalnum() or c in (' ', '-', '_'))
-        clean_address = clean_address.replace(' ', '_')[:50]
-        filename = f"PKH_Legal_Brain_{clean_address}.pdf"
-    else:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"PKH_Legal_Brain_{timestamp}.pdf"
-
-    # Return as downloadable file
+    matches = await count_exports(db, request.ids, request.since, request.until)
+    if not matches:
+        raise HTTPException(status_code=404, detail="No analyses match.")
+    if matches > settings.EXPORT_MAX_REPORTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{matches} analyses match; export at most {settings.EXPORT_MAX_REPORTS} at a time.",
+        )
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
+        stream_export_zip(iter_exports(request.ids, request.since, request.until)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=PKH_Legal_Brain_export_{timestamp}.zip"},
     )
 
 
 @router.get("/list")
-async def list_analyses(db: Session = Depends(get_db), limit: int = 50):
+async def list_analyses(
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 50,
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    address_prefix: str | None = None,
+):
+    """
+    Analyses for the admin dashboard, newest first. Pass `next_cursor`
+    back as `cursor` for the next page; `total` counts all matches.
+    """
+    try:
+        return await list_page(db, limit, cursor, since, until, address_prefix)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/stats")
+async def analysis_stats(
+    db: AsyncSession = Depends(get_async_db),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    address_prefix: str | None = None,
+):
     """
-    Get list of all analyses for the admin dashboard
+    Tokens and cost per provider, per day and in total, for the same filters as /list
     """
-    analyses = db.query(Analysis).order_by(Analysis.created_at.desc()).limit(limit).all()
+    return await daily_stats(db, since, until, address_prefix)
 
-    results = []
-    for a in analyses:
-        results.append({
-            "id": a.id,
-            "filename": a.filename,
-            "property_address": a.property_address,
-            "file_size_mb": round(a.file_size_bytes / 1024 / 1024, 2),
-            "total_cost_usd": round(a.total_cost_usd, 4),
-            "created_at": a.created_at.isoformat() if a.created_at else None
-        })
 
-    return {"analyses": results, "total": len(results)}
+@router.get("/extract-cache/stats")
+async def extract_cache_stats():
+    """
+    Hit/miss counters for this worker and current size of the extraction cache
+    """
+    # The disk and postgres backends size the cache with blocking calls
+    return await asyncio.to_thread(cache_stats)
+
+
+@router.get("/providers/stats")
+async def provider_connection_stats():
+    """
+    Requests and connection reuse for the pooled provider HTTP clients,
+    plus each provider's recent latency, error rate and circuit state
+    """
+    routing = provider_router.snapshot()
+    return {
+        provider: dict(stats, routing=routing.get(provider))
+        for provider, stats in provider_clients.stats().items()
+    }
@@ -0,0 +1,186 @@
+import base64
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.analysis import Analysis
+from app.utils.cost_calculator import PROVIDERS
+
+MAX_PAGE_SIZE = 200
+
+# Everything the listing shows; summary_text (up to 10 KB a row) is left out
+_LIST_COLUMNS = (
+    Analysis.id,
+    Analysis.created_at,
+    Analysis.filename,
+    Analysis.property_address,
+    Analysis.file_size_bytes,
+    Analysis.total_cost_usd,
+    Analysis.cache_hit,
+    Analysis.saved_cost_usd,
+    Analysis.prompt_tokens_saved,
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, analysis_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _escape_like(prefix: str) -> str:
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filters(since: datetime | None, until: datetime | None, address_prefix: str | None) -> List:
+    conditions = []
+    if since:
+        conditions.append(Analysis.created_at >= since)
+    if until:
+        conditions.append(Analysis.created_at < until)
+    if address_prefix:
+        # Matches the lower(property_address) text_pattern_ops index
+        pattern = _escape_like(address_prefix.lower()) + "%"
+        conditions.append(func.lower(Analysis.property_address).like(pattern, escape="\\"))
+    return conditions
+
+
+async def list_page(db: AsyncSession, limit: int = 50, cursor: str | None = None,
+                    since: datetime | None = None, until: datetime | None = None,
+                    address_prefix: str | None = None) -> Dict:
+    """
+    One page of analyses, newest first, seeking on (created_at, id).
+
+    Returns {"analyses", "next_cursor", "total"}; `total` counts every row
+    matching the filters, `next_cursor` is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conditions = _filters(since, until, address_prefix)
+
+    query = select(*_LIST_COLUMNS).where(*conditions)
+    if cursor:
+        created_at, analysis_id = decode_cursor(cursor)
+        query = query.where(tuple_(Analysis.created_at, Analysis.id) < (created_at, analysis_id))
+    query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    total = await db.scalar(select(func.count()).select_from(Analysis).where(*conditions))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if last.created_at is not None:
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+    analyses = [{
+        "id": r.id,
+        "filename": r.filename,
+        "property_address": r.property_address,
+        "file_size_mb": round(r.file_size_bytes / 1024 / 1024, 2),
+        "total_cost_usd": round(float(r.total_cost_usd or 0), 4),
+        "cache_hit": r.cache_hit,
+        "saved_cost_usd": round(float(r.saved_cost_usd or 0), 4),
+        "prompt_tokens_saved": r.prompt_tokens_saved or 0,
+        "created_at": r.created_at.isoformat() if r.created_at else None
+    } for r in rows]
+    return {"analyses": analyses, "next_cursor": next_cursor, "total": total}
+
+
+def _sum(column, *where):
+    total = func.sum(column)
+    return func.coalesce(total.filter(*where) if where else total, 0)
+
+
+async def daily_stats(db: AsyncSession, since: datetime | None = None, until: datetime | None = None,
+                      address_prefix: str | None = None) -> Dict:
+    """
+    Token and cost totals per provider, per day and overall, aggregated in
+    SQL. One GROUP BY ROLLUP query: the row with no day is the overall total.
+    Cost per page is None until some analysis in the row recorded its pages.
+    """
+    day = func.date(Analysis.created_at).label("day")
+    query = (
+        select(
+            day,
+            func.count().label("analyses"),
+            _sum(Analysis.file_size_bytes).label("file_size_bytes"),
+            _sum(Analysis.anthropic_input_tokens).label("anthropic_input_tokens"),
+            _sum(Analysis.anthropic_output_tokens).label("anthropic_output_tokens"),
+            _sum(Analysis.anthropic_cost_usd).label("anthropic_cost_usd"),
+            _sum(Analysis.openai_input_tokens).label("openai_input_tokens"),
+            _sum(Analysis.openai_output_tokens).label("openai_output_tokens"),
+            _sum(Analysis.openai_cost_usd).label("openai_cost_usd"),
+            _sum(Analysis.anthropic_cache_read_tokens).label("anthropic_cache_read_tokens"),
+            _sum(Analysis.anthropic_cache_write_tokens).label("anthropic_cache_write_tokens"),
+            _sum(Analysis.openai_cache_read_tokens).label("openai_cache_read_tokens"),
+            _sum(Analysis.gemini_input_tokens).label("gemini_input_tokens"),
+            _sum(Analysis.gemini_output_tokens).label("gemini_output_tokens"),
+            _sum(Analysis.gemini_cache_read_tokens).label("gemini_cache_read_tokens"),
+            _sum(Analysis.gemini_cost_usd).label("gemini_cost_usd"),
+            _sum(Analysis.total_cost_usd).label("total_cost_usd"),
+            _sum(Analysis.saved_cost_usd).label("saved_cost_usd"),
+            _sum(Analysis.prompt_tokens_saved).label("prompt_tokens_saved"),
+            _sum(Analysis.page_count).label("pages"),
+            # Cost per page only counts analyses that recorded their page count,
+            # and a provider's pages only those it billed for
+            _sum(Analysis.total_cost_usd, Analysis.page_count.isnot(None)).label("paged_cost_usd"),
+            *(
+                column
+                for p in PROVIDERS
+                for column in (
+                    _sum(Analysis.page_count, getattr(Analysis, f"{p}_cost_usd") > 0).label(f"{p}_pages"),
+                    _sum(getattr(Analysis, f"{p}_cost_usd"), Analysis.page_count.isnot(None)).label(f"{p}_paged_cost_usd"),
+                )
+            ),
+            func.count().filter(Analysis.cache_hit).label("cache_hits"),
+        )
+        .where(Analysis.created_at.isnot(None), *_filters(since, until, address_prefix))
+        .group_by(func.rollup(day))
+        .order_by(day)
+    )
+    rows = (await db.execute(query)).all()
+
+    def per_page(cost, pages) -> float | None:
+        return round(float(cost) / pages, 4) if pages else None
+
+    def summarise(r) -> Dict:
+        return {
+            "analyses": r.analyses,
+            "cache_hits": r.cache_hits,
+            "file_size_mb": round(float(r.file_size_bytes) / 1024 / 1024, 2),
+            "pages": r.pages,
+            "providers": {
+                provider: {
+                    "input_tokens": getattr(r, f"{provider}_input_tokens"),
+                    "output_tokens": getattr(r, f"{provider}_output_tokens"),
+                    "cache_read_tokens": getattr(r, f"{provider}_cache_read_tokens"),
+                    # Only Anthropic bills cache writes, so only it has the column
+                    **({"cache_write_tokens": r.anthropic_cache_write_tokens} if provider == "anthropic" else {}),
+                    "cost_usd": round(float(getattr(r, f"{provider}_cost_usd")), 4),
+                    "cost_per_page_usd": per_page(getattr(r, f"{provider}_paged_cost_usd"), getattr(r, f"{provider}_pages")),
+                }
+                for provider in PROVIDERS
+            },
+            "total_cost_usd": round(float(r.total_cost_usd), 4),
+            "cost_per_page_usd": per_page(r.paged_cost_usd, r.pages),
+            "saved_cost_usd": round(float(r.saved_cost_usd), 4),
+            "prompt_tokens_saved": r.prompt_tokens_saved,
+        }
+
+    days = [dict(summarise(r), day=r.day.isoformat()) for r in rows if r.day is not None]
+    # ROLLUP's grand-total row is returned even when no analyses match
+    totals = next(summarise(r) for r in rows if r.day is None)
+    return {"days": days, "totals": totals}
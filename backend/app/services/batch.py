@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+import httpx
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.http_clients import provider_clients
+from app.services.ingest import discard_spool, spool_upload
+from app.services.metrics import timed
+from app.services.model_router import (
+    _anthropic_request, _anthropic_usage, _log_provider_error, _openai_request, _openai_usage, _record_usage,
+    preferred_provider, provider_preference,
+)
+from app.services.pipeline import (
+    PackError, build_analysis, cached_run, log_saved, model_result, prepare_pack, run_mode, run_model,
+)
+from app.services.response_cache import store_response
+from app.services.routing import is_retryable
+from app.utils.log import log_event, log_error
+
+ANTHROPIC_BATCHES = "https://api.anthropic.com/v1/messages/batches"
+OPENAI_FILES = "https://api.openai.com/v1/files"
+OPENAI_BATCHES = "https://api.openai.com/v1/batches"
+
+# Providers with a batch API wired up; packs routed to Gemini use the next one
+BATCH_PROVIDERS = ("anthropic", "openai")
+
+# OpenAI batch states after which nothing more will change
+_OPENAI_ENDED = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    """A provider batch that produced no results at all."""
+
+
+class _LocalFile:
+    """Just enough of UploadFile for spool_upload, reading a pack on disk."""
+
+    def __init__(self, f, filename: str):
+        self._f = f
+        self.filename = filename
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._f.read, size)
+
+
+def batch_provider(meta: dict) -> str | None:
+    """The first configured provider with a batch API, in routing preference order."""
+    return next((p for p in provider_preference(meta) if p in BATCH_PROVIDERS), None)
+
+
+def _raise_for_status(provider: str, response: httpx.Response):
+    if response.status_code >= 400:
+        _log_provider_error(provider, response)
+    response.raise_for_status()
+
+
+def _jsonl(text: str) -> List[Dict]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def _poll(provider: str, url: str, headers: Dict, ended: Callable[[Dict], bool], cancel_url: str) -> Dict:
+    """
+    GET `url` every BATCH_POLL_INTERVAL_SECONDS until `ended(batch)`. Past
+    BATCH_MAX_WAIT_HOURS the batch is cancelled, and polled until the
+    cancellation ends it, so requests already answered are still collected.
+    A poll that fails with a retryable error is tried again on the next
+    interval rather than abandoning the batch.
+    """
+    client = provider_clients.get(provider)
+    deadline = time.monotonic() + settings.BATCH_MAX_WAIT_HOURS * 3600
+    cancelled = False
+    while True:
+        try:
+            r = await client.get(url, headers=headers)
+            _raise_for_status(provider, r)
+            batch = r.json()
+            if ended(batch):
+                return batch
+            if not cancelled and time.monotonic() > deadline:
+                log_event("batch_cancelled", logging.WARNING, provider=provider, batch_id=batch["id"])
+                _raise_for_status(provider, await client.post(cancel_url, headers=headers))
+                cancelled = True
+        except httpx.HTTPError as e:
+            if not is_retryable(e) or time.monotonic() > deadline:
+                raise
+            log_error("batch_poll_failed", e, provider=provider, url=url)
+        await asyncio.sleep(settings.BATCH_POLL_INTERVAL_SECONDS)
+
+
+async def _discard_remote(provider: str, url: str, headers: Dict):
+    # The prompts and reports should not outlive the run on the provider's side
+    try:
+        await provider_clients.get(provider).delete(url, headers=headers)
+    except httpx.HTTPError as e:
+        log_error("batch_cleanup_failed", e, provider=provider, url=url)
+
+
+async def _anthropic_batch(prompts: Dict[str, dict]) -> Dict[str, Tuple[str, Dict]]:
+    """Run prompts through the Message Batches API; {custom_id: (text, usage)} for those that succeeded."""
+    start = time.perf_counter()
+    requests, headers = [], {}
+    for custom_id, prompt in prompts.items():
+        headers, params = _anthropic_request(prompt)
+        requests.append({"custom_id": custom_id, "params": params})
+    client = provider_clients.get("anthropic")
+    r = await client.post(ANTHROPIC_BATCHES, headers=headers, json={"requests": requests})
+    _raise_for_status("anthropic", r)
+    batch_id = r.json()["id"]
+    log_event("batch_submitted", provider="anthropic", batch_id=batch_id, requests=len(requests))
+
+    url = f"{ANTHROPIC_BATCHES}/{batch_id}"
+    batch = await _poll(
+        "anthropic", url, headers, lambda b: b["processing_status"] == "ended", f"{url}/cancel",
+    )
+    try:
+        r = await client.get(batch["results_url"], headers=headers)
+        _raise_for_status("anthropic", r)
+        items = _jsonl(r.text)
+    finally:
+        await _discard_remote("anthropic", url, headers)
+
+    results = {}
+    for item in items:
+        result = item["result"]
+        if result["type"] != "succeeded":
+            log_event("batch_request_failed", logging.WARNING, provider="anthropic", batch_id=batch_id,
+                      custom_id=item["custom_id"], reason=result["type"], error=str(result.get("error"))[:500])
+            continue
+        message = result["message"]
+        usage_stats = _anthropic_usage(message.get("usage", {}), batch=True)
+        _record_usage("anthropic", start, usage_stats, mode="batch")
+        results[item["custom_id"]] = (message["content"][0]["text"], usage_stats)
+    log_event("batch_ended", provider="anthropic", batch_id=batch_id, succeeded=len(results),
+              requests=len(requests), ms=int((time.perf_counter() - start) * 1000))
+    return results
+
+
+async def _openai_batch(prompts: Dict[str, dict]) -> Dict[str, Tuple[str, Dict]]:
+    """Run prompts through the Batch API; {custom_id: (text, usage)} for those that succeeded."""
+    start = time.perf_counter()
+    lines, headers = [], {}
+    for custom_id, prompt in prompts.items():
+        headers, body = _openai_request(prompt)
+        lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+    client = provider_clients.get("openai")
+    r = await client.post(
+        OPENAI_FILES, headers=headers, data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", "\n".join(lines).encode("utf-8"), "application/jsonl")},
+    )
+    _raise_for_status("openai", r)
+    input_file_id = r.json()["id"]
+    try:
+        r = await client.post(OPENAI_BATCHES, headers=headers, json={
+            "input_file_id": input_file_id, "endpoint": "/v1/chat/completions", "completion_window": "24h",
+        })
+        _raise_for_status("openai", r)
+        batch_id = r.json()["id"]
+        log_event("batch_submitted", provider="openai", batch_id=batch_id, requests=len(lines))
+
+        url = f"{OPENAI_BATCHES}/{batch_id}"
+        batch = await _poll("openai", url, headers, lambda b: b["status"] in _OPENAI_ENDED, f"{url}/cancel")
+    finally:
+        await _discard_remote("openai", f"{OPENAI_FILES}/{input_file_id}", headers)
+
+    output_file_id = batch.get("output_file_id")
+    if not output_file_id:
+        raise BatchError(f"OpenAI batch {batch_id} {batch['status']}: {batch.get('errors')}")
+    try:
+        r = await client.get(f"{OPENAI_FILES}/{output_file_id}/content", headers=headers)
+        _raise_for_status("openai", r)
+        items = _jsonl(r.text)
+    finally:
+        await _discard_remote("openai", f"{OPENAI_FILES}/{output_file_id}", headers)
+
+    results = {}
+    for item in items:
+        response = item.get("response") or {}
+        if response.get("status_code") != 200:
+            log_event("batch_request_failed", logging.WARNING, provider="openai", batch_id=batch_id,
+                      custom_id=item["custom_id"], reason=response.get("status_code"),
+                      error=str(item.get("error") or response.get("body"))[:500])
+            continue
+        body = response["body"]
+        usage_stats = _openai_usage(body.get("usage", {}), batch=True)
+        _record_usage("openai", start, usage_stats, mode="batch")
+        results[item["custom_id"]] = (body["choices"][0]["message"]["content"], usage_stats)
+    log_event("batch_ended", provider="openai", batch_id=batch_id, status=batch["status"], succeeded=len(results),
+              requests=len(lines), ms=int((time.perf_counter() - start) * 1000))
+    return results
+
+
+async def run_provider_batches(provider: str, prompts: Dict[str, dict]) -> Dict[str, Tuple[str, Dict]]:
+    """
+    Send prompts to `provider` in batches of at most BATCH_MAX_REQUESTS,
+    submitted together. Returns {custom_id: (text, usage)}; prompts missing
+    from it failed (alone, or with their whole batch) and are logged.
+    """
+    submit = {"anthropic": _anthropic_batch, "openai": _openai_batch}[provider]
+    ids = list(prompts)
+    size = max(settings.BATCH_MAX_REQUESTS, 1)
+
+    async def one(group: List[str]) -> Dict:
+        try:
+            return await submit({custom_id: prompts[custom_id] for custom_id in group})
+        except Exception as e:
+            log_error("batch_failed", e, provider=provider, requests=len(group))
+            return {}
+
+    results = {}
+    for answered in await asyncio.gather(*(one(ids[i:i + size]) for i in range(0, len(ids), size))):
+        results.update(answered)
+    return results
+
+
+async def _prepare(lot: Dict):
+    try:
+        with open(lot["path"], "rb") as f:
+            lot["spooled"] = await spool_upload(_LocalFile(f, os.path.basename(lot["path"])))
+        lot["prepared"] = await prepare_pack(lot["spooled"])
+    except PackError as e:
+        lot["error"] = e.detail
+        log_event("batch_lot_failed", logging.WARNING, path=lot["path"], error=e.detail)
+    except Exception as e:
+        lot["error"] = f"{type(e).__name__}: {e}"
+        log_error("batch_lot_failed", e, path=lot["path"])
+
+
+async def _run_interactive(lot: Dict, slots: asyncio.Semaphore):
+    prepared = lot["prepared"]
+    async with slots:
+        lot["route"] = "interactive"
+        try:
+            lot["result"] = await run_model(prepared["context"], prepared["prompt"], prepared["meta"])
+        except Exception as e:
+            lot["error"] = f"{type(e).__name__}: {e}"
+            log_error("batch_lot_failed", e, path=lot["path"])
+
+
+def _outcome(lot: Dict) -> Dict:
+    analysis = lot.get("analysis")
+    return {
+        "path": lot["path"],
+        "route": lot.get("route"),
+        "analysis_id": analysis.id if analysis is not None else None,
+        "cost_usd": lot["costs"]["total_cost"] if analysis is not None else None,
+        "usage": lot["result"]["usage"] if analysis is not None else None,
+        "error": lot.get("error"),
+    }
+
+
+async def analyze_batch(paths: List[str], save: bool = True) -> List[Dict]:
+    """
+    Analyse many packs that no one is waiting on, e.g. a whole auction
+    catalogue, at batch prices.
+
+    Every pack is ingested concurrently (bounded by ingest_pack's pack
+    slots and memory budget). Packs answered before come from the response
+    cache; single-call prompts go through their provider's batch API and
+    are polled until the batch ends. Map-reduce packs, packs with no batch
+    provider configured and requests a batch could not answer run through
+    the interactive router at full price. With `save`, all Analysis rows
+    are written in one transaction.
+
+    Returns one {"path", "route", "analysis_id", "cost_usd", "usage",
+    "error"} per path, in order; `route` is "cache", "batch" or
+    "interactive".
+    """
+    lots = [{"path": path} for path in paths]
+    try:
+        with timed("batch_ingest", packs=len(lots)):
+            await asyncio.gather(*(_prepare(lot) for lot in lots))
+
+        queued: Dict[str, Dict[str, Dict]] = {}
+        interactive = []
+        for i, lot in enumerate(lots):
+            prepared = lot.get("prepared")
+            if prepared is None:
+                continue
+            # A report from the provider it would be batched on counts as well
+            provider = batch_provider(prepared["meta"])
+            for cached_on in dict.fromkeys((preferred_provider(prepared["meta"]), provider)):
+                lot["result"] = await cached_run(prepared["prompt"], prepared["meta"], cached_on)
+                if lot["result"]:
+                    break
+            if lot["result"]:
+                lot["route"] = "cache"
+                continue
+            if provider is None or run_mode(prepared["prompt"]) == "map_reduce":
+                interactive.append(lot)
+                continue
+            lot["route"] = "batch"
+            queued.setdefault(provider, {})[f"lot-{i}"] = lot
+
+        with timed("batch_wait", requests=sum(len(group) for group in queued.values())):
+            answers = await asyncio.gather(*(
+                run_provider_batches(provider, {custom_id: lot["prepared"]["prompt"] for custom_id, lot in group.items()})
+                for provider, group in queued.items()
+            ))
+        for group, results in zip(queued.values(), answers):
+            for custom_id, lot in group.items():
+                if custom_id not in results:
+                    interactive.append(lot)
+                    continue
+                text, usage = results[custom_id]
+                lot["result"] = model_result(text, usage)
+                prompt = lot["prepared"]["prompt"]
+                await store_response(prompt, text, usage, run_mode(prompt))
+
+        slots = asyncio.Semaphore(settings.BATCH_FALLBACK_CONCURRENCY)
+        await asyncio.gather(*(_run_interactive(lot, slots) for lot in interactive))
+
+        done = [lot for lot in lots if lot.get("result")]
+        for lot in done:
+            lot["analysis"], report = build_analysis(lot["spooled"], lot["prepared"], lot["result"])
+            lot["costs"] = report["costs"]
+        if save and done:
+            with timed("db_write", rows=len(done)):
+                async with AsyncSessionLocal() as db:
+                    db.add_all([lot["analysis"] for lot in done])
+                    await db.commit()
+            for lot in done:
+                log_saved(lot["analysis"], lot["costs"], route=lot["route"])
+    finally:
+        for lot in lots:
+            if "spooled" in lot:
+                discard_spool(lot["spooled"])
+
+    outcomes = [_outcome(lot) for lot in lots]
+    log_event(
+        "batch_analysed", packs=len(lots), failed=sum(1 for o in outcomes if o["error"]),
+        **{route: sum(1 for o in outcomes if o["route"] == route) for route in ("cache", "batch", "interactive")},
+        total_cost_usd=round(sum(o["cost_usd"] or 0 for o in outcomes), 4),
+    )
+    return outcomes
@@ -1,20 +1,150 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+from app.config import settings
+from app.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
 
-from typing import List, Dict
+# Blank line between paragraphs
+_PARAGRAPH = re.compile(r"\n\s*\n")
+# End of a sentence or clause, or the start of a numbered clause ("12.3 ", "(b) ")
+_CLAUSE = re.compile(r"(?<=[.;:])\s+|\n(?=\s*(?:\d+(?:\.\d+)*\.?|\([a-z0-9]{1,4}\))\s)", re.I)
+_SPACE = re.compile(r"\s+")
 
-MAX_CHARS = 2000
+# A unit is (start, end, tokens) within one page's text
+Unit = Tuple[int, int, int]
 
-def chunk_documents(docs: List[Dict]) -> List[Dict]:
-    chunks: List[Dict] = []
-    for d in docs:
-        t = d["text"] or ""
-        if not t:
-            # still create a placeholder chunk to keep page anchors
-            chunks.append({"content": "", "meta": {"doc_type": d["type"], "page": d["page"]}})
+
+def _boundaries(text: str, start: int, end: int, pattern: re.Pattern) -> List[Tuple[int, int]]:
+    """Split text[start:end] at `pattern`, dropping the separators and empty pieces."""
+    pieces, last = [], start
+    for m in pattern.finditer(text, start, end):
+        if m.start() > last:
+            pieces.append((last, m.start()))
+        last = m.end()
+    if end > last:
+        pieces.append((last, end))
+    return pieces
+
+
+def _split_words(text: str, start: int, end: int, max_tokens: int) -> Iterator[Unit]:
+    """Cut an over-long clause at the last whitespace before the budget."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + 1, start + max_chars)
+        cut = cut if cut != -1 else start + max_chars
+        yield start, cut, estimate_tokens(text[start:cut])
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if end > start:
+        yield start, end, estimate_tokens(text[start:end])
+
+
+def _units(text: str, max_tokens: int) -> Iterator[Unit]:
+    """
+    Break a page into the largest pieces that fit the budget: paragraphs,
+    then clauses within an over-long paragraph, then words.
+    """
+    for p_start, p_end in _boundaries(text, 0, len(text), _PARAGRAPH):
+        tokens = estimate_tokens(text[p_start:p_end])
+        if tokens <= max_tokens:
+            yield p_start, p_end, tokens
+            continue
+        for c_start, c_end in _boundaries(text, p_start, p_end, _CLAUSE):
+            tokens = estimate_tokens(text[c_start:c_end])
+            if tokens <= max_tokens:
+                yield c_start, c_end, tokens
+            else:
+                yield from _split_words(text, c_start, c_end, max_tokens)
+
+
+class _Chunk:
+    """Units collected for one chunk, as (page index, unit) in reading order."""
+
+    def __init__(self):
+        self.units: List[Tuple[int, Unit]] = []
+        self.tokens = 0
+
+    def add(self, page: int, unit: Unit):
+        self.units.append((page, unit))
+        self.tokens += unit[2]
+
+    def overlap(self, overlap_tokens: int) -> "_Chunk":
+        """A new chunk seeded with the trailing units that fit `overlap_tokens`."""
+        tail, used = [], 0
+        for page, unit in reversed(self.units):
+            if used + unit[2] > overlap_tokens:
+                break
+            tail.append((page, unit))
+            used += unit[2]
+        seeded = _Chunk()
+        for page, unit in reversed(tail):
+            seeded.add(page, unit)
+        return seeded
+
+    def render(self, docs: List[Dict]) -> Dict:
+        # Units of one page are contiguous, so each page contributes one slice
+        slices: Dict[int, List[int]] = {}
+        for page, (start, end, _) in self.units:
+            span = slices.setdefault(page, [start, end])
+            span[1] = end
+        content = "\n\n".join(docs[p]["text"][s:e] for p, (s, e) in slices.items())
+        first, last = self.units[0], self.units[-1]
+        first_doc, last_doc = docs[first[0]], docs[last[0]]
+        return {
+            "content": content,
+            "meta": {
+                "doc_type": first_doc["type"],
+                "page": first_doc["page"],
+                "page_end": last_doc["page"],
+                "char_start": first[1][0],
+                "char_end": last[1][1],
+                "source": first_doc.get("source"),
+                "tokens": self.tokens,
+            },
+        }
+
+
+def chunk_documents(docs: Iterable[Dict], max_tokens: int | None = None,
+                    overlap_tokens: int | None = None) -> Iterator[Dict]:
+    """
+    Yield chunks of at most `max_tokens` estimated tokens, split on
+    paragraph and clause boundaries.
+
+    A chunk never spans two doc types or source PDFs. Consecutive pages of
+    the same type share a chunk while it holds fewer than
+    CHUNK_MIN_PAGE_TOKENS, so short pages are merged rather than sent alone.
+    When a chunk fills mid-run it is followed by one that repeats up to
+    `overlap_tokens` of its trailing clauses. Blank pages yield nothing.
+
+    `meta` records the first and last page (`page`, `page_end`) and the
+    character offsets into those pages' text (`char_start`, `char_end`).
+    """
+    max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    min_tokens = settings.CHUNK_MIN_PAGE_TOKENS
+
+    # Only the pages of the chunk being built are kept
+    window: List[Dict] = []
+    current, key = _Chunk(), None
+    for doc in docs:
+        text = doc.get("text") or ""
+        if not text.strip():
             continue
-        for i in range(0, len(t), MAX_CHARS):
-            segment = t[i:i+MAX_CHARS]
-            chunks.append({
-                "content": segment,
-                "meta": {"doc_type": d["type"], "page": d["page"]}
-            })
-    return chunks
+        doc_key = (doc.get("type"), doc.get("source"))
+        if current.units and (doc_key != key or current.tokens >= min_tokens):
+            yield current.render(window)
+            current = _Chunk()
+        if not current.units:
+            window = []
+        key = doc_key
+        window.append(doc)
+        page = len(window) - 1
+        for unit in _units(text, max_tokens):
+            if current.units and current.tokens + unit[2] > max_tokens:
+                yield current.render(window)
+                current = current.overlap(overlap_tokens)
+                if current.tokens + unit[2] > max_tokens:
+                    current = _Chunk()
+            current.add(page, unit)
+    if current.units:
+        yield current.render(window)
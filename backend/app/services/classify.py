@@ -1,5 +1,5 @@
-
 from typing import List, Dict
+import numpy as np
 
 DOC_TYPES = [
     "Special Conditions", "Memorandum of Sale", "Lease", "Office Copy Entry",
@@ -17,14 +17,91 @@ KEYWORDS = {
     "Addendum": ["addendum", "updated"],
 }
 
+# Share of a neighbouring page's score (same source PDF) added to a page, so
+# continuation pages without keywords follow the document they belong to
+NEIGHBOUR_WEIGHT = 0.5
+
+# Built once at import: the keyword list and a keyword x label weight matrix
+_KEYWORD_LIST = sorted({kw for kws in KEYWORDS.values() for kw in kws})
+_KEYWORD_INDEX = {kw: i for i, kw in enumerate(_KEYWORD_LIST)}
+_WEIGHTS = np.zeros((len(_KEYWORD_LIST), len(DOC_TYPES)))
+for _label, _kws in KEYWORDS.items():
+    for _kw in _kws:
+        _WEIGHTS[_KEYWORD_INDEX[_kw], DOC_TYPES.index(_label)] = 1.0
+
+# Joins pages for the single scan; no keyword can match across it
+_PAGE_BREAK = "\x00"
+
+
+def _keyword_counts(pages: List[Dict]) -> np.ndarray:
+    """
+    Count keyword hits over the whole pack at once; returns a pages x
+    keywords matrix. The pages are joined into one string and each keyword
+    is located with str.find, which beats a single pass of a compiled
+    alternation of all keywords by about 3x in CPython (see
+    benchmarks/bench_classify.py). Hit offsets map back to pages with one
+    searchsorted.
+    """
+    texts = [(p.get("text") or "").lower() for p in pages]
+    starts = np.cumsum([0] + [len(t) + 1 for t in texts[:-1]])
+    text = _PAGE_BREAK.join(texts)
+    positions, keywords = [], []
+    for k, kw in enumerate(_KEYWORD_LIST):
+        i = text.find(kw)
+        while i != -1:
+            positions.append(i)
+            keywords.append(k)
+            i = text.find(kw, i + 1)
+    counts = np.zeros((len(pages), len(_KEYWORD_LIST)))
+    if positions:
+        rows = np.searchsorted(starts, positions, side="right") - 1
+        np.add.at(counts, (rows, keywords), 1)
+    return counts
+
+
+def _smooth(scores: np.ndarray, sources: List) -> np.ndarray:
+    """Add a share of each neighbouring page's score within the same source."""
+    if len(scores) < 2:
+        return scores
+    src = np.array(sources, dtype=object)
+    same = (src[1:] == src[:-1]).astype(float)[:, None]
+    smoothed = scores.copy()
+    smoothed[1:] += NEIGHBOUR_WEIGHT * same * scores[:-1]
+    smoothed[:-1] += NEIGHBOUR_WEIGHT * same * scores[1:]
+    return smoothed
+
+
+def score_pages(pages: List[Dict]) -> np.ndarray:
+    """
+    Score every DOC_TYPES label for every page of a pack.
+
+    A label's raw score is the sum of log(1 + hits) over its keywords, so
+    one repeated phrase cannot swamp the others. Scores are then smoothed
+    across consecutive pages of the same source PDF.
+    """
+    if not pages:
+        return np.zeros((0, len(DOC_TYPES)))
+    scores = np.log1p(_keyword_counts(pages)) @ _WEIGHTS
+    return _smooth(scores, [p.get("source") for p in pages])
+
+
 def classify_documents(pages: List[Dict]) -> List[Dict]:
+    """
+    Label each page with its best scoring doc type ("Other" if nothing
+    matched) plus `scores`, each label's share of the page's total score.
+    """
+    scores = score_pages(pages)
+    totals = scores.sum(axis=1)
+    best = scores.argmax(axis=1) if len(pages) else []
     docs = []
-    for p in pages:
-        text = (p.get("text") or "").lower()
-        dtype = "Other"
-        for dt, kws in KEYWORDS.items():
-            if any(kw in text for kw in kws):
-                dtype = dt
-                break
-        docs.append({"type": dtype, "page": p["page"], "text": p["text"]})
+    for i, p in enumerate(pages):
+        total = totals[i]
+        shares = scores[i] / total if total else scores[i]
+        docs.append({
+            "type": DOC_TYPES[best[i]] if total else "Other",
+            "scores": {dt: round(float(s), 3) for dt, s in zip(DOC_TYPES, shares)},
+            "page": p["page"],
+            "source": p.get("source"),
+            "text": p["text"],
+        })
     return docs
@@ -0,0 +1,82 @@
+import re
+import zlib
+from typing import Dict, List, Tuple
+import numpy as np
+from app.utils.tokens import estimate_tokens
+
+# MinHash over 5-word shingles, 64 hashes split into 16 LSH bands of 4 rows:
+# chunks about 0.6 Jaccard or more almost always share a band and are then
+# compared on the full signature
+SHINGLE_WORDS = 5
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+_WORD = re.compile(r"\w+")
+
+# Multiply-shift hash family, fixed so signatures are the same in every process
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, 2 ** 63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_HASHES, dtype=np.uint64)
+
+
+def _shingles(text: str) -> np.ndarray:
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of a text's word shingles."""
+    x = _shingles(text)
+    # uint64 arithmetic wraps, which is what multiply-shift hashing wants
+    return ((x[:, None] * _A + _B) >> np.uint64(32)).min(axis=0)
+
+
+def _anchor(chunk: Dict) -> str:
+    meta = chunk["meta"]
+    first, last = meta["page"], meta.get("page_end", meta["page"])
+    pages = f"p.{first}" if first == last else f"p.{first}-{last}"
+    return f"{meta['doc_type']} {pages}"
+
+
+def drop_near_duplicates(chunks: List[Dict], threshold: float) -> Tuple[List[Dict], Dict]:
+    """
+    Drop blank chunks and chunks whose estimated Jaccard similarity to an
+    earlier kept chunk is at least `threshold` (repeated headers and
+    boilerplate pages, the same search filed in two ZIP members). The kept
+    copy lists the dropped copies' pages under "also_on", so the model
+    can still cite them.
+
+    Returns (kept chunks, {"blank", "duplicates", "duplicate_tokens"}).
+    """
+    kept, signatures, buckets = [], [], {}
+    blank = duplicates = duplicate_tokens = 0
+    for chunk in chunks:
+        text = chunk.get("content") or ""
+        if not text.strip():
+            blank += 1
+            continue
+        if threshold <= 0:
+            kept.append(chunk)
+            continue
+
+        signature = minhash(text)
+        bands = [(b, signature[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+        candidates = sorted({k for band in bands for k in buckets.get(band, ())})
+        match = next((k for k in candidates if np.mean(signatures[k] == signature) >= threshold), None)
+        if match is not None:
+            original = kept[match]
+            kept[match] = dict(original, also_on=original.get("also_on", []) + [_anchor(chunk)])
+            duplicates += 1
+            duplicate_tokens += chunk["meta"].get("tokens") or estimate_tokens(text)
+            continue
+
+        for band in bands:
+            buckets.setdefault(band, []).append(len(kept))
+        signatures.append(signature)
+        kept.append(chunk)
+    return kept, {"blank": blank, "duplicates": duplicates, "duplicate_tokens": duplicate_tokens}
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Dict
+from sqlalchemy import func, text
+from app.config import settings
+from app.utils.log import log_error
+
+# Bump when extraction output changes so stale entries are never served
+CACHE_VERSION = "v2"
+
+# Lookups are recorded by the event-loop process (workers report hit/miss)
+_counters = {"hits": 0, "misses": 0}
+
+def cache_key(pdf_content) -> str:
+    """SHA-256 of the PDF bytes, namespaced by extractor version and OCR mode."""
+    mode = "textract" if settings.USE_TEXTRACT else "native"
+    return f"{CACHE_VERSION}-{mode}-{hashlib.sha256(pdf_content).hexdigest()}"
+
+def _strip(pages: List[Dict]) -> List[Dict]:
+    # The same PDF can arrive under different names; store content only
+    return [{"page": p["page"], "text": p["text"]} for p in pages]
+
+class DiskExtractionCache:
+    """One JSON file per PDF; mtime doubles as the LRU clock."""
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> List[Dict] | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            os.utime(path)
+            return pages
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, pages: List[Dict]):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(_strip(pages), f)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".json"):
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def usage(self) -> Dict:
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+class PostgresExtractionCache:
+    """Rows in the extraction_cache table, evicted by last_used_at."""
+
+    name = "postgres"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> List[Dict] | None:
+        from app.database import SessionLocal
+        from app.models.extraction_cache import ExtractionCacheEntry
+        with SessionLocal() as db:
+            entry = db.get(ExtractionCacheEntry, key)
+            if entry is None:
+                return None
+            entry.last_used_at = datetime.utcnow()
+            db.commit()
+            return entry.pages
+
+    def put(self, key: str, pages: List[Dict]):
+        from app.database import SessionLocal
+        from app.models.extraction_cache import ExtractionCacheEntry
+        stored = _strip(pages)
+        with SessionLocal() as db:
+            db.merge(ExtractionCacheEntry(
+                cache_key=key,
+                pages=stored,
+                size_bytes=len(json.dumps(stored)),
+                last_used_at=datetime.utcnow(),
+            ))
+            # Drop least-recently-used rows once the running total passes the cap
+            db.execute(text("""
+                DELETE FROM extraction_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               SUM(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS running
+                        FROM extraction_cache
+                    ) ranked WHERE running > :max_bytes
+                )
+            """), {"max_bytes": self.max_bytes})
+            db.commit()
+
+    def usage(self) -> Dict:
+        from app.database import SessionLocal
+        from app.models.extraction_cache import ExtractionCacheEntry
+        with SessionLocal() as db:
+            entries, size = db.query(
+                func.count(ExtractionCacheEntry.cache_key),
+                func.coalesce(func.sum(ExtractionCacheEntry.size_bytes), 0),
+            ).one()
+        return {"entries": entries, "bytes": int(size)}
+
+_cache = None
+
+def get_extraction_cache():
+    """The configured cache backend for this process, or None when off."""
+    global _cache
+    if _cache is None and settings.EXTRACT_CACHE_BACKEND != "off":
+        max_bytes = settings.EXTRACT_CACHE_MAX_MB * 1024 * 1024
+        if settings.EXTRACT_CACHE_BACKEND == "postgres":
+            _cache = PostgresExtractionCache(max_bytes)
+        else:
+            _cache = DiskExtractionCache(settings.EXTRACT_CACHE_DIR, max_bytes)
+    return _cache
+
+def _cacheable(pages: List[Dict]) -> bool:
+    """
+    Worth keeping: some text came back and no page is waiting on an OCR
+    retry. A Textract error or a PDF nothing could be read from may well
+    extract fine next time.
+    """
+    return any((p["text"] or "").strip() for p in pages) and not any(p.get("ocr_failed") for p in pages)
+
+def extract_with_cache(extract, pdf_content, filename: str = "") -> tuple:
+    """
+    Return (pages, cache_hit) for one PDF, calling `extract(pdf_content,
+    filename)` only on a miss. Extractions with no text, or with pages
+    OCR failed on, are not cached. Cache failures never fail the extraction.
+    """
+    cache = get_extraction_cache()
+    if cache is None:
+        return extract(pdf_content, filename=filename), False
+
+    key = cache_key(pdf_content)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        log_error("extract_cache_read_failed", e)
+        cached = None
+    if cached is not None:
+        return [dict(p, source=filename) for p in cached], True
+
+    pages = extract(pdf_content, filename=filename)
+    if _cacheable(pages):
+        try:
+            cache.put(key, pages)
+        except Exception as e:
+            log_error("extract_cache_write_failed", e)
+    return pages, False
+
+def record_lookup(hit: bool):
+    _counters["hits" if hit else "misses"] += 1
+
+def cache_stats() -> Dict:
+    lookups = _counters["hits"] + _counters["misses"]
+    stats = {
+        "backend": settings.EXTRACT_CACHE_BACKEND,
+        "hits": _counters["hits"],
+        "misses": _counters["misses"],
+        "hit_rate": round(_counters["hits"] / lookups, 4) if lookups else 0.0,
+    }
+    cache = get_extraction_cache()
+    if cache is not None:
+        try:
+            stats.update(cache.usage())
+        except Exception as e:
+            log_error("extract_cache_usage_failed", e)
+    return stats
@@ -0,0 +1,71 @@
+import httpx
+from typing import Dict
+from app.config import settings
+
+PROVIDERS = ("anthropic", "openai", "gemini")
+
+class ProviderClients:
+    """
+    One pooled, keep-alive httpx.AsyncClient per LLM provider, shared by
+    every request in this worker. Created at app startup, closed at shutdown.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats = {p: {"requests": 0, "new_connections": 0, "http2_responses": 0} for p in PROVIDERS}
+
+    def _build(self, provider: str) -> httpx.AsyncClient:
+        stats = self._stats[provider]
+
+        async def trace(event: str, info: dict):
+            # Fires only when httpcore has to open a socket, not on reuse
+            if event == "connection.connect_tcp.complete":
+                stats["new_connections"] += 1
+
+        async def on_request(request: httpx.Request):
+            stats["requests"] += 1
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            if response.http_version == "HTTP/2":
+                stats["http2_responses"] += 1
+
+        return httpx.AsyncClient(
+            http2=settings.HTTP_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def start(self):
+        for provider in PROVIDERS:
+            self.get(provider)
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._clients[provider] = self._build(provider)
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> Dict:
+        """Per-provider request and connection counts, plus the reuse ratio."""
+        out = {}
+        for provider, s in self._stats.items():
+            reused = max(s["requests"] - s["new_connections"], 0)
+            out[provider] = dict(
+                s,
+                reused_connections=reused,
+                reuse_ratio=round(reused / s["requests"], 4) if s["requests"] else 0.0,
+            )
+        return out
+
+provider_clients = ProviderClients()
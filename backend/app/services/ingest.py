@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+import zipfile
+from typing import List, Dict
+from app.config import settings
+from app.services.ocr import _extract_pdf_pages
+from app.services.classify import classify_documents
+from app.services.chunker import chunk_documents
+from app.services.redact import redact_chunks
+from app.services.pool import run_in_pool
+from app.services.extract_cache import extract_with_cache, record_lookup
+from app.services.metrics import observe_stage, record_extraction
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+class _MemoryBudget:
+    """Bounds how many bytes of uncompressed PDF data are in flight at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        # A member bigger than the ceiling still runs, just on its own
+        size = min(size, self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        return size
+
+    async def release(self, size: int):
+        async with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+# Caps how many packs this uvicorn worker ingests at once
+_pack_slots = asyncio.Semaphore(settings.INGEST_MAX_PACKS_PER_WORKER)
+_memory_budget = _MemoryBudget(settings.INGEST_MEMORY_CEILING_MB * 1024 * 1024)
+
+async def spool_upload(upload_file) -> Dict:
+    """
+    Stream an upload to a temp file in one pass, hashing and sizing it as
+    it goes, so the pack is never held in memory. The caller must call
+    `discard_spool` when done.
+    """
+    start = time.perf_counter()
+    sha = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="pkh_upload_", dir=settings.INGEST_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await upload_file.read(SPOOL_CHUNK_BYTES)
+                if not block:
+                    break
+                sha.update(block)
+                size += len(block)
+                out.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    observe_stage("upload_read", time.perf_counter() - start, bytes=size)
+    return {
+        "path": path,
+        "size": size,
+        "sha256": sha.hexdigest(),
+        "filename": upload_file.filename or "",
+    }
+
+def discard_spool(spooled: Dict):
+    try:
+        os.unlink(spooled["path"])
+    except FileNotFoundError:
+        pass
+
+def is_zip_upload(spooled: Dict) -> bool:
+    return spooled["filename"].lower().endswith('.zip') or zipfile.is_zipfile(spooled["path"])
+
+def _zip_pdf_members(path: str) -> List[tuple]:
+    with zipfile.ZipFile(path) as zf:
+        return [(info.filename, info.file_size) for info in zf.infolist()
+                if info.filename.lower().endswith('.pdf')]
+
+def _extract_spooled_pdf(path: str, filename: str) -> tuple:
+    """Worker: extract a spooled single PDF through a read-only memory map."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return extract_with_cache(_extract_pdf_pages, mm, filename)
+
+def _extract_zip_member(path: str, name: str) -> tuple:
+    """Worker: read one PDF out of a spooled ZIP and extract it."""
+    with zipfile.ZipFile(path) as zf:
+        pdf_content = zf.read(name)
+    return extract_with_cache(_extract_pdf_pages, pdf_content, name)
+
+def _ms_since(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+def prepare_chunks(pages: List[Dict]) -> tuple:
+    """
+    Classify, chunk and redact extracted pages. Runs on the process pool.
+    Returns (chunks, safe_chunks, redaction report, stage timings in ms).
+    """
+    timings = {}
+    start = time.perf_counter()
+    docs = classify_documents(pages)
+    timings["classify"] = _ms_since(start)
+
+    start = time.perf_counter()
+    chunks = list(chunk_documents(docs))
+    timings["chunk"] = _ms_since(start)
+
+    start = time.perf_counter()
+    safe_chunks, redaction = redact_chunks(chunks)
+    timings["redact"] = _ms_since(start)
+    return chunks, safe_chunks, redaction, timings
+
+async def _extract_member_bounded(path: str, name: str, size: int) -> List[Dict]:
+    reserved = await _memory_budget.acquire(size)
+    try:
+        pages, cache_hit = await run_in_pool(_extract_zip_member, path, name)
+    finally:
+        await _memory_budget.release(reserved)
+    record_lookup(cache_hit)
+    return pages
+
+async def extract_upload(spooled: Dict) -> List[Dict]:
+    """
+    Extract pages from a spooled PDF or ZIP of PDFs off the event loop.
+
+    ZIP members are extracted concurrently on the process pool, each worker
+    reading its own member from the spool file, within the
+    INGEST_MEMORY_CEILING_MB budget. Pages are merged back in archive order.
+    Each PDF is looked up in the extraction cache by content hash first.
+    """
+    path = spooled["path"]
+    if not is_zip_upload(spooled):
+        pages, cache_hit = await run_in_pool(_extract_spooled_pdf, path, spooled["filename"])
+        record_lookup(cache_hit)
+        return pages
+
+    members = await asyncio.to_thread(_zip_pdf_members, path)
+    results = await asyncio.gather(*(
+        _extract_member_bounded(path, name, size) for name, size in members
+    ))
+    pages: List[Dict] = []
+    for member_pages in results:
+        pages.extend(member_pages)
+    return pages
+
+async def ingest_pack(spooled: Dict, progress=None) -> Dict:
+    """
+    Run the CPU-bound ingestion stages for one spooled pack on the process pool.
+
+    Returns {"pages", "chunks", "safe_chunks", "redaction"}; `chunks` keeps
+    the raw text for citations, `safe_chunks` is what may be sent to a model
+    and `redaction` is the PII report from redact_chunks. If given,
+    `progress(stage, info)` is awaited as each stage completes.
+    """
+    async with _pack_slots:
+        start = time.perf_counter()
+        pages = await extract_upload(spooled)
+        seconds = time.perf_counter() - start
+        observe_stage("extract", seconds, pages=len(pages))
+        record_extraction(len(pages), seconds)
+        if progress:
+            await progress("extract", {"pages": len(pages), "ms": int(seconds * 1000)})
+        if not pages:
+            return {"pages": [], "chunks": [], "safe_chunks": [], "redaction": {"counts": {}, "spans": []}}
+
+        chunks, safe_chunks, redaction, timings = await run_in_pool(prepare_chunks, pages)
+        observe_stage("classify", timings["classify"] / 1000)
+        observe_stage("chunk", timings["chunk"] / 1000, chunks=len(chunks))
+        observe_stage("redact", timings["redact"] / 1000, redactions=redaction["counts"])
+        if progress:
+            await progress("classify", {"ms": timings["classify"]})
+            await progress("chunk", {"chunks": len(chunks), "ms": timings["chunk"]})
+            await progress("redact", {"counts": redaction["counts"], "ms": timings["redact"]})
+        return {"pages": pages, "chunks": chunks, "safe_chunks": safe_chunks, "redaction": redaction}
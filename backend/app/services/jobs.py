@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+from sqlalchemy import or_, and_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.job import AnalysisJob
+from app.services.pipeline import analyze_spooled, PackError
+from app.utils.log import log_event, log_error
+
+# A job in one of these states answers a re-upload of the same file
+_REUSABLE = ("queued", "running", "succeeded")
+
+async def enqueue_job(db: AsyncSession, spooled: Dict) -> tuple:
+    """
+    Queue a spooled upload for the worker processes.
+
+    Idempotent on the upload's SHA-256: if the same file is already queued,
+    running or done, that job is returned instead. Returns (job, created).
+    A partial unique index backs this up: of two concurrent uploads of one
+    file, the second insert does nothing and gets the first's job. The
+    spool file is moved into JOB_STORAGE_DIR when a job is created.
+    """
+    while True:
+        existing = await _live_job(db, spooled["sha256"])
+        if existing:
+            return existing, False
+
+        os.makedirs(settings.JOB_STORAGE_DIR, exist_ok=True)
+        upload_path = os.path.join(settings.JOB_STORAGE_DIR, f"{spooled['sha256']}-{uuid.uuid4().hex[:8]}.upload")
+        job_id = await db.scalar(
+            insert(AnalysisJob)
+            .values(
+                status="queued",
+                upload_sha256=spooled["sha256"],
+                upload_path=upload_path,
+                filename=spooled["filename"] or "unknown",
+                file_size_bytes=spooled["size"],
+                attempts=0,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                run_after=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(
+                index_elements=[AnalysisJob.upload_sha256],
+                index_where=AnalysisJob.status.in_(_REUSABLE),
+            )
+            .returning(AnalysisJob.id)
+        )
+        if job_id is None:
+            # Another upload of the file got in first; return its job
+            await db.rollback()
+            continue
+        try:
+            # Moved before the commit makes the job visible to workers. A copy
+            # when the spool and job storage are on different filesystems
+            await asyncio.to_thread(shutil.move, spooled["path"], upload_path)
+        except Exception:
+            await db.rollback()
+            raise
+        await db.commit()
+        return await db.get(AnalysisJob, job_id), True
+
+async def _live_job(db: AsyncSession, sha256: str) -> AnalysisJob | None:
+    return await db.scalar(
+        select(AnalysisJob)
+        .where(AnalysisJob.upload_sha256 == sha256, AnalysisJob.status.in_(_REUSABLE))
+        .order_by(AnalysisJob.id.desc())
+        .limit(1)
+    )
+
+def claim_next_job(db: Session, worker_id: str) -> AnalysisJob | None:
+    """
+    Lock and mark running the oldest runnable job. FOR UPDATE SKIP LOCKED
+    lets any number of workers poll the same table without blocking each
+    other. Running jobs whose lock has gone stale (their worker stopped
+    sending heartbeats) are picked up again, or failed if that was their
+    last attempt.
+    """
+    while True:
+        now = datetime.utcnow()
+        stale = now - timedelta(minutes=settings.JOB_STALE_AFTER_MINUTES)
+        job = (
+            db.query(AnalysisJob)
+            .filter(or_(
+                and_(AnalysisJob.status == "queued", AnalysisJob.run_after <= now),
+                and_(AnalysisJob.status == "running", AnalysisJob.locked_at < stale),
+            ))
+            .order_by(AnalysisJob.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+            .first()
+        )
+        if job is None:
+            db.commit()
+            return None
+
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            # Its worker died on every attempt; a pack that crashes workers is not retried forever
+            job.status, job.locked_at = "failed", None
+            job.error = job.error or f"Worker {job.locked_by} stopped responding on the last attempt"
+            db.commit()
+            _discard_upload(job)
+            log_event("job_failed", logging.ERROR, job_id=job.id, attempts=job.attempts, error=job.error)
+            continue
+
+        job.status = "running"
+        job.stage = "queued"
+        job.attempts += 1
+        job.locked_at = now
+        job.locked_by = worker_id
+        db.commit()
+        db.refresh(job)
+        return job
+
+def heartbeat(db: Session, job: AnalysisJob) -> bool:
+    """
+    Move a running job's lock forward, so it is not taken for stale while
+    a long analysis is still working. False if another worker has taken it.
+    """
+    refreshed = (
+        db.query(AnalysisJob)
+        .filter(AnalysisJob.id == job.id, AnalysisJob.locked_by == job.locked_by, AnalysisJob.status == "running")
+        .update({AnalysisJob.locked_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return bool(refreshed)
+
+def _discard_upload(job: AnalysisJob):
+    try:
+        os.unlink(job.upload_path)
+    except FileNotFoundError:
+        pass
+
+async def run_job(db: Session, job: AnalysisJob):
+    """Run the analysis pipeline for a claimed job and record the outcome."""
+    spooled = {
+        "path": job.upload_path,
+        "size": job.file_size_bytes,
+        "sha256": job.upload_sha256,
+        "filename": job.filename,
+    }
+
+    async def emit(event: str, data: Dict):
+        if event == "stage" and job.stage != data["stage"]:
+            job.stage = data["stage"]
+            job.locked_at = datetime.utcnow()
+            db.commit()
+
+    async def beat():
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                if not heartbeat(db, job):
+                    log_event("job_lock_lost", logging.WARNING, job_id=job.id, worker_id=job.locked_by)
+                    return
+            except Exception as e:
+                db.rollback()
+                log_error("job_heartbeat_failed", e, job_id=job.id)
+
+    beating = asyncio.create_task(beat())
+    try:
+        result = await analyze_spooled(spooled, emit=emit)
+    except PackError as e:
+        # The pack itself is unreadable; retrying will not help
+        db.rollback()
+        job.status, job.error, job.locked_at = "failed", e.detail, None
+        db.commit()
+        _discard_upload(job)
+        log_event("job_failed", logging.ERROR, job_id=job.id, error=e.detail)
+        return
+    except Exception as e:
+        db.rollback()
+        job.error = f"{type(e).__name__}: {e}"
+        job.locked_at = None
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            job.status = "queued"
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+            log_error("job_retry", e, job_id=job.id, attempt=job.attempts, backoff_seconds=backoff)
+        else:
+            job.status = "failed"
+            _discard_upload(job)
+            log_error("job_failed", e, job_id=job.id, attempts=job.attempts)
+        db.commit()
+        return
+    finally:
+        beating.cancel()
+
+    job.status, job.stage, job.error, job.locked_at = "succeeded", "done", None, None
+    job.analysis_id = result["analysis_id"]
+    db.commit()
+    _discard_upload(job)
+    log_event("job_succeeded", job_id=job.id, analysis_id=job.analysis_id)
+
+def job_status(job: AnalysisJob, report_markdown: str | None = None) -> Dict:
+    status = {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "analysis_id": job.analysis_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+    if report_markdown is not None:
+        status["report_markdown"] = report_markdown
+    return status
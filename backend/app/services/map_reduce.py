@@ -0,0 +1,82 @@
+import asyncio
+from typing import List, Dict, Tuple
+from app.config import settings
+from app.services.model_router import analyze_with_router, stream_with_router
+from app.services.prompts import build_prompt, build_map_prompt, render_chunk
+from app.utils.cost_calculator import merge_usage
+from app.utils.tokens import estimate_tokens
+from app.utils.log import log_event
+
+def needs_map_reduce(prompt: dict) -> bool:
+    """Whether a single-call prompt is too big and should be map-reduced."""
+    if settings.ANALYSIS_MODE == "map_reduce":
+        return True
+    if settings.ANALYSIS_MODE == "single":
+        return False
+    if "stats" in prompt:
+        # Before any trimming to PROMPT_TOKEN_BUDGET: a pack that only fits trimmed is map-reduced
+        size = prompt["stats"]["untrimmed_tokens"]
+    else:
+        size = estimate_tokens(prompt["system"]) + estimate_tokens(prompt["user"])
+    return size > settings.MAP_REDUCE_THRESHOLD_TOKENS
+
+def group_batches(chunks: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Group chunks by doc_type (in order of first appearance), then split each
+    group into batches of at most `max_tokens` estimated tokens.
+    """
+    by_type: Dict[str, List[Dict]] = {}
+    for c in chunks:
+        if c.get("content"):
+            by_type.setdefault(c["meta"]["doc_type"], []).append(c)
+
+    batches = []
+    for doc_type, group in by_type.items():
+        current, used = [], 0
+        for c in group:
+            size = estimate_tokens(render_chunk(c))
+            if current and used + size > max_tokens:
+                batches.append({"doc_type": doc_type, "chunks": current})
+                current, used = [], 0
+            current.append(c)
+            used += size
+        if current:
+            batches.append({"doc_type": doc_type, "chunks": current})
+    return batches
+
+def _page_span(chunks: List[Dict]) -> str:
+    first = min(c["meta"]["page"] for c in chunks)
+    last = max(c["meta"].get("page_end", c["meta"]["page"]) for c in chunks)
+    return f"p.{first}" if first == last else f"p.{first}-{last}"
+
+async def map_reduce_analyze(context: Dict, meta: dict, on_token=None) -> Tuple[str, Dict]:
+    """
+    Summarise each batch concurrently (map), then write the Nick-style
+    report from the page-referenced summaries (reduce).
+
+    Returns the report text and the usage of every call combined. With
+    `on_token`, the reduce call streams its text to it.
+    """
+    batches = group_batches(context["chunks"], settings.MAP_BATCH_TOKENS)
+    semaphore = asyncio.Semaphore(settings.MAP_REDUCE_CONCURRENCY)
+
+    async def summarise(batch: Dict) -> Tuple[str, Dict]:
+        async with semaphore:
+            return await analyze_with_router(build_map_prompt(batch["doc_type"], batch["chunks"]), meta)
+
+    log_event("map_reduce", batches=len(batches), concurrency=settings.MAP_REDUCE_CONCURRENCY)
+    results = await asyncio.gather(*(summarise(b) for b in batches))
+
+    reduce_context = {
+        "section_summaries": [
+            {"doc_type": b["doc_type"], "pages": _page_span(b["chunks"]), "summary": text}
+            for b, (text, _) in zip(batches, results)
+        ],
+        "kb": context["kb"],
+    }
+    reduce_prompt = build_prompt(reduce_context)
+    if on_token:
+        report, reduce_usage = await stream_with_router(reduce_prompt, meta, on_token)
+    else:
+        report, reduce_usage = await analyze_with_router(reduce_prompt, meta)
+    return report, merge_usage(*(usage for _, usage in results), reduce_usage)
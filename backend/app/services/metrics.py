@@ -0,0 +1,103 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from app.utils.log import log_event
+
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "pkh_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=_SECONDS_BUCKETS,
+)
+PAGES = Counter("pkh_pages_extracted_total", "PDF pages extracted")
+PAGES_PER_SECOND = Histogram(
+    "pkh_extract_pages_per_second", "Extraction throughput per pack",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+PROVIDER_SECONDS = Histogram(
+    "pkh_provider_call_seconds", "LLM provider call duration", ["provider", "mode"], buckets=_SECONDS_BUCKETS,
+)
+PROVIDER_TOKENS = Counter("pkh_provider_tokens_total", "LLM tokens used", ["provider", "direction"])
+PROVIDER_TOKENS_PER_SECOND = Histogram(
+    "pkh_provider_output_tokens_per_second", "LLM output tokens per second of call time", ["provider"],
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200, 300),
+)
+PROVIDER_ERRORS = Counter("pkh_provider_errors_total", "Failed LLM provider calls", ["provider", "reason"])
+PROVIDER_RETRIES = Counter("pkh_provider_retries_total", "Retried LLM provider calls", ["provider", "reason"])
+PROVIDER_HEDGES = Counter("pkh_provider_hedges_total", "Hedged LLM provider calls", ["provider", "backup"])
+PROMPT_TOKENS_SAVED = Counter(
+    "pkh_prompt_tokens_saved_total", "Estimated input tokens saved by compact, deduplicated prompts",
+)
+CIRCUITS_OPENED = Counter("pkh_provider_circuit_opened_total", "Provider circuit breakers opened", ["provider"])
+
+def observe_stage(stage: str, seconds: float, **fields):
+    """Record a stage timed elsewhere (e.g. in a pool worker)."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    log_event("stage", stage=stage, ms=round(seconds * 1000, 1), **fields)
+
+@contextmanager
+def timed(stage: str, **fields):
+    """
+    Time the block as `stage`. The yielded dict is logged with the timing,
+    so the block can add fields: `with timed("rag") as info: info["kept"] = 12`.
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **fields)
+
+def record_extraction(pages: int, seconds: float):
+    PAGES.inc(pages)
+    if pages and seconds > 0:
+        PAGES_PER_SECOND.observe(pages / seconds)
+
+def record_provider_call(provider: str, seconds: float, input_tokens: int, output_tokens: int,
+                         mode: str = "call", cache_read: int = 0, cache_write: int = 0):
+    PROVIDER_SECONDS.labels(provider, mode).observe(seconds)
+    PROVIDER_TOKENS.labels(provider, "input").inc(input_tokens)
+    PROVIDER_TOKENS.labels(provider, "output").inc(output_tokens)
+    PROVIDER_TOKENS.labels(provider, "cache_read").inc(cache_read)
+    PROVIDER_TOKENS.labels(provider, "cache_write").inc(cache_write)
+    # A batch's duration is mostly queueing, not generation
+    if output_tokens and seconds > 0 and mode != "batch":
+        PROVIDER_TOKENS_PER_SECOND.labels(provider).observe(output_tokens / seconds)
+    log_event(
+        "provider_usage", provider=provider, mode=mode, ms=round(seconds * 1000, 1),
+        input_tokens=input_tokens, output_tokens=output_tokens,
+        cache_read_tokens=cache_read, cache_write_tokens=cache_write,
+    )
+
+def record_prompt_savings(tokens: int):
+    PROMPT_TOKENS_SAVED.inc(tokens)
+
+def record_provider_error(provider: str, reason: str):
+    PROVIDER_ERRORS.labels(provider, reason).inc()
+
+def record_provider_retry(provider: str, reason: str):
+    PROVIDER_RETRIES.labels(provider, reason).inc()
+
+def record_provider_hedge(provider: str, backup: str):
+    PROVIDER_HEDGES.labels(provider, backup).inc()
+
+def record_circuit_opened(provider: str):
+    CIRCUITS_OPENED.labels(provider).inc()
+
+def render_metrics() -> tuple:
+    """
+    (body, content type) for the /metrics endpoint. With
+    PROMETHEUS_MULTIPROC_DIR set (an empty, writable directory shared by
+    every process), metrics from the ingestion pool and other workers are
+    aggregated; otherwise only this process's own are exposed.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,46 +1,51 @@
-import httpx
+import hashlib
+import json
+import logging
+import time
 from app.config import settings
-from typing import Tuple, Dict
+from app.services.metrics import record_provider_call
+from app.services.routing import router
+from app.utils.cost_calculator import call_usage
+from app.utils.log import log_event
+from app.services.http_clients import provider_clients
+from typing import Tuple, Dict, List, Callable, Awaitable, AsyncIterator
+
+MODELS = {
+    "anthropic": "claude-sonnet-4-20250514",
+    "openai": "gpt-5",
+    "gemini": "gemini-1.5-pro",
+}
 
 ANTHROPIC = "https://api.anthropic.com/v1/messages"
-OPENAI_RESPONSES = "https://api.openai.com/v1/responses"
-GOOGLE = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-pro:generateContent"
+OPENAI_CHAT = "https://api.openai.com/v1/chat/completions"
+GOOGLE = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELS['gemini']}:generateContent"
+GOOGLE_STREAM = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELS['gemini']}:streamGenerateContent"
 
-async def _anthropic_call(prompt: dict) -> Tuple[str, Dict]:
+# Receives each text delta as it streams in
+TokenCallback = Callable[[str], Awaitable[None]]
+
+def _anthropic_request(prompt: dict) -> Tuple[Dict, Dict]:
     headers = {
         "x-api-key": settings.ANTHROPIC_API_KEY or "",
         "anthropic-version": "2023-06-01",
     }
+    system = {"type": "text", "text": prompt["system"]}
+    if settings.PROMPT_CACHE:
+        # The system prompt is the static prefix (instructions + knowledge base)
+        system["cache_control"] = {"type": "ephemeral"}
     payload = {
-        "model": "claude-sonnet-4-20250514",
+        "model": MODELS["anthropic"],
         "max_tokens": 4000,
-        "system": prompt["system"],
+        "system": [system],
         "messages": [{"role": "user", "content": prompt["user"]}],
         "temperature": 0.2,
     }
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(ANTHROPIC, headers=headers, json=payload)
-        if r.status_code != 200:
-            print(f"Anthropic error: {r.status_code} - {r.text}")
-        r.raise_for_status()
-        data = r.json()
-        usage = data.get("usage", {})
-        input_tokens = usage.get("input_tokens", 0)
-        output_tokens = usage.get("output_tokens", 0)
-        print(f"✅ Anthropic usage - Input: {input_tokens} tokens, Output: {output_tokens} tokens, Total: {input_tokens + output_tokens} tokens")
-        
-        usage_stats = {
-            "anthropic_input_tokens": input_tokens,
-            "anthropic_output_tokens": output_tokens,
-            "openai_input_tokens": 0,
-            "openai_output_tokens": 0
-        }
-        return data["content"][0]["text"], usage_stats
+    return headers, payload
 
-async def _openai_call(prompt: dict) -> Tuple[str, Dict]:
+def _openai_request(prompt: dict) -> Tuple[Dict, Dict]:
     headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY or ''}"}
     payload = {
-        "model": "gpt-5",
+        "model": MODELS["openai"],
         "messages": [
             {"role": "system", "content": prompt["system"]},
             {"role": "user", "content": prompt["user"]},
@@ -48,64 +53,223 @@ async def _openai_call(prompt: dict) -> Tuple[str, Dict]:
         "temperature": 0.2,
         "max_completion_tokens": 4000,
     }
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(OPENAI_RESPONSES, headers=headers, json=payload)
-        if r.status_code != 200:
-            print(f"OpenAI error: {r.status_code} - {r.text}")
-        r.raise_for_status()
-        data = r.json()
-        usage = data.get("usage", {})
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
-        total_tokens = usage.get("total_tokens", 0)
-        print(f"✅ OpenAI usage - Prompt: {prompt_tokens} tokens, Completion: {completion_tokens} tokens, Total: {total_tokens} tokens")
-        
-        usage_stats = {
-            "anthropic_input_tokens": 0,
-            "anthropic_output_tokens": 0,
-            "openai_input_tokens": prompt_tokens,
-            "openai_output_tokens": completion_tokens
-        }
-        return data["choices"][0]["message"]["content"], usage_stats
+    if settings.PROMPT_CACHE:
+        # Caching is automatic; the key keeps same-prefix requests on the same cache
+        payload["prompt_cache_key"] = "pkh-" + hashlib.sha256(prompt["system"].encode()).hexdigest()[:16]
+    return headers, payload
 
-async def _gemini_call(prompt: dict) -> Tuple[str, Dict]:
+def _gemini_request(prompt: dict) -> Tuple[Dict, Dict]:
     params = {"key": settings.GOOGLE_API_KEY or ""}
     payload = {
         "contents": [{"parts": [{"text": prompt["system"] + "\n\n" + prompt["user"]}]}]
     }
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(GOOGLE, params=params, json=payload)
-        if r.status_code != 200:
-            print(f"Gemini error: {r.status_code} - {r.text}")
-        r.raise_for_status()
-        data = r.json()
-        usage = data.get("usageMetadata", {})
-        prompt_tokens = usage.get("promptTokenCount", 0)
-        completion_tokens = usage.get("candidatesTokenCount", 0)
-        total_tokens = usage.get("totalTokenCount", 0)
-        print(f"✅ Gemini usage - Prompt: {prompt_tokens} tokens, Completion: {completion_tokens} tokens, Total: {total_tokens} tokens")
-        
-        usage_stats = {
-            "anthropic_input_tokens": 0,
-            "anthropic_output_tokens": 0,
-            "openai_input_tokens": 0,
-            "openai_output_tokens": 0
-        }
-        return data["candidates"][0]["content"]["parts"][0]["text"], usage_stats
+    return params, payload
+
+async def _sse_events(response) -> AsyncIterator[Dict]:
+    """Decode the JSON `data:` lines of a server-sent event stream."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        yield json.loads(data)
+
+def _log_provider_error(provider: str, response):
+    log_event("provider_error", logging.ERROR, provider=provider, status=response.status_code, body=response.text[:1000])
+
+async def _raise_for_stream_status(response, provider: str):
+    if response.status_code != 200:
+        await response.aread()
+        _log_provider_error(provider, response)
+    response.raise_for_status()
+
+def _anthropic_usage(usage: Dict, batch: bool = False) -> Dict:
+    # input_tokens already excludes the cached prefix, counted as read or written
+    return call_usage(
+        "anthropic", MODELS["anthropic"],
+        usage.get("input_tokens") or 0,
+        usage.get("output_tokens") or 0,
+        usage.get("cache_read_input_tokens") or 0,
+        usage.get("cache_creation_input_tokens") or 0,
+        batch=batch,
+    )
+
+def _openai_usage(usage: Dict, batch: bool = False) -> Dict:
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return call_usage(
+        "openai", MODELS["openai"],
+        (usage.get("prompt_tokens") or 0) - cached,
+        usage.get("completion_tokens") or 0,
+        cached,
+        batch=batch,
+    )
+
+def _gemini_usage(usage: Dict) -> Dict:
+    cached = usage.get("cachedContentTokenCount") or 0
+    return call_usage(
+        "gemini", MODELS["gemini"],
+        (usage.get("promptTokenCount") or 0) - cached,
+        # Thinking tokens are billed as output
+        (usage.get("candidatesTokenCount") or 0) + (usage.get("thoughtsTokenCount") or 0),
+        cached,
+    )
+
+def _record_usage(provider: str, start: float, usage_stats: Dict, mode: str = "call"):
+    record_provider_call(
+        provider, time.perf_counter() - start,
+        usage_stats[f"{provider}_input_tokens"], usage_stats[f"{provider}_output_tokens"], mode=mode,
+        cache_read=usage_stats[f"{provider}_cache_read_tokens"],
+        cache_write=usage_stats[f"{provider}_cache_write_tokens"],
+    )
+
+async def _anthropic_call(prompt: dict) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    headers, payload = _anthropic_request(prompt)
+    client = provider_clients.get("anthropic")
+    r = await client.post(ANTHROPIC, headers=headers, json=payload)
+    if r.status_code != 200:
+        _log_provider_error("anthropic", r)
+    r.raise_for_status()
+    data = r.json()
+    usage_stats = _anthropic_usage(data.get("usage", {}))
+    _record_usage("anthropic", start, usage_stats)
+    return data["content"][0]["text"], usage_stats
+
+async def _anthropic_stream(prompt: dict, on_token: TokenCallback) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    headers, payload = _anthropic_request(prompt)
+    payload["stream"] = True
+    parts, usage = [], {}
+    client = provider_clients.get("anthropic")
+    async with client.stream("POST", ANTHROPIC, headers=headers, json=payload) as r:
+        await _raise_for_stream_status(r, "anthropic")
+        async for event in _sse_events(r):
+            kind = event.get("type")
+            if kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                parts.append(event["delta"]["text"])
+                await on_token(event["delta"]["text"])
+            elif kind == "message_start":
+                usage.update(event["message"].get("usage", {}))
+            elif kind == "message_delta":
+                usage.update(event.get("usage") or {})
+            elif kind == "error":
+                raise RuntimeError(f"Anthropic stream error: {event.get('error')}")
+    usage_stats = _anthropic_usage(usage)
+    _record_usage("anthropic", start, usage_stats, mode="stream")
+    return "".join(parts), usage_stats
+
+async def _openai_call(prompt: dict) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    headers, payload = _openai_request(prompt)
+    client = provider_clients.get("openai")
+    r = await client.post(OPENAI_CHAT, headers=headers, json=payload)
+    if r.status_code != 200:
+        _log_provider_error("openai", r)
+    r.raise_for_status()
+    data = r.json()
+    usage_stats = _openai_usage(data.get("usage", {}))
+    _record_usage("openai", start, usage_stats)
+    return data["choices"][0]["message"]["content"], usage_stats
+
+async def _openai_stream(prompt: dict, on_token: TokenCallback) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    headers, payload = _openai_request(prompt)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    parts, usage = [], {}
+    client = provider_clients.get("openai")
+    async with client.stream("POST", OPENAI_CHAT, headers=headers, json=payload) as r:
+        await _raise_for_stream_status(r, "openai")
+        async for event in _sse_events(r):
+            for choice in event.get("choices") or []:
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    parts.append(text)
+                    await on_token(text)
+            if event.get("usage"):
+                usage = event["usage"]
+    usage_stats = _openai_usage(usage)
+    _record_usage("openai", start, usage_stats, mode="stream")
+    return "".join(parts), usage_stats
+
+async def _gemini_call(prompt: dict) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    params, payload = _gemini_request(prompt)
+    client = provider_clients.get("gemini")
+    r = await client.post(GOOGLE, params=params, json=payload)
+    if r.status_code != 200:
+        _log_provider_error("gemini", r)
+    r.raise_for_status()
+    data = r.json()
+    usage_stats = _gemini_usage(data.get("usageMetadata", {}))
+    _record_usage("gemini", start, usage_stats)
+    return data["candidates"][0]["content"]["parts"][0]["text"], usage_stats
+
+async def _gemini_stream(prompt: dict, on_token: TokenCallback) -> Tuple[str, Dict]:
+    start = time.perf_counter()
+    params, payload = _gemini_request(prompt)
+    params["alt"] = "sse"
+    parts, usage = [], {}
+    client = provider_clients.get("gemini")
+    async with client.stream("POST", GOOGLE_STREAM, params=params, json=payload) as r:
+        await _raise_for_stream_status(r, "gemini")
+        async for event in _sse_events(r):
+            for candidate in event.get("candidates") or []:
+                for part in (candidate.get("content") or {}).get("parts") or []:
+                    if part.get("text"):
+                        parts.append(part["text"])
+                        await on_token(part["text"])
+            if event.get("usageMetadata"):
+                usage = event["usageMetadata"]
+    usage_stats = _gemini_usage(usage)
+    _record_usage("gemini", start, usage_stats, mode="stream")
+    return "".join(parts), usage_stats
+
+def _api_key(provider: str) -> str | None:
+    return {
+        "anthropic": settings.ANTHROPIC_API_KEY,
+        "openai": settings.OPENAI_API_KEY,
+        "gemini": settings.GOOGLE_API_KEY,
+    }[provider]
+
+def provider_preference(meta: dict) -> List[str]:
+    """Configured providers in the order they should be tried for this pack."""
+    order = ["gemini"] if meta.get("size", 0) > 800 else []
+    order += [p for p in ("anthropic", "openai", "gemini") if p not in order]
+    return [p for p in order if _api_key(p)]
+
+def preferred_provider(meta: dict) -> str | None:
+    """
+    The provider this pack is meant for, whatever the router's current view
+    of provider health: what its prompt is sized for and its cached report
+    is looked up under.
+    """
+    preference = provider_preference(meta)
+    return preference[0] if preference else None
 
 async def analyze_with_router(prompt: dict, meta: dict) -> Tuple[str, Dict]:
-    size = meta.get("size", 0)
-    try:
-        if size > 800 and settings.GOOGLE_API_KEY:
-            return await _gemini_call(prompt)
-        if settings.ANTHROPIC_API_KEY:
-            return await _anthropic_call(prompt)
-        if settings.OPENAI_API_KEY:
-            return await _openai_call(prompt)
-        raise RuntimeError("No LLM provider configured")
-    except Exception:
-        if settings.OPENAI_API_KEY:
-            return await _openai_call(prompt)
-        if settings.GOOGLE_API_KEY:
-            return await _gemini_call(prompt)
-        raise
+    """
+    Route one prompt across the configured providers, with retries,
+    circuit breakers and (if ROUTER_HEDGE_PERCENTILE is set) hedging.
+    The usage's "provider" and "model" say which one answered.
+    """
+    calls = {"gemini": _gemini_call, "anthropic": _anthropic_call, "openai": _openai_call}
+    return await router.run(provider_preference(meta), calls, prompt, hedge=True)
+
+async def stream_with_router(prompt: dict, meta: dict, on_token: TokenCallback) -> Tuple[str, Dict]:
+    """
+    Same routing as analyze_with_router, but streams text deltas to
+    `on_token` as they arrive. Retries and falls back only while no text
+    has been sent, so the client never sees two reports spliced, and never
+    hedges. The usage says who answered, as for analyze_with_router.
+    """
+    streams = {"gemini": _gemini_stream, "anthropic": _anthropic_stream, "openai": _openai_stream}
+    sent = False
+
+    async def forward(text: str):
+        nonlocal sent
+        sent = True
+        await on_token(text)
+
+    return await router.run(provider_preference(meta), streams, prompt, forward, may_retry=lambda: not sent)
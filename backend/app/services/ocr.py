@@ -1,9 +1,14 @@
 import io
-import zipfile
-from typing import List, Dict
-from pypdf import PdfReader
-from pdfminer.high_level import extract_text
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator
+from pypdf import PdfReader, PdfWriter
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
 from app.config import settings
+from app.services.metrics import timed
+from app.utils.log import log_error
 
 # Optional: AWS Textract client if scans are poor
 try:
@@ -12,53 +17,95 @@ try:
 except Exception:
     _textract = None
 
-async def ocr_extract(upload_file) -> List[Dict]:
-    content = await upload_file.read()
-    pages: List[Dict] = []
-    
-    # Check if it's a ZIP file
-    filename_lower = upload_file.filename.lower() if upload_file.filename else ""
-    is_zip = filename_lower.endswith('.zip') or zipfile.is_zipfile(io.BytesIO(content))
-    
-    if is_zip:
-        # Handle ZIP file - extract all PDFs inside
-        with zipfile.ZipFile(io.BytesIO(content)) as zf:
-            for file_info in zf.namelist():
-                if file_info.lower().endswith('.pdf'):
-                    pdf_content = zf.read(file_info)
-                    pdf_pages = _extract_pdf_pages(pdf_content, filename=file_info)
-                    pages.extend(pdf_pages)
-    else:
-        # Handle single PDF
-        pages = _extract_pdf_pages(content, filename=upload_file.filename)
-    
-    return pages
+def iter_pdf_pages(pdf_content, filename: str = "") -> Iterator[Dict]:
+    """
+    Parse a PDF once and yield its pages one at a time.
 
-def _extract_pdf_pages(pdf_content: bytes, filename: str = "") -> List[Dict]:
-    """Extract text from a single PDF."""
-    pages: List[Dict] = []
-    
+    `pdf_content` is the PDF as bytes or a seekable binary file object
+    (e.g. an mmap of a spooled upload).
+
+    The document, its xref table and the font/resource cache are shared by
+    every page, so cost grows linearly with page count. The text for each
+    page is identical to pdfminer's `extract_text(..., page_numbers=[i])`.
+    """
+    rsrcmgr = PDFResourceManager(caching=True)
+    laparams = LAParams()
     try:
-        reader = PdfReader(io.BytesIO(pdf_content))
-        for i, _ in enumerate(reader.pages):
-            # First try native text
+        fp = io.BytesIO(pdf_content) if isinstance(pdf_content, bytes) else pdf_content
+        for i, page in enumerate(PDFPage.get_pages(fp, caching=True)):
             text = ""
+            output = io.StringIO()
+            device = TextConverter(rsrcmgr, output, laparams=laparams)
             try:
-                text = extract_text(io.BytesIO(pdf_content), page_numbers=[i]) or ""
+                PDFPageInterpreter(rsrcmgr, device).process_page(page)
+                text = output.getvalue()
             except Exception:
                 text = ""
-            
-            # Fallback to Textract if configured and empty
-            if not text and settings.USE_TEXTRACT and _textract is not None:
-                resp = _textract.detect_document_text(Document={"Bytes": pdf_content})
-                text = "\n".join(b["Text"] for b in resp.get("Blocks", []) if b.get("BlockType") == "LINE")
-            
-            pages.append({
+            finally:
+                device.close()
+
+            yield {
                 "page": i + 1,
                 "text": text,
                 "source": filename  # Track which PDF this came from
-            })
+            }
     except Exception as e:
-        print(f"Error extracting PDF {filename}: {e}")
-    
+        log_error("pdf_extract_failed", e, source=filename)
+
+def _single_page_pdf(reader: PdfReader, index: int) -> bytes:
+    writer = PdfWriter()
+    writer.add_page(reader.pages[index])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+def _textract_page(client, page_pdf: bytes) -> str:
+    resp = client.detect_document_text(Document={"Bytes": page_pdf})
+    return "\n".join(b["Text"] for b in resp.get("Blocks", []) if b.get("BlockType") == "LINE")
+
+def ocr_fallback(pdf_content, pages: List[Dict], filename: str = "", client=None) -> List[Dict]:
+    """
+    OCR only the pages that came back without a text layer.
+
+    Each empty page is cut out as a single-page PDF and sent to Textract,
+    at most TEXTRACT_CONCURRENCY at a time; results are written back onto
+    the matching page dicts. `client` defaults to the module Textract
+    client and can be any object with `detect_document_text`. Pages that
+    could not be OCR'd keep their empty text and are marked `ocr_failed`.
+    """
+    client = client or _textract
+    # pdfminer emits a bare form feed for pages without a text layer
+    missing = [p for p in pages if not (p["text"] or "").strip()]
+    if client is None or not missing:
+        return pages
+
+    try:
+        reader = PdfReader(io.BytesIO(pdf_content) if isinstance(pdf_content, bytes) else pdf_content)
+        page_pdfs = [_single_page_pdf(reader, p["page"] - 1) for p in missing]
+    except Exception as e:
+        log_error("ocr_split_failed", e, source=filename)
+        for page in missing:
+            page["ocr_failed"] = True
+        return pages
+
+    with timed("textract", source=filename, pages=len(missing)), \
+            ThreadPoolExecutor(max_workers=settings.TEXTRACT_CONCURRENCY) as pool:
+        futures = [pool.submit(_textract_page, client, page_pdf) for page_pdf in page_pdfs]
+        for page, future in zip(missing, futures):
+            try:
+                page["text"] = future.result()
+            except Exception as e:
+                page["ocr_failed"] = True
+                log_error("textract_failed", e, source=filename, page=page["page"])
+
+    return pages
+
+def _extract_pdf_pages(pdf_content, filename: str = "") -> List[Dict]:
+    """Extract text from a single PDF."""
+    pages = list(iter_pdf_pages(pdf_content, filename=filename))
+
+    # Fallback to Textract for the empty pages if configured
+    if settings.USE_TEXTRACT and _textract is not None:
+        ocr_fallback(pdf_content, pages, filename=filename)
+
     return pages
@@ -7,26 +7,14 @@ from reportlab.lib.colors import HexColor
 from io import BytesIO
 from datetime import datetime
 import re
+from functools import lru_cache
 
 
-def markdown_to_pdf(report_markdown: str, property_address: str = None) -> BytesIO:
-    """
-    Convert the markdown analysis report to a professional PDF.
-    Returns a BytesIO buffer containing the PDF.
-    """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=0.75*inch,
-        leftMargin=0.75*inch,
-        topMargin=0.75*inch,
-        bottomMargin=0.75*inch
-    )
-    
-    # Styles
+@lru_cache(maxsize=1)
+def _styles() -> dict:
+    """The report's paragraph styles, built once per process."""
     styles = getSampleStyleSheet()
-    
+
     # Custom styles
     title_style = ParagraphStyle(
         'CustomTitle',
@@ -37,7 +25,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         alignment=TA_CENTER,
         fontName='Helvetica-Bold'
     )
-    
+
     header_style = ParagraphStyle(
         'CustomHeader',
         parent=styles['Heading2'],
@@ -47,7 +35,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         spaceBefore=14,
         fontName='Helvetica-Bold'
     )
-    
+
     subheader_style = ParagraphStyle(
         'CustomSubHeader',
         parent=styles['Heading3'],
@@ -57,7 +45,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         spaceBefore=10,
         fontName='Helvetica-Bold'
     )
-    
+
     body_style = ParagraphStyle(
         'CustomBody',
         parent=styles['BodyText'],
@@ -66,7 +54,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         textColor=HexColor('#333333'),
         spaceAfter=6
     )
-    
+
     bullet_style = ParagraphStyle(
         'CustomBullet',
         parent=styles['BodyText'],
@@ -76,7 +64,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         leftIndent=20,
         spaceAfter=6
     )
-    
+
     verdict_red_style = ParagraphStyle(
         'VerdictRed',
         parent=body_style,
@@ -84,7 +72,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         fontName='Helvetica-Bold',
         fontSize=12
     )
-    
+
     verdict_amber_style = ParagraphStyle(
         'VerdictAmber',
         parent=body_style,
@@ -92,7 +80,7 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         fontName='Helvetica-Bold',
         fontSize=12
     )
-    
+
     verdict_green_style = ParagraphStyle(
         'VerdictGreen',
         parent=body_style,
@@ -100,6 +88,44 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         fontName='Helvetica-Bold',
         fontSize=12
     )
+    return {
+        "title": title_style,
+        "header": header_style,
+        "subheader": subheader_style,
+        "body": body_style,
+        "bullet": bullet_style,
+        "verdict_red": verdict_red_style,
+        "verdict_amber": verdict_amber_style,
+        "verdict_green": verdict_green_style,
+    }
+
+
+def markdown_to_pdf(report_markdown: str, property_address: str = None, analysis_date: datetime = None) -> BytesIO:
+    """
+    Convert the markdown analysis report to a professional PDF.
+    Returns a BytesIO buffer containing the PDF.
+
+    Output is byte-for-byte reproducible for the same inputs (ReportLab's
+    invariant mode, and `analysis_date` rather than the clock when given),
+    so a cached copy can stand in for a fresh render.
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=0.75*inch,
+        leftMargin=0.75*inch,
+        topMargin=0.75*inch,
+        bottomMargin=0.75*inch,
+        invariant=1
+    )
+    
+    styles = _styles()
+    title_style, header_style, subheader_style = styles["title"], styles["header"], styles["subheader"]
+    body_style, bullet_style = styles["body"], styles["bullet"]
+    verdict_red_style = styles["verdict_red"]
+    verdict_amber_style = styles["verdict_amber"]
+    verdict_green_style = styles["verdict_green"]
     
     # Build story
     story = []
@@ -115,8 +141,8 @@ def markdown_to_pdf(report_markdown: str, property_address: str = None) -> Bytes
         story.append(Spacer(1, 0.1*inch))
     
     # Date
-    analysis_date = datetime.now().strftime("%d %B %Y at %H:%M")
-    story.append(Paragraph(f"<b>Analysis Date:</b> {analysis_date}", body_style))
+    date_text = (analysis_date or datetime.now()).strftime("%d %B %Y at %H:%M")
+    story.append(Paragraph(f"<b>Analysis Date:</b> {date_text}", body_style))
     story.append(Spacer(1, 0.3*inch))
     
     # Parse and convert markdown content
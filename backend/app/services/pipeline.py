@@ -0,0 +1,225 @@
+from typing import Dict, Callable, Awaitable
+from app.services.ingest import ingest_pack
+from app.services.rag import enrich_with_rag
+from app.services.model_router import analyze_with_router, preferred_provider, stream_with_router
+from app.services.map_reduce import needs_map_reduce, map_reduce_analyze
+from app.services.response_cache import lookup_response, store_response
+from app.services.prompts import assemble_prompt
+from app.services.report_cache import schedule_prerender
+from app.services.metrics import record_prompt_savings, timed
+from app.utils.log import log_event
+from app.utils.citations import attach_citations
+from app.utils.address_extractor import extract_property_address
+from app.utils.cost_calculator import calculate_costs, token_totals
+from app.models.analysis import Analysis
+from app.database import AsyncSessionLocal
+
+# emit(event, data): progress hook used by the streaming endpoint
+Emit = Callable[[str, Dict], Awaitable[None]]
+
+
+class PackError(Exception):
+    """A pack that cannot be analysed; maps to an HTTP error status."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _cached_result(cached: Dict) -> Dict:
+    saved_cost = calculate_costs(cached["usage"])["total_cost"]
+    log_event("response_cache_hit", saved_cost_usd=round(saved_cost, 4))
+    return {
+        "text": cached["report_text"],
+        "usage": {},
+        "cache_hit": True,
+        "saved_tokens": token_totals(cached["usage"]),
+        "saved_cost": saved_cost,
+    }
+
+
+def model_result(text: str, usage: Dict) -> Dict:
+    """The result of a fresh (uncached) model run, as run_model returns it."""
+    return {
+        "text": text,
+        "usage": usage,
+        "cache_hit": False,
+        "saved_tokens": {"input": 0, "output": 0},
+        "saved_cost": 0,
+    }
+
+
+def run_mode(prompt: dict) -> str:
+    return "map_reduce" if needs_map_reduce(prompt) else "single"
+
+
+async def cached_run(prompt: dict, meta: dict, provider: str | None = None) -> Dict | None:
+    """
+    The result for a pack already analysed by `provider` (by default its
+    preferred provider) on its current model, or None.
+    """
+    cached = await lookup_response(prompt, meta, run_mode(prompt), provider)
+    return _cached_result(cached) if cached else None
+
+
+async def run_model(context: Dict, prompt: dict, meta: dict, emit: Emit | None = None) -> Dict:
+    # Identical pack already analysed on this provider/model: reuse the report
+    cached = await cached_run(prompt, meta)
+    if cached:
+        if emit:
+            await emit("token", {"text": cached["text"]})
+        return cached
+
+    mode = run_mode(prompt)
+
+    on_token = None
+    if emit:
+        async def on_token(text: str):
+            await emit("token", {"text": text})
+
+    if mode == "map_reduce":
+        # Too big for one context window: summarise per doc type, then reduce
+        text, usage = await map_reduce_analyze(context, meta, on_token=on_token)
+    elif on_token:
+        text, usage = await stream_with_router(prompt, meta, on_token)
+    else:
+        text, usage = await analyze_with_router(prompt, meta)
+    await store_response(prompt, text, usage, mode)
+    return model_result(text, usage)
+
+
+async def prepare_pack(spooled: Dict, emit: Emit | None = None) -> Dict:
+    """
+    Ingest a spooled pack and build its prompt: everything before the
+    provider call. Returns {"pages", "chunks", "context", "prompt", "meta"}.
+    Raises PackError for a pack with no readable pages or text.
+    """
+    async def progress(stage: str, info: Dict):
+        if emit:
+            await emit("stage", dict(info, stage=stage, status="done"))
+
+    if emit:
+        await emit("stage", {"stage": "extract", "status": "started"})
+
+    ingested = await ingest_pack(spooled, progress=progress)
+    pages = ingested["pages"]
+    if not pages:
+        raise PackError(422, "Could not read any pages from the file.")
+
+    chunks = ingested["chunks"]
+    if not chunks:
+        raise PackError(422, "No readable text extracted. Try enabling OCR.")
+
+    with timed("rag", chunks=len(ingested["safe_chunks"])) as info:
+        context = await enrich_with_rag(ingested["safe_chunks"])
+        info["kept"] = len(context["chunks"])
+    meta = {
+        "page_map": [c["meta"] for c in chunks],
+        "size": len(pages)
+    }
+    with timed("prompt_build") as info:
+        context, prompt = assemble_prompt(context, preferred_provider(meta))
+        info.update(prompt["stats"])
+    record_prompt_savings(prompt["stats"]["tokens_saved"])
+    if emit:
+        await emit("stage", dict(prompt["stats"], stage="prompt", status="done"))
+    return {"pages": pages, "chunks": chunks, "context": context, "prompt": prompt, "meta": meta}
+
+
+def build_analysis(spooled: Dict, prepared: Dict, result: Dict) -> tuple:
+    """
+    Attach citations to a model result and build its (unsaved) Analysis row.
+    Returns (analysis, {"report_markdown", "flags", "confidence", "costs"}).
+    """
+    with timed("citations"):
+        report_md, flags, confidence = attach_citations(result["text"], prepared["chunks"])
+        property_address = extract_property_address(report_md)
+
+    usage_stats = result["usage"]
+    costs = calculate_costs(usage_stats)
+
+    analysis_record = Analysis(
+        filename=spooled["filename"] or "unknown",
+        file_size_bytes=spooled["size"],
+        property_address=property_address,
+        page_count=len(prepared["pages"]),
+        anthropic_model=usage_stats.get("anthropic_model"),
+        openai_model=usage_stats.get("openai_model"),
+        gemini_model=usage_stats.get("gemini_model"),
+        anthropic_input_tokens=usage_stats.get("anthropic_input_tokens", 0),
+        anthropic_output_tokens=usage_stats.get("anthropic_output_tokens", 0),
+        openai_input_tokens=usage_stats.get("openai_input_tokens", 0),
+        openai_output_tokens=usage_stats.get("openai_output_tokens", 0),
+        anthropic_cache_read_tokens=usage_stats.get("anthropic_cache_read_tokens", 0),
+        anthropic_cache_write_tokens=usage_stats.get("anthropic_cache_write_tokens", 0),
+        openai_cache_read_tokens=usage_stats.get("openai_cache_read_tokens", 0),
+        gemini_input_tokens=usage_stats.get("gemini_input_tokens", 0),
+        gemini_output_tokens=usage_stats.get("gemini_output_tokens", 0),
+        gemini_cache_read_tokens=usage_stats.get("gemini_cache_read_tokens", 0),
+        anthropic_cost_usd=costs['anthropic_cost'],
+        openai_cost_usd=costs['openai_cost'],
+        gemini_cost_usd=costs['gemini_cost'],
+        total_cost_usd=costs['total_cost'],
+        summary_text=report_md[:10000],
+        cache_hit=result["cache_hit"],
+        saved_input_tokens=result["saved_tokens"]["input"],
+        saved_output_tokens=result["saved_tokens"]["output"],
+        saved_cost_usd=result["saved_cost"],
+        prompt_tokens_saved=prepared["prompt"]["stats"]["tokens_saved"],
+    )
+    report = {"report_markdown": report_md, "flags": flags, "confidence": confidence, "costs": costs}
+    return analysis_record, report
+
+
+def log_saved(analysis_record: Analysis, costs: Dict, **fields):
+    log_event(
+        "analysis_saved", analysis_id=analysis_record.id, pages=analysis_record.page_count,
+        property_address=analysis_record.property_address,
+        anthropic_cost_usd=round(costs["anthropic_cost"], 4), openai_cost_usd=round(costs["openai_cost"], 4),
+        gemini_cost_usd=round(costs["gemini_cost"], 4), total_cost_usd=round(costs["total_cost"], 4),
+        cache_hit=analysis_record.cache_hit, **fields,
+    )
+
+
+async def analyze_spooled(spooled: Dict, emit: Emit | None = None) -> Dict:
+    """
+    Run the whole analysis for a spooled upload and save the Analysis row.
+
+    The row is saved through its own short-lived async session, so no
+    pooled connection is held while the pack is analysed.
+
+    Returns the AnalysisResponse fields. With `emit`, stage progress and
+    report tokens are pushed to it as they happen.
+    """
+    prepared = await prepare_pack(spooled, emit)
+    if emit:
+        await emit("stage", {"stage": "analyze", "status": "started"})
+
+    with timed("provider_call") as info:
+        result = await run_model(prepared["context"], prepared["prompt"], prepared["meta"], emit)
+        info["cache_hit"] = result["cache_hit"]
+
+    analysis_record, report = build_analysis(spooled, prepared, result)
+
+    with timed("db_write"):
+        async with AsyncSessionLocal() as db:
+            db.add(analysis_record)
+            await db.commit()
+            await db.refresh(analysis_record)
+
+    log_saved(analysis_record, report["costs"])
+    schedule_prerender({
+        "id": analysis_record.id,
+        "summary_text": analysis_record.summary_text,
+        "property_address": analysis_record.property_address,
+        "created_at": analysis_record.created_at,
+    })
+
+    return {
+        "report_markdown": report["report_markdown"],
+        "flags": report["flags"],
+        "confidence": report["confidence"],
+        "analysis_id": analysis_record.id,
+        "prompt_tokens_saved": prepared["prompt"]["stats"]["tokens_saved"],
+    }
@@ -0,0 +1,43 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.config import settings
+
+_pool: ProcessPoolExecutor | None = None
+# Processes on this host that each start their own pool (app.worker's JOB_WORKERS)
+_sharing = 1
+
+def share_cpus(processes: int):
+    """Split the default pool size between `processes` processes that each start a pool."""
+    global _sharing
+    _sharing = max(1, processes)
+
+def pool_size() -> int:
+    return settings.INGEST_PROCESSES or max(1, (os.cpu_count() or 1) // _sharing)
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound work (pdfminer, classification,
+    chunking, redaction). Created lazily so scripts can use it too.
+    """
+    global _pool
+    if _pool is None:
+        workers = pool_size()
+        # spawn, not fork: the parent runs an event loop and HTTP clients
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+async def run_in_pool(fn, *args):
+    """Run a picklable top-level function on the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), fn, *args)
@@ -1,4 +1,8 @@
+import hashlib
 from textwrap import dedent
+from app.config import settings
+from app.services.dedupe import drop_near_duplicates
+from app.utils.tokens import PROVIDER_CHARS_PER_TOKEN, estimate_tokens
 
 NICK_SYSTEM = dedent("""
 You are PKH Legal Brain.
@@ -104,20 +108,183 @@ PKH Legal Brain is provided by Clearwater Education Ltd.
 """)
 
 
-def build_prompt(context: str) -> dict:
+# Which extracts survive when a prompt has to be trimmed to its token budget
+DOC_TYPE_PRIORITY = [
+    "Special Conditions", "Addendum", "Lease", "Office Copy Entry", "Memorandum of Sale",
+    "Replies to Enquiries", "Searches", "Title Plan", "EPC", "Other",
+]
+
+USER_INTRO = "Below are extracts from a UK auction legal pack. Analyze them per the system instructions."
+USER_OUTRO = "Now produce the structured triage report as instructed."
+
+
+def render_kb(kb: dict) -> str:
+    return "\n\n".join(f"{name.upper()}:\n{text.strip()}" for name, text in kb.items())
+
+
+def analysis_system(kb: dict) -> str:
+    """
+    NICK_SYSTEM followed by the knowledge base. Both are the same on every
+    call, so together they form the prefix providers can cache; nothing
+    that varies per pack may go in here.
+    """
+    return f"{NICK_SYSTEM}\n\nKNOWLEDGE BASE\n\n{render_kb(kb)}"
+
+
+class PromptBudgetError(ValueError):
+    """PROMPT_TOKEN_BUDGET leaves no room for a pack's extracts."""
+
+
+def _fixed_tokens(system: str, provider: str | None) -> int:
+    """Tokens every single-call prompt spends before its first extract."""
+    skeleton = f"{USER_INTRO}\n\nExtracts:\n\n\n\n{USER_OUTRO}"
+    return estimate_tokens(system, provider) + estimate_tokens(skeleton, provider)
+
+
+def check_prompt_budget(kb: dict):
+    """
+    Raise PromptBudgetError if PROMPT_TOKEN_BUDGET does not leave room for
+    extracts after the system prompt and knowledge base, for any provider.
+    Run at startup, so a budget that would drop every extract fails fast.
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET
+    if not budget:
+        return
+    system = analysis_system(kb)
+    fixed = max(_fixed_tokens(system, provider) for provider in PROVIDER_CHARS_PER_TOKEN)
+    if budget <= fixed:
+        raise PromptBudgetError(
+            f"PROMPT_TOKEN_BUDGET ({budget}) must be above the {fixed} tokens of system prompt and knowledge base"
+        )
+
+
+def _trim_to_budget(chunks: list, provider: str | None, budget: int) -> tuple:
+    """
+    Keep the highest-priority extracts that fit in `budget` tokens, in
+    their original order. Returns (kept, dropped count, dropped tokens).
+    """
+    costs = [estimate_tokens(render_chunk(c), provider) + 1 for c in chunks]
+    if sum(costs) <= budget:
+        return chunks, 0, 0
+    rank = {doc_type: i for i, doc_type in enumerate(DOC_TYPE_PRIORITY)}
+    order = sorted(range(len(chunks)), key=lambda i: (rank.get(chunks[i]["meta"]["doc_type"], len(rank)), i))
+    keep, used = set(), 0
+    for i in order:
+        if used + costs[i] <= budget:
+            keep.add(i)
+            used += costs[i]
+    dropped_tokens = sum(cost for i, cost in enumerate(costs) if i not in keep)
+    return [c for i, c in enumerate(chunks) if i in keep], len(chunks) - len(keep), dropped_tokens
+
+
+def build_prompt(context: dict, provider: str | None = None, budget: int | None = None) -> dict:
+    """
+    System + user messages for a RAG-enriched context ({"chunks", "kb"})
+    or a reduce context ({"section_summaries", "kb"}). The static
+    instructions and knowledge base go in the system prompt, ahead of
+    everything pack-specific, so providers can cache them.
+
+    Extracts are written as plain text under their page anchors. With a
+    `budget`, the lowest-priority extracts (DOC_TYPE_PRIORITY) are left out
+    until the whole prompt fits in that many tokens for `provider`;
+    PromptBudgetError if not even one extract fits.
+    `stats` has the estimated token count before and after trimming.
+    """
+    system = analysis_system(context["kb"])
+    trimmed = trimmed_tokens = 0
+    if "section_summaries" in context:
+        body = "Section notes:\n\n" + "\n\n".join(
+            f"[{s['doc_type']}, {s['pages']}]\n{s['summary']}" for s in context["section_summaries"]
+        )
+    else:
+        chunks = context["chunks"]
+        if budget:
+            fixed = _fixed_tokens(system, provider)
+            chunks, trimmed, trimmed_tokens = _trim_to_budget(chunks, provider, budget - fixed)
+            if context["chunks"] and not chunks:
+                # Never send the model a pack with every extract cut out
+                raise PromptBudgetError(
+                    f"A budget of {budget} tokens leaves no room for extracts after the "
+                    f"{fixed}-token system prompt and knowledge base ({provider or 'any provider'})"
+                )
+        body = "Extracts:\n\n" + "\n\n".join(render_chunk(c) for c in chunks)
+    user_msg = f"{USER_INTRO}\n\n{body}\n\n{USER_OUTRO}"
+
+    tokens = estimate_tokens(system, provider) + estimate_tokens(user_msg, provider)
+    return {
+        "system": system,
+        "user": user_msg,
+        "stats": {
+            "tokens": tokens,
+            "untrimmed_tokens": tokens + trimmed_tokens,
+            "trimmed": trimmed,
+            "trimmed_tokens": trimmed_tokens,
+        },
+    }
+
+
+def assemble_prompt(context: dict, provider: str | None = None) -> tuple:
+    """
+    The single-call prompt for a RAG-enriched context: near-duplicate
+    extracts dropped, then built within PROMPT_TOKEN_BUDGET for `provider`.
+
+    Returns (context with the deduplicated chunks, prompt). The prompt's
+    `stats` also count the duplicates dropped and `tokens_saved` against
+    sending the context's repr, as the prompt used to: the single-call
+    prompt, or every extract if the pack will be map-reduced, as the map
+    calls still send the ones trimmed here. `extracts_sha256`
+    identifies every deduplicated extract, trimmed or not: what a
+    map-reduce run of the pack reads.
+    """
+    legacy_tokens = estimate_tokens(NICK_SYSTEM + USER_INTRO + USER_OUTRO + repr(context), provider)
+    chunks, dedupe = drop_near_duplicates(context["chunks"], settings.PROMPT_DEDUPE_THRESHOLD)
+    context = dict(context, chunks=chunks)
+    prompt = build_prompt(context, provider, settings.PROMPT_TOKEN_BUDGET)
+    from app.services.map_reduce import needs_map_reduce  # imports this module
+
+    stats = prompt["stats"]
+    sent = stats["untrimmed_tokens"] if needs_map_reduce(prompt) else stats["tokens"]
+    stats.update(dedupe, tokens_saved=max(0, legacy_tokens - sent))
+    extracts = "\n\n".join(render_chunk(c) for c in chunks)
+    prompt["extracts_sha256"] = hashlib.sha256(extracts.encode("utf-8")).hexdigest()
+    return context, prompt
+
+
+MAP_SYSTEM = dedent("""
+You are PKH Legal Brain, working through one section of a large UK auction legal pack.
+
+Summarise ONLY the extracts you are given. Another pass will combine your notes
+with notes on the rest of the pack into the final report, so:
+
+- List every fact that matters to an investor: money, risk, lending, resale,
+  access, title, lease terms, covenants, restrictions, dates, fees.
+- Keep the page reference for every point, in the form (Doc type, p.N).
+  Each extract is headed with its doc type and page; copy those exactly.
+- Quote figures exactly (ground rent, term, fees, dates).
+- Say "Not stated in this section" rather than guessing.
+- Bullet points only. No verdict, no advice, no disclaimer.
+""")
+
+
+def render_chunk(chunk: dict) -> str:
+    """Render a chunk with its page anchor so references survive summarising."""
+    meta = chunk["meta"]
+    first, last = meta["page"], meta.get("page_end", meta["page"])
+    pages = f"p.{first}" if first == last else f"p.{first}-{last}"
+    anchor = f"{meta['doc_type']}, {pages}"
+    if chunk.get("also_on"):
+        # Near-duplicates dropped by assemble_prompt
+        anchor += f"; same text at {', '.join(chunk['also_on'])}"
+    return f"[{anchor}]\n{chunk['content']}"
+
+
+def build_map_prompt(doc_type: str, chunks: list) -> dict:
     """
-    Takes RAG-enriched context and produces system + user messages.
+    Prompt summarising one token-budgeted batch of same-type chunks.
     """
-    user_msg = dedent(f"""
-    Below are extracts from a UK auction legal pack. Analyze them per the system instructions.
-    
-    Context:
-    {context}
-    
-    Now produce the structured triage report as instructed.
-    """)
-    
+    extracts = "\n\n".join(render_chunk(c) for c in chunks)
+    user_msg = f"Section: {doc_type}\n\nExtracts:\n\n{extracts}\n\nNow produce the page-referenced notes."
     return {
-        "system": NICK_SYSTEM,
-        "user": user_msg.strip()
+        "system": MAP_SYSTEM,
+        "user": user_msg
     }
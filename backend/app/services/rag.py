@@ -1,5 +1,7 @@
 
 from typing import List, Dict
+from app.config import settings
+from app.services.retrieval import retrieve
 
 PKH_CHECKLIST = """
 RED FLAGS:
@@ -25,12 +27,39 @@ Patterns seen in past deals: hidden buyer premiums; short completion (10 busines
 service charge balancing charges; indemnity policies required; missing FENSA/GasSafe certificates.
 """
 
-def enrich_with_rag(chunks: List[Dict]) -> Dict:
+# Always look for the basics the report opens with, not just red flags
+BASELINE_QUERIES = [
+    "property address description freehold leasehold tenure",
+    "title number registered proprietor charges restrictions",
+    "completion date deposit buyer's premium administration fee",
+    "vacant possession tenancy occupation",
+]
+
+def checklist_queries() -> List[str]:
+    """One retrieval query per PKH_CHECKLIST red flag, plus the baseline ones."""
+    flags = [line[2:].strip() for line in PKH_CHECKLIST.splitlines() if line.startswith("- ")]
+    return flags + BASELINE_QUERIES
+
+async def select_evidence(chunks: List[Dict]) -> List[Dict]:
+    """
+    Keep only the chunks retrieved for at least one checklist query. Small
+    packs, and RAG_BACKEND=off, pass every chunk through unchanged.
+    """
+    readable = [c for c in chunks if c.get("content")]
+    if settings.RAG_BACKEND == "off" or len(readable) <= settings.RAG_MIN_CHUNKS:
+        return readable
+    selected = await retrieve(readable, checklist_queries(), settings.RAG_TOP_K)
+    return [readable[i] for i in selected]
+
+# Static: sent in the system prompt, after NICK_SYSTEM, as the cacheable prefix
+KNOWLEDGE_BASE = {
+    "checklist": PKH_CHECKLIST,
+    "glossary": GLOSSARY,
+    "gotchas": GOTCHAS,
+}
+
+async def enrich_with_rag(chunks: List[Dict]) -> Dict:
     return {
-        "chunks": chunks,
-        "kb": {
-            "checklist": PKH_CHECKLIST,
-            "glossary": GLOSSARY,
-            "gotchas": GOTCHAS,
-        }
+        "chunks": await select_evidence(chunks),
+        "kb": KNOWLEDGE_BASE,
     }
@@ -1,13 +1,134 @@
-
 import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# Simple PII scrubs, applied in this order. Later patterns see the output of
+# earlier ones, so the order is part of the behaviour.
+PATTERNS = [
+    ("NI", re.compile(r"\b[A-CEGHJ-PR-TW-Z]{2}\d{6}[A-D]\b", re.I)),
+    ("ACCT", re.compile(r"\b\d{8}\b")),
+    ("EMAIL", re.compile(r"[\w\.-]+@[\w\.-]+")),
+    ("PHONE", re.compile(r"\b\+?\d{7,}\b")),
+]
+
+# Every pattern needs a digit or an "@", so only tokens holding one can match
+_HINT = re.compile(r"[\d@]")
+
+# All patterns in one alternation, to confirm a hinted token before scrubbing
+_ANY = re.compile("|".join(
+    f"(?P<{name}>(?i:{rx.pattern}))" if rx.flags & re.I else f"(?P<{name}>{rx.pattern})"
+    for name, rx in PATTERNS
+))
+
+# (type, start, end) of one replacement, offsets into the original text
+Span = Tuple[str, int, int]
+
+
+def _placeholder(name: str) -> str:
+    return f"[REDACTED_{name}]"
+
+
+def _render(token: str, spans: List[Span]) -> str:
+    out, last = [], 0
+    for name, start, end in spans:
+        out.append(token[last:start])
+        out.append(_placeholder(name))
+        last = end
+    out.append(token[last:])
+    return "".join(out)
+
+
+def _to_original(pos: int, spans: List[Span]) -> int:
+    """Map an offset in the partly redacted token back to the original token."""
+    delta = 0
+    for name, start, end in spans:
+        if pos <= start + delta:
+            break
+        delta += len(_placeholder(name)) - (end - start)
+    return pos - delta
+
+
+def _redact_token(token: str) -> Tuple[str, List[Span]]:
+    """
+    Run the ordered PATTERNS over one whitespace-delimited token.
+
+    No pattern matches whitespace and no placeholder contains any, so
+    scrubbing token by token gives exactly the text of scrubbing the whole
+    string pass by pass. Placeholders never take part in a later match, so
+    each span maps back to a stretch of the original token.
+    """
+    spans: List[Span] = []
+    for name, rx in PATTERNS:
+        current = _render(token, spans) if spans else token
+        found = [
+            (name, _to_original(m.start(), spans), _to_original(m.end(), spans))
+            for m in rx.finditer(current)
+        ]
+        if found:
+            spans = sorted(spans + found, key=lambda s: s[1])
+    return _render(token, spans), spans
+
+
+def _token_end(text: str, pos: int) -> int:
+    n = len(text)
+    while pos < n and not text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _token_start(text: str, pos: int) -> int:
+    while pos > 0 and not text[pos - 1].isspace():
+        pos -= 1
+    return pos
+
+
+def redact_text(text: str) -> Tuple[str, List[Span]]:
+    """
+    Scrub PII from `text` in one scan.
+
+    A character-class scan finds tokens holding a digit or "@", the
+    combined pattern confirms them, and only those tokens are rewritten.
+    Returns the redacted text and the replaced spans in `text`.
+    """
+    out, spans, last = [], [], 0
+    m = _HINT.search(text)
+    while m:
+        start = _token_start(text, m.start())
+        end = _token_end(text, m.end())
+        token = text[start:end]
+        if _ANY.search(token):
+            new_token, token_spans = _redact_token(token)
+            out.append(text[last:start])
+            out.append(new_token)
+            spans.extend((name, start + s, start + e) for name, s, e in token_spans)
+            last = end
+        m = _HINT.search(text, end)
+    if not spans:
+        return text, []
+    out.append(text[last:])
+    return "".join(out), spans
+
 
 def redact_sensitive(chunk: dict) -> dict:
     c = chunk.copy()
-    text = c.get("content") or ""
-    # Simple PII scrubs
-    text = re.sub(r"\b[A-CEGHJ-PR-TW-Z]{2}\d{6}[A-D]\b", "[REDACTED_NI]", text, flags=re.I)
-    text = re.sub(r"\b\d{8}\b", "[REDACTED_ACCT]", text)
-    text = re.sub(r"[\w\.-]+@[\w\.-]+", "[REDACTED_EMAIL]", text)
-    text = re.sub(r"\b\+?\d{7,}\b", "[REDACTED_PHONE]", text)
-    c["content"] = text
+    c["content"], _ = redact_text(c.get("content") or "")
     return c
+
+
+def redact_chunks(chunks: Iterable[Dict]) -> Tuple[List[Dict], Dict]:
+    """
+    Redact a batch of chunks.
+
+    Returns (safe_chunks, report). The report has `counts` per PII type and
+    `spans`: {"chunk", "type", "start", "end"} for every replacement, with
+    offsets into the chunk's original content, for auditing.
+    """
+    safe_chunks, report_spans, counts = [], [], Counter()
+    for i, chunk in enumerate(chunks):
+        c = chunk.copy()
+        c["content"], spans = redact_text(c.get("content") or "")
+        safe_chunks.append(c)
+        for name, start, end in spans:
+            counts[name] += 1
+            report_spans.append({"chunk": i, "type": name, "start": start, "end": end})
+    return safe_chunks, {"counts": dict(counts), "spans": report_spans}
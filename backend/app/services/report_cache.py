@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict
+from app.config import settings
+from app.services.pdf_generator import markdown_to_pdf
+from app.services.pool import run_in_pool
+from app.services.metrics import timed
+from app.utils.log import log_error
+
+# Bump when the PDF layout changes so stale renders are never served
+REPORT_VERSION = "v1"
+
+def report_key(analysis_id: int, created_at: datetime | None) -> str:
+    """Saved reports never change, so the id and save time identify the PDF."""
+    stamp = created_at.isoformat() if created_at else ""
+    digest = hashlib.sha256(f"{REPORT_VERSION}|{analysis_id}|{stamp}".encode()).hexdigest()[:32]
+    return f"{REPORT_VERSION}-{analysis_id}-{digest}"
+
+def report_filename(property_address: str | None, created_at: datetime | None) -> str:
+    if property_address:
+        # Clean address for filename
+        clean_address = "".join(c for c in property_address if c.isalnum() or c in (' ', '-', '_'))
+        return f"PKH_Legal_Brain_{clean_address.replace(' ', '_')[:50]}.pdf"
+    timestamp = (created_at or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    return f"PKH_Legal_Brain_{timestamp}.pdf"
+
+def report_etag(key: str) -> str:
+    return f'"{key}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+class DiskReportCache:
+    """One PDF file per report."""
+
+    name = "disk"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, pdf: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, self._path(key))
+
+class S3ReportCache:
+    """Objects under reports/ in STORAGE_BUCKET on the S3-compatible endpoint."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "reports/"):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+        )
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.pdf")
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return obj["Body"].read()
+
+    def put(self, key: str, pdf: bytes):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.pdf",
+            Body=pdf,
+            ContentType="application/pdf",
+        )
+
+_cache = None
+
+def get_report_cache():
+    """The configured rendered-report store for this process, or None when off."""
+    global _cache
+    if _cache is None and settings.REPORT_CACHE_BACKEND != "off":
+        if settings.REPORT_CACHE_BACKEND == "s3":
+            _cache = S3ReportCache(settings.STORAGE_BUCKET)
+        else:
+            _cache = DiskReportCache(settings.REPORT_CACHE_DIR)
+    return _cache
+
+def _render(report_markdown: str, property_address: str | None, created_at: datetime | None) -> bytes:
+    """Pool worker: render one report to PDF bytes."""
+    return markdown_to_pdf(report_markdown or "", property_address, created_at).getvalue()
+
+async def get_report_pdf(analysis_id: int, report_markdown: str, property_address: str | None,
+                         created_at: datetime | None) -> bytes:
+    """
+    The rendered PDF for a saved analysis: from the store if present,
+    otherwise rendered on the process pool and stored. Store failures
+    never fail the download.
+    """
+    key = report_key(analysis_id, created_at)
+    cache = get_report_cache()
+    if cache is not None:
+        try:
+            pdf = await asyncio.to_thread(cache.get, key)
+        except Exception as e:
+            log_error("report_cache_read_failed", e)
+            pdf = None
+        if pdf is not None:
+            return pdf
+
+    with timed("pdf_render", analysis_id=analysis_id):
+        pdf = await run_in_pool(_render, report_markdown, property_address, created_at)
+    if cache is not None:
+        try:
+            await asyncio.to_thread(cache.put, key, pdf)
+        except Exception as e:
+            log_error("report_cache_write_failed", e)
+    return pdf
+
+# Strong references to pre-render tasks still in flight
+_prerender_tasks: set = set()
+
+def schedule_prerender(analysis: Dict):
+    """
+    Render and store a just-saved report in the background, so the first
+    download is served from the store. `analysis` carries id, summary_text,
+    property_address and created_at.
+    """
+    if get_report_cache() is None:
+        return
+
+    async def prerender():
+        try:
+            await get_report_pdf(
+                analysis["id"], analysis["summary_text"], analysis["property_address"], analysis["created_at"]
+            )
+        except Exception as e:
+            log_error("report_prerender_failed", e, analysis_id=analysis["id"])
+
+    task = asyncio.create_task(prerender())
+    _prerender_tasks.add(task)
+    task.add_done_callback(_prerender_tasks.discard)
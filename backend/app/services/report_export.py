@@ -0,0 +1,127 @@
+import asyncio
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, List
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.analysis import Analysis
+from app.services.pool import pool_size
+from app.services.report_cache import get_report_pdf, report_filename
+from app.utils.log import log_error
+
+
+class _ZipSink:
+    """
+    Write-only file object for zipfile. It has no seek or tell, so zipfile
+    writes data descriptors after each member instead of seeking back, and
+    the bytes written so far can be drained and sent straight away.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _export_filters(ids: List[int] | None, since: datetime | None, until: datetime | None) -> List:
+    conditions = []
+    if ids:
+        conditions.append(Analysis.id.in_(ids))
+    if since:
+        conditions.append(Analysis.created_at >= since)
+    if until:
+        conditions.append(Analysis.created_at < until)
+    return conditions
+
+
+async def count_exports(db: AsyncSession, ids: List[int] | None = None,
+                        since: datetime | None = None, until: datetime | None = None) -> int:
+    """How many rows an export by id or created_at range (or both) would contain."""
+    query = select(func.count()).select_from(Analysis).where(*_export_filters(ids, since, until))
+    return await db.scalar(query)
+
+
+async def iter_exports(ids: List[int] | None = None, since: datetime | None = None,
+                       until: datetime | None = None) -> AsyncIterator:
+    """
+    The rows to export, in id order, fetched EXPORT_BATCH_SIZE at a time
+    by seeking on id, so only one batch of summaries is held at once. Uses
+    its own session: the ZIP streams out after the request's has closed.
+    """
+    conditions = _export_filters(ids, since, until)
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            query = (
+                select(Analysis.id, Analysis.summary_text, Analysis.property_address, Analysis.created_at)
+                .where(Analysis.id > last_id, *conditions)
+                .order_by(Analysis.id)
+                .limit(settings.EXPORT_BATCH_SIZE)
+            )
+            rows = (await db.execute(query)).all()
+            for row in rows:
+                yield row
+            if len(rows) < settings.EXPORT_BATCH_SIZE:
+                return
+            last_id = rows[-1].id
+
+
+async def stream_export_zip(rows: AsyncIterator) -> AsyncIterator[bytes]:
+    """
+    Yield a ZIP of the report PDFs of `rows` (as iter_exports yields them)
+    as it is built.
+
+    PDFs come from the report store or are rendered on the process pool,
+    at most one per pool worker ahead of the member being written, so only
+    that window of PDFs is ever held in memory. Members are stored, not
+    deflated: PDFs are already compressed. Reports that fail to render are
+    listed in errors.txt at the end of the archive.
+    """
+    def fetch(row) -> asyncio.Task:
+        return asyncio.create_task(
+            get_report_pdf(row.id, row.summary_text, row.property_address, row.created_at)
+        )
+
+    window = deque()
+    async for row in rows:
+        window.append((row, fetch(row)))
+        if len(window) == pool_size():
+            break
+    sink = _ZipSink()
+    errors = []
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            while window:
+                row, task = window.popleft()
+                try:
+                    pdf = await task
+                except Exception as e:
+                    log_error("export_render_failed", e, analysis_id=row.id)
+                    errors.append(f"{row.id}: {type(e).__name__}: {e}")
+                    pdf = None
+                next_row = await anext(rows, None)
+                if next_row is not None:
+                    window.append((next_row, fetch(next_row)))
+                if pdf is not None:
+                    zf.writestr(f"{row.id}_{report_filename(row.property_address, row.created_at)}", pdf)
+                    yield sink.drain()
+            if errors:
+                zf.writestr("errors.txt", "\n".join(errors) + "\n")
+        yield sink.drain()
+    finally:
+        # Client went away: stop rendering what will never be sent
+        for _, task in window:
+            task.cancel()
+        await rows.aclose()
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict
+from app.config import settings
+from app.services.model_router import MODELS, preferred_provider
+from app.services.prompts import analysis_system
+from app.services.rag import KNOWLEDGE_BASE
+from app.utils.log import log_event, log_error
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+def system_hash(system: str | None = None) -> str:
+    """Hash of a system prompt; by default the current analysis system prompt."""
+    if system is None:
+        system = analysis_system(KNOWLEDGE_BASE)
+    return hashlib.sha256(normalize_prompt(system).encode("utf-8")).hexdigest()
+
+def response_key(provider: str, model: str, system: str, user: str, mode: str = "single") -> str:
+    payload = json.dumps([provider, model, mode, system_hash(system), normalize_prompt(user)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def prompt_key(provider: str, model: str, prompt: dict, mode: str = "single") -> str:
+    """
+    response_key for an assembled prompt. A map-reduce run reads every
+    extract, not just those a trimmed single-call prompt kept, so it is
+    keyed on all of them.
+    """
+    user = prompt.get("extracts_sha256", prompt["user"]) if mode == "map_reduce" else prompt["user"]
+    return response_key(provider, model, prompt["system"], user, mode)
+
+class DiskResponseCache:
+    """One JSON file per cached report."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Dict | None:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires_at"] < datetime.utcnow().isoformat():
+            return None
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        entry = dict(entry, expires_at=entry["expires_at"].isoformat())
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(key))
+
+    def purge(self, current_system_hash: str) -> int:
+        removed = 0
+        now = datetime.utcnow().isoformat()
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    with open(e.path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    stale = entry["system_hash"] != current_system_hash or entry["expires_at"] < now
+                except (ValueError, KeyError):
+                    stale = True
+                if stale:
+                    os.unlink(e.path)
+                    removed += 1
+        return removed
+
+class PostgresResponseCache:
+    """Rows in the llm_response_cache table."""
+
+    def get(self, key: str) -> Dict | None:
+        from app.database import SessionLocal
+        from app.models.response_cache import ResponseCacheEntry
+        with SessionLocal() as db:
+            row = db.get(ResponseCacheEntry, key)
+            if row is None or row.expires_at < datetime.utcnow():
+                return None
+            return {"report_text": row.report_text, "usage": row.usage,
+                    "provider": row.provider, "model": row.model}
+
+    def put(self, key: str, entry: Dict):
+        from app.database import SessionLocal
+        from app.models.response_cache import ResponseCacheEntry
+        with SessionLocal() as db:
+            db.merge(ResponseCacheEntry(cache_key=key, **entry))
+            db.commit()
+
+    def purge(self, current_system_hash: str) -> int:
+        from app.database import SessionLocal
+        from app.models.response_cache import ResponseCacheEntry
+        with SessionLocal() as db:
+            removed = db.query(ResponseCacheEntry).filter(
+                (ResponseCacheEntry.system_hash != current_system_hash) |
+                (ResponseCacheEntry.expires_at < datetime.utcnow())
+            ).delete(synchronize_session=False)
+            db.commit()
+        return removed
+
+_cache = None
+
+def get_response_cache():
+    global _cache
+    if _cache is None and settings.RESPONSE_CACHE_BACKEND != "off":
+        if settings.RESPONSE_CACHE_BACKEND == "postgres":
+            _cache = PostgresResponseCache()
+        else:
+            _cache = DiskResponseCache(settings.RESPONSE_CACHE_DIR)
+    return _cache
+
+async def lookup_response(prompt: dict, meta: dict, mode: str = "single", provider: str | None = None) -> Dict | None:
+    """
+    Cached {"report_text", "usage", ...} for this prompt from `provider`
+    (by default the pack's preferred provider) and its current model, or
+    None. Cache errors count as a miss.
+    """
+    cache = get_response_cache()
+    provider = provider or preferred_provider(meta)
+    if cache is None or provider is None:
+        return None
+    key = prompt_key(provider, MODELS[provider], prompt, mode)
+    try:
+        return await asyncio.to_thread(cache.get, key)
+    except Exception as e:
+        log_error("response_cache_read_failed", e)
+        return None
+
+async def store_response(prompt: dict, report_text: str, usage: Dict, mode: str = "single"):
+    """Cache a report under the provider and model that wrote it (usage's "provider" and "model")."""
+    cache = get_response_cache()
+    provider, model = usage.get("provider"), usage.get("model")
+    if cache is None or provider is None:
+        return
+    key = prompt_key(provider, model, prompt, mode)
+    entry = {
+        "provider": provider,
+        "model": model,
+        "system_hash": system_hash(prompt["system"]),
+        "report_text": report_text,
+        "usage": usage,
+        "expires_at": datetime.utcnow() + timedelta(hours=settings.RESPONSE_CACHE_TTL_HOURS),
+    }
+    try:
+        await asyncio.to_thread(cache.put, key, entry)
+    except Exception as e:
+        log_error("response_cache_write_failed", e)
+
+def purge_stale_responses():
+    """Drop entries written under a different system prompt or knowledge base, or past their TTL."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    try:
+        removed = cache.purge(system_hash())
+        if removed:
+            log_event("response_cache_purged", removed=removed)
+    except Exception as e:
+        log_error("response_cache_purge_failed", e)
@@ -0,0 +1,193 @@
+import asyncio
+import re
+import uuid
+import zlib
+from typing import List, Dict
+import numpy as np
+from app.config import settings
+from app.services.http_clients import provider_clients
+
+OPENAI_EMBEDDINGS = "https://api.openai.com/v1/embeddings"
+
+_WORD = re.compile(r"[a-z0-9£]+")
+
+
+class HashingEmbedder:
+    """
+    Local feature-hashing embedder over words and word bigrams.
+
+    No model or network call: good enough to match checklist phrasing
+    ("ground rent", "flood zone") against pack text, and deterministic.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _embed_one(self, text: str, out: np.ndarray):
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for f in features:
+            out[zlib.crc32(f.encode()) % self.dim] += 1.0
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self._embed_one(text, vectors[i])
+        np.log1p(vectors, out=vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embed_sync, texts)
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings over the pooled provider client."""
+
+    def __init__(self, model: str, batch_size: int = 256):
+        self.model = model
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY or ''}"}
+        client = provider_clients.get("openai")
+        rows = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = [t or " " for t in texts[i:i + self.batch_size]]
+            r = await client.post(OPENAI_EMBEDDINGS, headers=headers, json={"model": self.model, "input": batch})
+            r.raise_for_status()
+            rows.extend(d["embedding"] for d in sorted(r.json()["data"], key=lambda d: d["index"]))
+        vectors = np.asarray(rows, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+class FlatIndex:
+    """In-process exact cosine search over normalised vectors."""
+
+    def __init__(self):
+        self._vectors = None
+
+    async def add(self, vectors: np.ndarray):
+        self._vectors = vectors
+
+    async def search(self, queries: np.ndarray, k: int) -> List[List[int]]:
+        if self._vectors is None or not len(self._vectors):
+            return [[] for _ in queries]
+        scores = queries @ self._vectors.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        # argpartition is unordered; sort the k winners by score
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        return np.take_along_axis(top, order, axis=1).tolist()
+
+    async def close(self):
+        self._vectors = None
+
+
+class PgVectorIndex:
+    """
+    pgvector table at PG_DSN. Each pack writes its vectors under its own
+    pack_id and deletes them again on close.
+    """
+
+    def __init__(self, dsn: str, dim: int):
+        self.dsn = dsn
+        self.dim = dim
+        self.pack_id = uuid.uuid4().hex
+        self._conn = None
+
+    @staticmethod
+    def _literal(vector) -> str:
+        return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+    async def add(self, vectors: np.ndarray):
+        import psycopg
+        self._conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+        await self._conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS rag_chunks ("
+            f"pack_id text NOT NULL, chunk_id integer NOT NULL, embedding vector({self.dim}) NOT NULL, "
+            f"PRIMARY KEY (pack_id, chunk_id))"
+        )
+        async with self._conn.cursor() as cur:
+            await cur.executemany(
+                "INSERT INTO rag_chunks (pack_id, chunk_id, embedding) VALUES (%s, %s, %s::vector)",
+                [(self.pack_id, i, self._literal(v)) for i, v in enumerate(vectors)],
+            )
+
+    async def search(self, queries: np.ndarray, k: int) -> List[List[int]]:
+        results = []
+        for q in queries:
+            cur = await self._conn.execute(
+                "SELECT chunk_id FROM rag_chunks WHERE pack_id = %s "
+                "ORDER BY embedding <=> %s::vector LIMIT %s",
+                (self.pack_id, self._literal(q), k),
+            )
+            results.append([row[0] for row in await cur.fetchall()])
+        return results
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.execute("DELETE FROM rag_chunks WHERE pack_id = %s", (self.pack_id,))
+            await self._conn.close()
+            self._conn = None
+
+
+class PineconeIndex:
+    """Pinecone index PINECONE_INDEX, one namespace per pack."""
+
+    def __init__(self, api_key: str, index_name: str):
+        from pinecone import Pinecone
+        self._index = Pinecone(api_key=api_key).Index(index_name)
+        self.namespace = uuid.uuid4().hex
+
+    async def add(self, vectors: np.ndarray):
+        items = [(str(i), v.tolist()) for i, v in enumerate(vectors)]
+        for i in range(0, len(items), 100):
+            await asyncio.to_thread(self._index.upsert, vectors=items[i:i + 100], namespace=self.namespace)
+
+    async def search(self, queries: np.ndarray, k: int) -> List[List[int]]:
+        results = []
+        for q in queries:
+            resp = await asyncio.to_thread(
+                self._index.query, vector=q.tolist(), top_k=k, namespace=self.namespace
+            )
+            results.append([int(m["id"]) for m in resp["matches"]])
+        return results
+
+    async def close(self):
+        await asyncio.to_thread(self._index.delete, delete_all=True, namespace=self.namespace)
+
+
+def get_embedder():
+    if settings.RAG_EMBEDDER == "openai":
+        return OpenAIEmbedder(settings.RAG_OPENAI_EMBED_MODEL)
+    return HashingEmbedder(settings.RAG_EMBED_DIM)
+
+
+def make_index(dim: int):
+    """A fresh per-pack index for the configured RAG_BACKEND."""
+    if settings.RAG_BACKEND == "pgvector" and settings.PG_DSN:
+        return PgVectorIndex(settings.PG_DSN, dim)
+    if settings.RAG_BACKEND == "pinecone" and settings.PINECONE_API_KEY and settings.PINECONE_INDEX:
+        return PineconeIndex(settings.PINECONE_API_KEY, settings.PINECONE_INDEX)
+    return FlatIndex()
+
+
+async def retrieve(chunks: List[Dict], queries: List[str], k: int) -> List[int]:
+    """
+    Embed and index the chunks, run every query, and return the indices of
+    the chunks retrieved by any query, in pack order.
+    """
+    embedder = get_embedder()
+    chunk_vectors = await embedder.embed([c.get("content") or "" for c in chunks])
+    query_vectors = await embedder.embed(queries)
+
+    index = make_index(chunk_vectors.shape[1])
+    try:
+        await index.add(chunk_vectors)
+        hits = await index.search(query_vectors, k)
+    finally:
+        await index.close()
+
+    return sorted({i for per_query in hits for i in per_query})
@@ -0,0 +1,299 @@
+import asyncio
+import email.utils
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+import httpx
+from app.config import settings
+from app.services.metrics import (
+    record_circuit_opened, record_provider_error, record_provider_hedge, record_provider_retry,
+)
+from app.utils.log import log_event
+
+# Rate limits, Anthropic's 529 "overloaded", and transient server errors
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+class NoProviderAvailable(RuntimeError):
+    pass
+
+class CircuitOpen(RuntimeError):
+    pass
+
+def error_reason(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return str(error.response.status_code)
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    return type(error).__name__
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+def is_provider_fault(error: Exception) -> bool:
+    """
+    Whether `error` says something about the provider's health: transport
+    errors and timeouts, rate limits, server errors and rejected credentials.
+    Other 4xx are faults of the request, not the provider.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in RETRYABLE_STATUS or status >= 500 or status in (401, 403)
+    return isinstance(error, httpx.TransportError)
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """The provider's Retry-After hint (retry-after-ms, seconds or an HTTP date), if any."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    headers = error.response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, error: Exception) -> float | None:
+    """
+    Seconds to wait before retry number `attempt` (0-based): the provider's
+    Retry-After if it sent one, else full-jitter exponential backoff. None
+    when Retry-After is longer than ROUTER_RETRY_MAX_SECONDS, so the caller
+    moves on to the next provider instead of waiting.
+    """
+    hinted = retry_after_seconds(error)
+    if hinted is not None:
+        return hinted if hinted <= settings.ROUTER_RETRY_MAX_SECONDS else None
+    cap = min(settings.ROUTER_RETRY_MAX_SECONDS, settings.ROUTER_RETRY_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, cap)
+
+class ProviderStats:
+    """Latency and outcome of a provider's most recent calls."""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True for success
+
+    def success(self, seconds: float):
+        self.latencies.append(seconds)
+        self.outcomes.append(True)
+
+    def failure(self):
+        self.outcomes.append(False)
+
+    def percentile(self, q: float) -> float | None:
+        """Latency at quantile `q` of recent successes, once there are enough of them."""
+        if len(self.latencies) < settings.ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def error_rate(self) -> float:
+        if len(self.outcomes) < settings.ROUTER_MIN_SAMPLES:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def at(q: float):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1) if ordered else None
+
+        return {
+            "calls": len(self.outcomes),
+            "error_rate": round(self.outcomes.count(False) / len(self.outcomes), 4) if self.outcomes else 0.0,
+            "p50_ms": at(0.5),
+            "p95_ms": at(0.95),
+        }
+
+class CircuitBreaker:
+    """
+    Closed until `threshold` consecutive failures, then open for `cooldown`
+    seconds, then half-open: one probe call is let through, and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """The call let through was cancelled or failed through no fault of the provider; let another probe go."""
+        self._probing = False
+
+    def success(self) -> bool:
+        """Record a success; True if it closed the circuit."""
+        was_open = self.opened_at is not None
+        self.failures, self.opened_at, self._probing = 0, None, False
+        return was_open
+
+    def failure(self) -> bool:
+        """Record a failure; True if it opened the circuit."""
+        self.failures += 1
+        reopen = self._probing
+        self._probing = False
+        if reopen or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+class Router:
+    """
+    Routes provider calls using each provider's recent record in this
+    process: retries transient failures with backoff, skips providers whose
+    circuit is open, tries providers with a high error rate last, and, with
+    ROUTER_HEDGE_PERCENTILE set, starts the next provider as well when the
+    first is slower than that percentile of its recent calls.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, ProviderStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def stats(self, provider: str) -> ProviderStats:
+        if provider not in self._stats:
+            self._stats[provider] = ProviderStats(settings.ROUTER_STATS_WINDOW)
+        return self._stats[provider]
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(
+                settings.ROUTER_BREAKER_FAILURES, settings.ROUTER_BREAKER_COOLDOWN_SECONDS
+            )
+        return self._breakers[provider]
+
+    def order(self, preference: List[str]) -> List[str]:
+        """`preference` without open circuits, degraded providers moved to the end."""
+        available = [p for p in preference if self.breaker(p).state != "open"]
+        return sorted(available, key=lambda p: self.stats(p).error_rate() >= settings.ROUTER_DEGRADED_ERROR_RATE)
+
+    def hedge_delay(self, provider: str) -> float | None:
+        if not settings.ROUTER_HEDGE_PERCENTILE:
+            return None
+        latency = self.stats(provider).percentile(settings.ROUTER_HEDGE_PERCENTILE)
+        if latency is None:
+            return None
+        return max(latency, settings.ROUTER_HEDGE_MIN_SECONDS)
+
+    async def attempt(self, provider: str, call: Callable[..., Awaitable], *args,
+                      may_retry: Callable[[], bool] | None = None):
+        """
+        One provider, retried on transient errors while its circuit allows.
+        Only provider faults count against its stats and circuit.
+        """
+        breaker, stats = self.breaker(provider), self.stats(provider)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpen(f"{provider} circuit is open")
+            start = time.perf_counter()
+            try:
+                result = await call(*args)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if not is_provider_fault(e):
+                    breaker.release()
+                    raise
+                reason = error_reason(e)
+                record_provider_error(provider, reason)
+                stats.failure()
+                if breaker.failure():
+                    record_circuit_opened(provider)
+                    log_event("circuit_opened", provider=provider, failures=breaker.failures)
+                delay = None
+                if attempt < settings.ROUTER_MAX_RETRIES and is_retryable(e) and (may_retry is None or may_retry()):
+                    delay = backoff_delay(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                record_provider_retry(provider, reason)
+                log_event("provider_retry", provider=provider, attempt=attempt, reason=reason,
+                          delay_ms=round(delay * 1000))
+                await asyncio.sleep(delay)
+                continue
+            stats.success(time.perf_counter() - start)
+            if breaker.success():
+                log_event("circuit_closed", provider=provider)
+            return result
+
+    async def run(self, preference: List[str], calls: Dict[str, Callable[..., Awaitable]], *args,
+                  may_retry: Callable[[], bool] | None = None, hedge: bool = False):
+        """
+        Call the providers in `preference` order until one succeeds. Once
+        `may_retry` returns False, the failure is final: no retry, no next
+        provider. With `hedge`, a provider still running after its hedge
+        delay races the next one; the first success wins and the other is
+        cancelled.
+        """
+        queue = deque(self.order(preference))
+        if not queue:
+            raise NoProviderAvailable("No LLM provider available")
+        last_error = None
+        while queue:
+            provider = queue.popleft()
+            attempts = {asyncio.create_task(self.attempt(provider, calls[provider], *args, may_retry=may_retry)): provider}
+            try:
+                delay = self.hedge_delay(provider) if hedge and queue else None
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    backup = queue.popleft()
+                    record_provider_hedge(provider, backup)
+                    log_event("provider_hedge", provider=provider, backup=backup, after_ms=round(delay * 1000))
+                    attempts[asyncio.create_task(self.attempt(backup, calls[backup], *args, may_retry=may_retry))] = backup
+                pending = set(attempts)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        last_error = task.exception()
+                if may_retry is not None and not may_retry():
+                    break
+            finally:
+                for task in attempts:
+                    task.cancel()
+        raise last_error
+
+    def reset(self):
+        """Forget every provider's record (benchmarks, tests)."""
+        self._stats.clear()
+        self._breakers.clear()
+
+    def snapshot(self) -> Dict:
+        return {
+            provider: dict(stats.snapshot(), circuit=self.breaker(provider).state)
+            for provider, stats in self._stats.items()
+        }
+
+router = Router()
@@ -1,4 +1,5 @@
 import re
+from app.utils.log import log_event
 
 def extract_property_address(text: str) -> str | None:
     """
@@ -6,12 +7,9 @@ def extract_property_address(text: str) -> str | None:
     Looks for "Property: " at the start of the text.
     """
     if not text:
-        print("⚠️ No text provided to extract_property_address")
+        log_event("address_not_found", reason="empty report")
         return None
     
-    print(f"🔍 Searching for address in text (length: {len(text)} chars)")
-    print(f"📄 First 300 chars: {text[:300]}")
-    
     # Primary pattern: Look for "Property: " followed by address on the first few lines
     # This matches the format we explicitly asked for in the prompt
     lines = text.split('\n')
@@ -24,8 +22,8 @@ def extract_property_address(text: str) -> str | None:
                 # Clean up
                 address = re.sub(r'\s+', ' ', address)
                 address = address.rstrip('.,;:')
-                print(f"✅ Found address on line {i+1}: {address}")
                 if len(address) > 5:
+                    log_event("address_extracted", method="property_line", line=i + 1)
                     return address[:500]
     
     # Fallback patterns for other formats
@@ -40,9 +38,9 @@ def extract_property_address(text: str) -> str | None:
             address = match.group(1).strip()
             address = re.sub(r'\s+', ' ', address)
             address = address.rstrip('.,;:')
-            print(f"✅ Fallback pattern {i+1} matched: {address}")
             if len(address) > 5:
+                log_event("address_extracted", method=f"fallback_{i + 1}")
                 return address[:500]
     
-    print("❌ No address pattern matched")
+    log_event("address_not_found", reason="no pattern matched", chars=len(text))
     return None
@@ -1,42 +1,85 @@
 from typing import Dict
+from app.utils.pricing import call_cost
 
-# Pricing per million tokens (USD)
-ANTHROPIC_INPUT_PRICE = 3.00
-ANTHROPIC_OUTPUT_PRICE = 15.00
-OPENAI_INPUT_PRICE = 1.25
-OPENAI_OUTPUT_PRICE = 10.00
+PROVIDERS = ("anthropic", "openai", "gemini")
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+def call_usage(provider: str, model: str, input_tokens: int, output_tokens: int,
+               cache_read_tokens: int = 0, cache_write_tokens: int = 0, batch: bool = False) -> Dict:
+    """
+    Normalised usage for one call: every provider's counters (zero except
+    `provider`'s), the model used and the call's cost. `input_tokens`
+    never includes cache reads or writes, whatever the provider reports.
+    "provider" and "model" name who answered; merged usage keeps the last
+    call's, e.g. the reduce call of a map-reduce run.
+    """
+    usage = {f"{p}_{field}": 0 for p in PROVIDERS for field in TOKEN_FIELDS}
+    usage.update({f"{p}_cost_usd": 0.0 for p in PROVIDERS})
+    usage.update({
+        f"{provider}_input_tokens": input_tokens,
+        f"{provider}_output_tokens": output_tokens,
+        f"{provider}_cache_read_tokens": cache_read_tokens,
+        f"{provider}_cache_write_tokens": cache_write_tokens,
+        f"{provider}_cost_usd": call_cost(
+            provider, model, input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, batch
+        ),
+        f"{provider}_model": model,
+        "provider": provider,
+        "model": model,
+    })
+    return usage
 
 def calculate_costs(usage_stats: Dict) -> Dict[str, float]:
     """
     Calculate costs in USD based on token usage.
-    
+
+    Usage from call_usage() carries each call's cost, priced for its model
+    and prompt size; older usage (e.g. from the response cache) is priced
+    from its token counts at the model the router calls for that provider.
+
     Returns:
         {
             'anthropic_cost': float,
             'openai_cost': float,
+            'gemini_cost': float,
             'total_cost': float
         }
     """
-    anthropic_input = usage_stats.get("anthropic_input_tokens", 0)
-    anthropic_output = usage_stats.get("anthropic_output_tokens", 0)
-    openai_input = usage_stats.get("openai_input_tokens", 0)
-    openai_output = usage_stats.get("openai_output_tokens", 0)
-    
-    # Calculate costs (tokens / 1,000,000 * price)
-    anthropic_cost = (
-        (anthropic_input / 1_000_000 * ANTHROPIC_INPUT_PRICE) +
-        (anthropic_output / 1_000_000 * ANTHROPIC_OUTPUT_PRICE)
-    )
-    
-    openai_cost = (
-        (openai_input / 1_000_000 * OPENAI_INPUT_PRICE) +
-        (openai_output / 1_000_000 * OPENAI_OUTPUT_PRICE)
-    )
-    
-    total_cost = anthropic_cost + openai_cost
-    
+    from app.services.model_router import MODELS  # imports this module
+
+    costs = {}
+    for provider in PROVIDERS:
+        if f"{provider}_cost_usd" in usage_stats:
+            cost = usage_stats[f"{provider}_cost_usd"]
+        else:
+            cost = call_cost(
+                provider, MODELS[provider],
+                *(usage_stats.get(f"{provider}_{field}", 0) for field in TOKEN_FIELDS),
+            )
+        costs[f"{provider}_cost"] = round(cost, 6)
+    costs["total_cost"] = round(sum(costs.values()), 6)
+    return costs
+
+
+def merge_usage(*usage_stats: Dict) -> Dict:
+    """Sum the token counts and costs of several provider calls into one usage dict."""
+    merged: Dict = {}
+    for usage in usage_stats:
+        for key, value in usage.items():
+            if isinstance(value, str):
+                # Provider and model names: keep the one that did most recent work
+                if value:
+                    merged[key] = value
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def token_totals(usage_stats: Dict) -> Dict[str, int]:
+    """Input (including cached) and output tokens summed across providers."""
+    input_fields = ("_input_tokens", "_cache_read_tokens", "_cache_write_tokens")
     return {
-        'anthropic_cost': round(anthropic_cost, 6),
-        'openai_cost': round(openai_cost, 6),
-        'total_cost': round(total_cost, 6)
+        "input": sum(v for k, v in usage_stats.items() if k.endswith(input_fields)),
+        "output": sum(v for k, v in usage_stats.items() if k.endswith("_output_tokens")),
     }
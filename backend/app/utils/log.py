@@ -0,0 +1,35 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, event, then the event's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+logger = logging.getLogger("pkh")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(JsonFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    """Write a structured log line, e.g. log_event("job_done", job_id=3)."""
+    logger.log(level, event, extra={"fields": fields})
+
+def log_error(event: str, error: BaseException | None = None, **fields):
+    if error is not None:
+        fields["error"] = f"{type(error).__name__}: {error}"
+    log_event(event, logging.ERROR, **fields)
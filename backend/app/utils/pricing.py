@@ -0,0 +1,76 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Dict
+from app.config import settings
+from app.utils.log import log_event
+
+# USD per million tokens, by provider and model. `input` is uncached prompt
+# tokens; `cache_read` / `cache_write` are the prompt-cache rates; `batch_*`
+# apply to provider batch APIs. A `long_context` entry overrides any of the
+# rates for calls whose whole prompt is over its `above_tokens`.
+DEFAULT_PRICING = {
+    "anthropic": {
+        "claude-sonnet-4-20250514": {
+            "input": 3.00, "output": 15.00, "cache_read": 0.30, "cache_write": 3.75,
+            "batch_input": 1.50, "batch_output": 7.50,
+        },
+    },
+    "openai": {
+        "gpt-5": {
+            "input": 1.25, "output": 10.00, "cache_read": 0.125,
+            "batch_input": 0.625, "batch_output": 5.00,
+        },
+    },
+    "gemini": {
+        "gemini-1.5-pro": {
+            "input": 1.25, "output": 5.00, "cache_read": 0.3125,
+            "batch_input": 0.625, "batch_output": 2.50,
+            "long_context": {
+                "above_tokens": 128_000,
+                "input": 2.50, "output": 10.00, "cache_read": 0.625,
+                "batch_input": 1.25, "batch_output": 5.00,
+            },
+        },
+    },
+}
+
+
+@lru_cache(maxsize=1)
+def pricing() -> Dict:
+    """
+    DEFAULT_PRICING, with any models in the PRICING_FILE JSON (same shape)
+    added or replaced.
+    """
+    table = {provider: dict(models) for provider, models in DEFAULT_PRICING.items()}
+    if settings.PRICING_FILE:
+        with open(settings.PRICING_FILE, encoding="utf-8") as f:
+            for provider, models in json.load(f).items():
+                table.setdefault(provider, {}).update(models)
+    return table
+
+
+def model_rates(provider: str, model: str, prompt_tokens: int = 0) -> Dict:
+    """The rates for one call; {} (free) for a model missing from the table."""
+    rates = pricing().get(provider, {}).get(model)
+    if rates is None:
+        log_event("pricing_missing", logging.WARNING, provider=provider, model=model)
+        return {}
+    tier = rates.get("long_context")
+    if tier and prompt_tokens > tier["above_tokens"]:
+        rates = dict(rates, **tier)
+    return rates
+
+
+def call_cost(provider: str, model: str, input_tokens: int, output_tokens: int,
+              cache_read_tokens: int = 0, cache_write_tokens: int = 0, batch: bool = False) -> float:
+    """USD for one call, from normalised counts (`input_tokens` excludes cached tokens)."""
+    rates = model_rates(provider, model, input_tokens + cache_read_tokens + cache_write_tokens)
+    input_rate = rates.get("batch_input", rates.get("input", 0)) if batch else rates.get("input", 0)
+    output_rate = rates.get("batch_output", rates.get("output", 0)) if batch else rates.get("output", 0)
+    return (
+        input_tokens * input_rate
+        + output_tokens * output_rate
+        + cache_read_tokens * rates.get("cache_read", input_rate)
+        + cache_write_tokens * rates.get("cache_write", input_rate)
+    ) / 1_000_000
@@ -0,0 +1,17 @@
+# Rough English-text ratio; good enough for budgeting, not for billing
+CHARS_PER_TOKEN = 4
+
+# Per-provider ratios for legal-pack text (figures, dates and title numbers
+# split into more tokens on Claude's tokenizer than on OpenAI's or Gemini's)
+PROVIDER_CHARS_PER_TOKEN = {
+    "anthropic": 3.5,
+    "openai": 4.0,
+    "gemini": 4.0,
+}
+
+def estimate_tokens(text: str, provider: str | None = None) -> int:
+    """Estimate the token count of a piece of text, for `provider` if given."""
+    if provider is None:
+        return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    ratio = PROVIDER_CHARS_PER_TOKEN.get(provider, CHARS_PER_TOKEN)
+    return int(len(text or "") / ratio + 0.999)
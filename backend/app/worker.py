@@ -0,0 +1,78 @@
+"""
+Background analysis workers.
+
+    python -m app.worker
+
+Starts JOB_WORKERS processes. Each one polls the analysis_jobs table,
+claims jobs with SKIP LOCKED and runs the same pipeline as POST /analyze/pack.
+SIGTERM/SIGINT let the current job finish before exiting.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+from app.config import settings
+from app.database import SessionLocal, init_db
+from app.services.http_clients import provider_clients
+from app.services.jobs import claim_next_job, run_job
+from app.services.pool import share_cpus, shutdown_process_pool
+from app.services.prompts import check_prompt_budget
+from app.services.rag import KNOWLEDGE_BASE
+from app.utils.log import log_event
+
+async def worker_loop(worker_id: str, stopping: asyncio.Event):
+    provider_clients.start()
+    log_event("worker_polling", worker_id=worker_id)
+    try:
+        while not stopping.is_set():
+            with SessionLocal() as db:
+                job = claim_next_job(db, worker_id)
+                if job is not None:
+                    log_event("job_claimed", worker_id=worker_id, job_id=job.id, attempt=job.attempts)
+                    await run_job(db, job)
+                    continue
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await provider_clients.aclose()
+        shutdown_process_pool()
+
+def _run_worker(index: int):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    # Every worker process starts an ingest pool; together they fill the CPUs once
+    share_cpus(settings.JOB_WORKERS)
+
+    async def main():
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stopping.set)
+        await worker_loop(worker_id, stopping)
+
+    asyncio.run(main())
+
+def main():
+    check_prompt_budget(KNOWLEDGE_BASE)
+    init_db()
+    processes = [
+        multiprocessing.get_context("spawn").Process(target=_run_worker, args=(i,), name=f"job-worker-{i}")
+        for i in range(settings.JOB_WORKERS)
+    ]
+    for p in processes:
+        p.start()
+
+    def forward(signum, frame):
+        for p in processes:
+            if p.is_alive():
+                os.kill(p.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for p in processes:
+        p.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Batch analysis of a synthetic catalogue against local stub batch APIs.
+
+    python -m benchmarks.bench_batch                 # 40 lots of 30 pages
+    python -m benchmarks.bench_batch 150 20          # lots, pages per lot
+
+Run from the backend/ directory. The lots are deterministic ReportLab
+PDFs written to a temp dir and sent through services.batch.analyze_batch
+(without the database write): spool and ingest in parallel, then prompts
+through StubBatchProviders answering like the Anthropic Message Batches
+and OpenAI Batch APIs (see benchmarks/stub_llm.py). Requests the batch
+fails fall back to StubProviders on the interactive path.
+
+    all-anthropic  every lot in one Anthropic batch
+    split          the second half of the lots batched on OpenAI (Anthropic key unset)
+    errors         10% of Anthropic batch requests fail and go interactive
+    many-batches   BATCH_MAX_REQUESTS=8, so several batches in flight
+
+Reported: wall time, how each lot was answered, batches and polls the
+stubs saw, interactive calls, and the cost against the same tokens at
+interactive prices.
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Before anything imports app.config: no caches, keys for the stubs only
+os.environ.update({
+    "EXTRACT_CACHE_BACKEND": "off",
+    "RESPONSE_CACHE_BACKEND": "off",
+    "REPORT_CACHE_BACKEND": "off",
+    "USE_TEXTRACT": "false",
+    "RAG_BACKEND": "flat",
+    "RAG_EMBEDDER": "hashing",
+    "ANTHROPIC_API_KEY": "bench",
+    "OPENAI_API_KEY": "bench",
+    "GOOGLE_API_KEY": "",
+})
+
+from app.config import settings
+from app.services.batch import analyze_batch
+from app.services.http_clients import provider_clients
+from app.services.pool import shutdown_process_pool
+from app.utils.cost_calculator import PROVIDERS, TOKEN_FIELDS
+from app.utils.pricing import call_cost
+from benchmarks.stub_llm import StubBatchProvider, StubProvider, point_batches_at, point_router_at, serve
+from benchmarks.synthetic import make_pdf
+
+DEFAULT_LOTS = 40
+DEFAULT_PAGES = 30
+
+# (name, anthropic batch behaviour, settings overrides, split across providers)
+SCENARIOS = [
+    ("all-anthropic", {}, {}, False),
+    ("split", {}, {}, True),
+    ("errors", {"error_ratio": 0.1}, {}, False),
+    ("many-batches", {}, {"BATCH_MAX_REQUESTS": 8}, False),
+]
+
+# Scaled down from the production defaults so each scenario runs in seconds
+BENCH_SETTINGS = {
+    "BATCH_POLL_INTERVAL_SECONDS": 0.2,
+    "BATCH_MAX_REQUESTS": 100,
+}
+
+
+def full_price(usage: dict) -> float:
+    """What the same tokens would have cost on the interactive path."""
+    return sum(
+        call_cost(provider, usage[f"{provider}_model"], *(usage[f"{provider}_{field}"] for field in TOKEN_FIELDS))
+        for provider in PROVIDERS if usage.get(f"{provider}_model")
+    )
+
+
+async def run(paths: list, split: bool) -> list:
+    if not split:
+        return await analyze_batch(paths, save=False)
+    # The second half as if no Anthropic key were set, so it batches on OpenAI
+    half = len(paths) // 2
+    outcomes = await analyze_batch(paths[:half], save=False)
+    settings.ANTHROPIC_API_KEY = None
+    try:
+        return outcomes + await analyze_batch(paths[half:], save=False)
+    finally:
+        settings.ANTHROPIC_API_KEY = "bench"
+
+
+async def main(lots: int, pages: int):
+    logging.getLogger("pkh").setLevel(logging.WARNING)
+    batch_stubs = {"anthropic": StubBatchProvider("anthropic", seed=1), "openai": StubBatchProvider("openai", seed=2)}
+    call_stubs = {"anthropic": StubProvider("anthropic", seed=3), "openai": StubProvider("openai", seed=4)}
+    servers = []
+    for provider in ("anthropic", "openai"):
+        server, url = serve(batch_stubs[provider])
+        point_batches_at(provider, url)
+        servers.append(server)
+        server, url = serve(call_stubs[provider])
+        point_router_at(provider, url)
+        servers.append(server)
+    provider_clients.start()
+
+    with tempfile.TemporaryDirectory(prefix="pkh_bench_batch_") as tmp:
+        paths = []
+        for i in range(lots):
+            path = os.path.join(tmp, f"lot_{i + 1:03d}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_pdf(pages, seed=100 + i))
+            paths.append(path)
+
+        print(f"{lots} lots x {pages} pages\n")
+        print(f"{'scenario':<14} {'wall s':>7} {'batch':>6} {'inter.':>7} {'failed':>7} "
+              f"{'batches a/o':>12} {'polls':>6} {'calls':>6} {'cost $':>9} {'full $':>9} {'saving':>7}")
+        try:
+            for name, behaviour, overrides, split in SCENARIOS:
+                for key, value in dict(BENCH_SETTINGS, **overrides).items():
+                    setattr(settings, key, value)
+                batch_stubs["anthropic"].configure(**behaviour)
+                batch_stubs["openai"].configure()
+                for stub in call_stubs.values():
+                    stub.configure()
+
+                start = time.perf_counter()
+                outcomes = await run(paths, split)
+                wall = time.perf_counter() - start
+
+                routes = [o["route"] for o in outcomes]
+                cost = sum(o["cost_usd"] or 0 for o in outcomes)
+                full = sum(full_price(o["usage"]) for o in outcomes if o["usage"])
+                print(f"{name:<14} {wall:>7.1f} {routes.count('batch'):>6} {routes.count('interactive'):>7} "
+                      f"{sum(1 for o in outcomes if o['error']):>7} "
+                      f"{batch_stubs['anthropic'].submitted:>5}/{batch_stubs['openai'].submitted:<6} "
+                      f"{batch_stubs['anthropic'].polls + batch_stubs['openai'].polls:>6} "
+                      f"{sum(stub.requests for stub in call_stubs.values()):>6} "
+                      f"{cost:>9.4f} {full:>9.4f} {1 - cost / full if full else 0:>7.0%}")
+        finally:
+            await provider_clients.aclose()
+            shutdown_process_pool()
+            for server in servers:
+                server.should_exit = True
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else DEFAULT_LOTS, args[1] if len(args) > 1 else DEFAULT_PAGES))
@@ -0,0 +1,96 @@
+"""
+Compare the legacy first-match classifier with the scored batch classifier.
+
+    python -m benchmarks.bench_classify             # 500, 2k and 10k pages
+    python -m benchmarks.bench_classify 300         # custom sizes
+
+Run from the backend/ directory. The two are not expected to agree on every
+page (the legacy one depends on KEYWORDS order and ignores neighbours), so
+the agreement rate is reported rather than enforced.
+
+Also times the keyword scan `_keyword_counts` uses (one str.find sweep per
+keyword over the joined pack) against a single pass of one compiled
+alternation of every keyword.
+"""
+import random
+import re
+import sys
+import time
+from app.services.classify import _KEYWORD_LIST, _PAGE_BREAK, KEYWORDS, classify_documents
+from benchmarks.synthetic import FILLER, SECTIONS
+
+DEFAULT_SIZES = [500, 2_000, 10_000]
+
+
+def legacy_classify(pages: list) -> list:
+    """The pre-scoring `classify_documents`: nested any() per page."""
+    docs = []
+    for p in pages:
+        text = (p.get("text") or "").lower()
+        dtype = "Other"
+        for dt, kws in KEYWORDS.items():
+            if any(kw in text for kw in kws):
+                dtype = dt
+                break
+        docs.append({"type": dtype, "page": p["page"], "text": p["text"]})
+    return docs
+
+
+def make_pages(count: int, seed: int = 0) -> list:
+    """Pages of ~3,000 chars in five-page sections spread over a few PDFs."""
+    rng = random.Random(seed)
+    pages = []
+    for n in range(count):
+        heading, body = SECTIONS[(n // 5) % len(SECTIONS)]
+        lines = [heading if n % 5 == 0 else ""]
+        lines += [body if rng.random() < 0.1 else FILLER for _ in range(12)]
+        pages.append({"page": n + 1, "text": "\n".join(lines), "source": f"pack_{n // 40}.pdf"})
+    return pages
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def find_scan(text: str) -> int:
+    """Keyword hits as `_keyword_counts` finds them: str.find per keyword."""
+    hits = 0
+    for kw in _KEYWORD_LIST:
+        i = text.find(kw)
+        while i != -1:
+            hits += 1
+            i = text.find(kw, i + 1)
+    return hits
+
+
+# Longest first, so a keyword is not cut short by one it starts with
+_ALTERNATION = re.compile("|".join(re.escape(kw) for kw in sorted(_KEYWORD_LIST, key=len, reverse=True)))
+
+
+def regex_scan(text: str) -> int:
+    """Keyword hits in one pass of a compiled alternation."""
+    return sum(1 for _ in _ALTERNATION.finditer(text))
+
+
+def main(sizes):
+    print(f"{'pages':>7} {'legacy ms':>10} {'scored ms':>10} {'speedup':>8}  agreement")
+    for size in sizes:
+        pages = make_pages(size, seed=size)
+        legacy_s, old = _time(lambda: legacy_classify(pages))
+        scored_s, new = _time(lambda: classify_documents(pages))
+        agree = sum(a["type"] == b["type"] for a, b in zip(old, new)) / size
+        print(f"{size:>7} {legacy_s * 1000:>10.1f} {scored_s * 1000:>10.1f} {legacy_s / scored_s:>7.1f}x  {agree:.0%}")
+
+    print(f"\n{'pages':>7} {'find ms':>10} {'regex ms':>10} {'hits':>8}")
+    for size in sizes:
+        text = _PAGE_BREAK.join(p["text"].lower() for p in make_pages(size, seed=size))
+        find_s, hits = _time(lambda: find_scan(text))
+        regex_s, regex_hits = _time(lambda: regex_scan(text))
+        assert hits == regex_hits
+        print(f"{size:>7} {find_s * 1000:>10.1f} {regex_s * 1000:>10.1f} {hits:>8}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
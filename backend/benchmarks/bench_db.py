@@ -0,0 +1,110 @@
+"""
+Load test the sync-session and async-session database paths under
+concurrent requests.
+
+    python -m benchmarks.bench_db                   # 200 requests, 10/50 concurrent
+    python -m benchmarks.bench_db 500 100           # requests, concurrency...
+    BENCH_DB_QUERY_MS=20 python -m benchmarks.bench_db
+
+Run from the backend/ directory against the database in DATABASE_URL (the
+analyses table must exist; it may be empty). Both endpoints run the
+/analyze/list query inside an `async def` route, served in-process through
+httpx's ASGI transport. `legacy` uses a blocking Session as the routes did
+before; `async` uses AsyncSession on the pooled async engine.
+BENCH_DB_QUERY_MS adds a pg_sleep to each query to stand in for a remote or
+busy database. While the load runs, a probe measures how late the event
+loop wakes up; a blocking session shows up there as well as in throughput.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import async_engine, engine, get_async_db, get_db
+from app.models.analysis import Analysis
+
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = [10, 50]
+QUERY_SECONDS = float(os.environ.get("BENCH_DB_QUERY_MS", "5")) / 1000
+
+LIST_QUERY = select(Analysis).order_by(Analysis.created_at.desc()).limit(50)
+SLEEP = text("SELECT pg_sleep(:s)")
+
+app = FastAPI()
+
+
+@app.get("/legacy")
+async def legacy_list(db: Session = Depends(get_db)):
+    db.execute(SLEEP, {"s": QUERY_SECONDS})
+    return {"total": len(db.scalars(LIST_QUERY).all())}
+
+
+@app.get("/async")
+async def async_list(db: AsyncSession = Depends(get_async_db)):
+    await db.execute(SLEEP, {"s": QUERY_SECONDS})
+    return {"total": len((await db.scalars(LIST_QUERY)).all())}
+
+
+async def _probe(stop: asyncio.Event, lags: list):
+    interval = 0.005
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(path: str, requests: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await client.get(path)  # warm the pool
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(stop, lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_lag_ms": max(lags, default=0) * 1000,
+    }
+
+
+async def main(requests: int, levels: list):
+    print(f"pool_size={settings.DB_POOL_SIZE} max_overflow={settings.DB_MAX_OVERFLOW} "
+          f"query_ms={QUERY_SECONDS * 1000:g}")
+    print(f"{'path':>7} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'loop lag ms':>12}")
+    try:
+        for concurrency in levels:
+            for path in ("/legacy", "/async"):
+                r = await run(path, requests, concurrency)
+                print(f"{path[1:]:>7} {concurrency:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+                      f"{r['p95_ms']:>8.1f} {r['max_lag_ms']:>12.1f}")
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else DEFAULT_REQUESTS, args[1:] or DEFAULT_CONCURRENCY))
@@ -0,0 +1,55 @@
+"""
+Compare the legacy per-page pdfminer extraction with the single-parse engine.
+
+    python -m benchmarks.bench_extract            # 10, 100 and 500 pages
+    python -m benchmarks.bench_extract 10 50      # custom sizes
+
+Run from the backend/ directory. The legacy path re-parses the whole
+document for every page, so the 500 page pack takes a while.
+"""
+import io
+import sys
+import time
+from pdfminer.high_level import extract_text
+from pypdf import PdfReader
+from app.services.ocr import iter_pdf_pages
+from benchmarks.synthetic import make_pdf
+
+DEFAULT_SIZES = [10, 100, 500]
+
+
+def legacy_extract(pdf_content: bytes) -> list:
+    """The pre-engine `_extract_pdf_pages` loop (native text only)."""
+    pages = []
+    reader = PdfReader(io.BytesIO(pdf_content))
+    for i, _ in enumerate(reader.pages):
+        try:
+            text = extract_text(io.BytesIO(pdf_content), page_numbers=[i]) or ""
+        except Exception:
+            text = ""
+        pages.append({"page": i + 1, "text": text, "source": "bench.pdf"})
+    return pages
+
+
+def streaming_extract(pdf_content: bytes) -> list:
+    return list(iter_pdf_pages(pdf_content, filename="bench.pdf"))
+
+
+def _time(fn, pdf_content: bytes):
+    start = time.perf_counter()
+    result = fn(pdf_content)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print(f"{'pages':>6} {'legacy s':>10} {'engine s':>10} {'speedup':>8}  identical")
+    for size in sizes:
+        pdf = make_pdf(size, seed=size)
+        legacy_s, legacy_pages = _time(legacy_extract, pdf)
+        engine_s, engine_pages = _time(streaming_extract, pdf)
+        identical = legacy_pages == engine_pages
+        print(f"{size:>6} {legacy_s:>10.2f} {engine_s:>10.2f} {legacy_s / engine_s:>7.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,267 @@
+"""
+End-to-end pipeline benchmark on synthetic packs, with a stub LLM server.
+
+    python -m benchmarks.bench_pipeline                          # all scenarios
+    python -m benchmarks.bench_pipeline --quick                  # small scenarios, 3 runs
+    python -m benchmarks.bench_pipeline --save baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json  # exit 1 on regression
+
+Run from the backend/ directory. Each scenario is a deterministic ReportLab
+pack (page count, scanned and blank page shares, single PDF or ZIP layout)
+pushed through the same stages as POST /analyze/pack: spool, extract,
+classify, chunk, redact (on the process pool), retrieval, prompt build, the
+provider call and citations. The provider is a local HTTP server that
+answers like the Anthropic messages API after --llm-latency-ms, so no keys
+or network are needed. The database write and PDF render are left out, and
+the extraction and response caches are off so every run does the full work.
+
+Reported per scenario: p50/p95/max latency overall and p50/p95 per stage,
+pages/sec at the p50, and peak RSS so far of this process and of the pool
+workers (ru_maxrss; the pool is restarted between scenarios so its peak is
+read after each one).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Before anything imports app.config: no caches, no real providers
+os.environ.update({
+    "EXTRACT_CACHE_BACKEND": "off",
+    "RESPONSE_CACHE_BACKEND": "off",
+    "REPORT_CACHE_BACKEND": "off",
+    "USE_TEXTRACT": "false",
+    "RAG_BACKEND": "flat",
+    "RAG_EMBEDDER": "hashing",
+    "ANTHROPIC_API_KEY": "bench",
+    "OPENAI_API_KEY": "",
+    "GOOGLE_API_KEY": "",
+})
+
+from app.services import model_router
+from app.services.http_clients import provider_clients
+from app.services.ingest import discard_spool, ingest_pack, spool_upload
+from app.services.map_reduce import map_reduce_analyze, needs_map_reduce
+from app.services.pool import shutdown_process_pool
+from app.services.prompts import assemble_prompt
+from app.services.rag import enrich_with_rag
+from app.utils.address_extractor import extract_property_address
+from app.utils.citations import attach_citations
+from app.utils.cost_calculator import calculate_costs
+from benchmarks.stub_llm import StubProvider, point_router_at, serve
+from benchmarks.synthetic import make_pdf, make_zip
+
+SCENARIOS = [
+    {"name": "pdf-20", "pdfs": 1, "pages": 20, "quick": True},
+    {"name": "pdf-200-scanned", "pdfs": 1, "pages": 200, "scanned": 0.15, "blank": 0.05},
+    {"name": "zip-flat-5x40", "pdfs": 5, "pages": 40, "scanned": 0.1, "layout": "flat", "quick": True},
+    {"name": "zip-nested-12x25", "pdfs": 12, "pages": 25, "blank": 0.05, "layout": "nested"},
+    {"name": "pdf-600", "pdfs": 1, "pages": 600},
+]
+
+STAGES = [
+    "upload_read", "extract", "classify", "chunk", "redact", "rag", "prompt_build", "llm", "citations",
+]
+
+
+def build_pack(scenario: dict, seed: int = 7) -> tuple:
+    """(filename, bytes) for a scenario; the same bytes every time."""
+    pdfs = {
+        f"doc_{i + 1:02d}.pdf": make_pdf(
+            scenario["pages"], seed=seed + i,
+            scanned_ratio=scenario.get("scanned", 0.0), blank_ratio=scenario.get("blank", 0.0),
+        )
+        for i in range(scenario["pdfs"])
+    }
+    if scenario.get("layout"):
+        return "pack.zip", make_zip(pdfs, scenario["layout"])
+    return "pack.pdf", next(iter(pdfs.values()))
+
+
+class _Upload:
+    """Just enough of UploadFile for spool_upload."""
+
+    def __init__(self, filename: str, content: bytes):
+        self.filename = filename
+        self._content = content
+        self._offset = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._content) if size < 0 else self._offset + size
+        block = self._content[self._offset:end]
+        self._offset += len(block)
+        return block
+
+
+async def run_pack(filename: str, content: bytes) -> dict:
+    """One pack through the pipeline; returns {stage: ms} plus total."""
+    stages = {}
+    start = time.perf_counter()
+
+    def lap(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        stages[stage] = (now - since) * 1000
+        return now
+
+    async def progress(stage: str, info: dict):
+        stages[stage] = info["ms"]
+
+    spooled = await spool_upload(_Upload(filename, content))
+    t = lap("upload_read", start)
+    try:
+        ingested = await ingest_pack(spooled, progress=progress)
+        t = time.perf_counter()
+        context = await enrich_with_rag(ingested["safe_chunks"])
+        t = lap("rag", t)
+        meta = {"page_map": [c["meta"] for c in ingested["chunks"]], "size": len(ingested["pages"])}
+        context, prompt = assemble_prompt(context, model_router.preferred_provider(meta))
+        t = lap("prompt_build", t)
+        if needs_map_reduce(prompt):
+            text, usage = await map_reduce_analyze(context, meta)
+        else:
+            text, usage = await model_router.analyze_with_router(prompt, meta)
+        t = lap("llm", t)
+        report_md, _, _ = attach_citations(text, ingested["chunks"])
+        extract_property_address(report_md)
+        calculate_costs(usage)
+        lap("citations", t)
+    finally:
+        discard_spool(spooled)
+    stages["total"] = (time.perf_counter() - start) * 1000
+    stages["pages"] = len(ingested["pages"])
+    return stages
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def _summary(values: list) -> dict:
+    return {"p50": round(_percentile(values, 0.5), 1), "p95": round(_percentile(values, 0.95), 1),
+            "max": round(max(values), 1)}
+
+
+def _max_rss_mb(who) -> float:
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(who).ru_maxrss / scale, 1)
+
+
+async def bench_scenario(scenario: dict, repeat: int) -> dict:
+    filename, content = build_pack(scenario)
+    await run_pack(filename, content)  # warm-up: pool start, imports
+    runs = [await run_pack(filename, content) for _ in range(repeat)]
+    shutdown_process_pool()
+
+    total = _summary([r["total"] for r in runs])
+    pages = runs[0]["pages"]
+    return {
+        "pages": pages,
+        "bytes": len(content),
+        "runs": repeat,
+        "total_ms": total,
+        "stages_ms": {s: _summary([r.get(s, 0.0) for r in runs]) for s in STAGES},
+        "pages_per_sec": round(pages / (total["p50"] / 1000), 1) if total["p50"] else 0.0,
+        "peak_rss_mb": _max_rss_mb(resource.RUSAGE_SELF),
+        "peak_pool_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict):
+    print(f"{'scenario':<20} {'pages':>6} {'p50 ms':>9} {'p95 ms':>9} {'pages/s':>8} {'rss MB':>7} {'pool MB':>8}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['pages']:>6} {r['total_ms']['p50']:>9.1f} {r['total_ms']['p95']:>9.1f} "
+              f"{r['pages_per_sec']:>8.1f} {r['peak_rss_mb']:>7.1f} {r['peak_pool_rss_mb']:>8.1f}")
+        print("    " + "  ".join(f"{s} {r['stages_ms'][s]['p50']:.0f}" for s in STAGES))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print p50 changes against a saved baseline; True if any regressed."""
+    regressed = False
+    print(f"\n{'scenario':<20} {'metric':<14} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, r in results.items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            print(f"{name:<20} (not in baseline)")
+            continue
+        rows = [("total p50 ms", old["total_ms"]["p50"], r["total_ms"]["p50"])]
+        rows += [(f"{s} p50", old["stages_ms"][s]["p50"], r["stages_ms"][s]["p50"])
+                 for s in STAGES if s in old["stages_ms"]]
+        rows.append(("pool rss MB", old["peak_pool_rss_mb"], r["peak_pool_rss_mb"]))
+        for metric, before, now in rows:
+            change = (now - before) / before if before else 0.0
+            # Stages under 5 ms are noise; judge them on the total instead
+            flag = change > threshold and (metric.startswith("total") or before >= 5)
+            regressed |= flag and metric.startswith("total")
+            print(f"{name:<20} {metric:<14} {before:>10.1f} {now:>10.1f} {change:>+7.0%}{'  !' if flag else ''}")
+    return regressed
+
+
+async def main(args):
+    logging.getLogger("pkh").setLevel(logging.WARNING)
+    server, url = serve(StubProvider("anthropic", latency=args.llm_latency_ms / 1000))
+    point_router_at("anthropic", url)
+    provider_clients.start()
+
+    scenarios = [s for s in SCENARIOS if (not args.quick or s.get("quick"))
+                 and (not args.scenario or s["name"] in args.scenario)]
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario["name"]] = await bench_scenario(scenario, args.repeat)
+    finally:
+        await provider_clients.aclose()
+        shutdown_process_pool()
+        server.should_exit = True
+
+    print_results(results)
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "scenarios": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(f"\nRegression: a total p50 is more than {args.threshold:.0%} slower")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="small scenarios only, 3 runs")
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--repeat", type=int, default=None, help="timed runs per scenario (default 5)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown (default 0.15)")
+    args = parser.parse_args()
+    args.repeat = args.repeat or (3 if args.quick else 5)
+    asyncio.run(main(args))
@@ -0,0 +1,68 @@
+"""
+Compare the legacy four-pass redaction with the single-scan engine.
+
+    python -m benchmarks.bench_redact             # 1k, 5k and 20k chunks
+    python -m benchmarks.bench_redact 500         # custom sizes
+
+Run from the backend/ directory. tests/test_redact.py checks that both
+give identical output, on a golden set of awkward inputs and on chunks
+from make_chunks.
+"""
+import random
+import re
+import sys
+import time
+from app.services.redact import redact_chunks
+from benchmarks.synthetic import FILLER, SECTIONS
+
+DEFAULT_SIZES = [1_000, 5_000, 20_000]
+
+PII = [
+    "AB123456C", "12345678", "jane.doe@example.com", "+447700900123",
+    "02079460000", "QQ123456A", "ref-87654321", "x.12345678@y.org",
+]
+
+
+def legacy_redact(chunk: dict) -> dict:
+    """The pre-engine `redact_sensitive`: four full re.sub passes."""
+    c = chunk.copy()
+    text = c.get("content") or ""
+    text = re.sub(r"\b[A-CEGHJ-PR-TW-Z]{2}\d{6}[A-D]\b", "[REDACTED_NI]", text, flags=re.I)
+    text = re.sub(r"\b\d{8}\b", "[REDACTED_ACCT]", text)
+    text = re.sub(r"[\w\.-]+@[\w\.-]+", "[REDACTED_EMAIL]", text)
+    text = re.sub(r"\b\+?\d{7,}\b", "[REDACTED_PHONE]", text)
+    c["content"] = text
+    return c
+
+
+def make_chunks(count: int, seed: int = 0) -> list:
+    """Legal-pack style chunks of ~1,200 chars, a few carrying PII."""
+    rng = random.Random(seed)
+    chunks = []
+    for n in range(count):
+        heading, body = SECTIONS[n % len(SECTIONS)]
+        words = (body + " " + FILLER * 5).split()
+        for _ in range(rng.randrange(0, 4)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(PII))
+        chunks.append({"doc_type": heading.lower(), "content": " ".join(words)[:1200], "meta": {"page": n + 1}})
+    return chunks
+
+
+def _time(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'chunks':>7} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}  replacements")
+    for size in sizes:
+        chunks = make_chunks(size, seed=size)
+        _, report = redact_chunks(chunks)
+        legacy_s = _time(lambda: [legacy_redact(c) for c in chunks])
+        engine_s = _time(lambda: redact_chunks(chunks))
+        print(f"{size:>7} {legacy_s * 1000:>10.1f} {engine_s * 1000:>10.1f} {legacy_s / engine_s:>7.1f}x  {report['counts']}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
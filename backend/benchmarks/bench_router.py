@@ -0,0 +1,121 @@
+"""
+Exercise provider routing against local stub providers.
+
+    python -m benchmarks.bench_router              # 200 calls, 10 concurrent
+    python -m benchmarks.bench_router 500 20       # calls, concurrency
+
+Run from the backend/ directory. Anthropic and OpenAI are replaced by
+StubProviders on localhost (see benchmarks/stub_llm.py) and each scenario
+sends the same calls through analyze_with_router:
+
+    healthy       both providers answer in ~50 ms
+    rate-limited  30% of Anthropic calls get 429 with Retry-After: 0.2
+    overloaded    every Anthropic call gets 529; the circuit should open
+    slow-tail     10% of Anthropic calls take 2 s, without and with hedging
+
+Retry delays and the breaker cool-down are scaled down so a run takes
+seconds. Reported: success rate, latency percentiles, which provider
+answered, and how many requests each stub received (retries and hedges
+included).
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+os.environ.update({"ANTHROPIC_API_KEY": "bench", "OPENAI_API_KEY": "bench", "GOOGLE_API_KEY": ""})
+
+from app.config import settings
+from app.services.http_clients import provider_clients
+from app.services.model_router import analyze_with_router
+from app.services.routing import router
+from benchmarks.stub_llm import StubProvider, point_router_at, serve
+
+DEFAULT_CALLS = 200
+DEFAULT_CONCURRENCY = 10
+
+PROMPT = {"system": "You are a property lawyer.", "user": "Summarise the pack. " * 200}
+
+SCENARIOS = [
+    ("healthy", {}, {}),
+    ("rate-limited", {"error_status": 429, "error_ratio": 0.3, "retry_after": 0.2}, {}),
+    ("overloaded", {"error_status": 529, "error_ratio": 1.0}, {}),
+    ("slow-tail", {"slow_latency": 2.0, "slow_ratio": 0.1}, {}),
+    ("slow-tail+hedge", {"slow_latency": 2.0, "slow_ratio": 0.1}, {"ROUTER_HEDGE_PERCENTILE": 0.9}),
+]
+
+# Scaled down from the production defaults so each scenario runs in seconds
+BENCH_SETTINGS = {
+    "ROUTER_RETRY_BASE_SECONDS": 0.05,
+    "ROUTER_RETRY_MAX_SECONDS": 1.0,
+    "ROUTER_BREAKER_COOLDOWN_SECONDS": 1.0,
+    "ROUTER_MIN_SAMPLES": 10,
+    "ROUTER_HEDGE_PERCENTILE": 0.0,
+    "ROUTER_HEDGE_MIN_SECONDS": 0.05,
+}
+
+
+async def run(calls: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, served, failed = [], {"anthropic": 0, "openai": 0}, 0
+
+    async def one():
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                _, usage = await analyze_with_router(PROMPT, {"size": 20})
+            except Exception:
+                failed += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            served["anthropic" if usage["anthropic_input_tokens"] else "openai"] += 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    latencies.sort()
+
+    def at(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {"ok": 1 - failed / calls, "p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "served": served}
+
+
+async def main(calls: int, concurrency: int):
+    logging.getLogger("pkh").setLevel(logging.WARNING)
+    anthropic, openai = StubProvider("anthropic", seed=1), StubProvider("openai", seed=2)
+    servers = []
+    for stub in (anthropic, openai):
+        server, url = serve(stub)
+        point_router_at(stub.provider, url)
+        servers.append(server)
+    provider_clients.start()
+
+    print(f"{'scenario':<16} {'ok':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'served a/o':>11} {'requests a/o':>13} {'circuit':>9}")
+    try:
+        for name, anthropic_behaviour, overrides in SCENARIOS:
+            for key, value in dict(BENCH_SETTINGS, **overrides).items():
+                setattr(settings, key, value)
+            anthropic.configure(**anthropic_behaviour)
+            openai.configure()
+            router.reset()
+            # Warm the latency window so hedging has a percentile to work from
+            for _ in range(settings.ROUTER_MIN_SAMPLES):
+                await analyze_with_router(PROMPT, {"size": 20})
+            anthropic.requests = openai.requests = 0
+
+            r = await run(calls, concurrency)
+            circuit = router.snapshot().get("anthropic", {}).get("circuit", "-")
+            print(f"{name:<16} {r['ok']:>6.1%} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+                  f"{r['served']['anthropic']:>5}/{r['served']['openai']:<5} "
+                  f"{anthropic.requests:>6}/{openai.requests:<6} {circuit:>9}")
+    finally:
+        await provider_clients.aclose()
+        for server in servers:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else DEFAULT_CALLS, args[1] if len(args) > 1 else DEFAULT_CONCURRENCY))
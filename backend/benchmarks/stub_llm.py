@@ -0,0 +1,316 @@
+"""
+Local stand-ins for the LLM provider APIs, for benchmarks.
+
+A StubProvider answers in its provider's response format after a set
+delay (as a server-sent event stream when the request asks to stream),
+and can be made slow on a share of calls, fail with a given HTTP status
+(with an optional Retry-After or retry-after-ms) or drop a stream part
+way. `serve` runs it on localhost with uvicorn and `point_router_at` sends
+model_router's calls to it, so the real request, retry and routing code
+runs without keys or network.
+
+A StubBatchProvider does the same for the Anthropic Message Batches and
+OpenAI Batch (plus Files) APIs; `point_batches_at` sends services.batch
+to it.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uvicorn
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from app.services import model_router
+
+STUB_REPORT = """Property: 12 Example Road, London SW1A 1AA
+
+**VERDICT: AMBER**
+
+## Key Terms
+- Ground rent £250 doubling every 25 years (Lease, p.12)
+- Completion 20 business days after exchange (Special Conditions, p.3)
+- Buyer pays seller's legal costs of £1,500 plus VAT (Special Conditions, p.4)
+
+## Red Flags
+1. Doubling ground rent (Lease, p.12)
+2. Service charge balancing charges outstanding (Replies to Enquiries, p.40)
+"""
+
+
+def stream_events(provider: str, text: str, input_tokens: int) -> tuple:
+    """
+    The `data:` payloads of `provider`'s event stream for `text`, as
+    (events before the text, one text delta per word, events after it).
+    """
+    output_tokens = len(text) // 4
+    words = re.findall(r"\S+\s*", text)
+    if provider == "anthropic":
+        return (
+            [{"type": "message_start", "message": {"usage": {"input_tokens": input_tokens, "output_tokens": 1}}}],
+            [{"type": "content_block_delta", "delta": {"type": "text_delta", "text": w}} for w in words],
+            [{"type": "message_delta", "usage": {"output_tokens": output_tokens}}, {"type": "message_stop"}],
+        )
+    if provider == "openai":
+        return (
+            [],
+            [{"choices": [{"delta": {"content": w}}]} for w in words],
+            [{"choices": [], "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}}],
+        )
+    return (
+        [],
+        [{"candidates": [{"content": {"parts": [{"text": w}]}}]} for w in words],
+        [{"usageMetadata": {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens}}],
+    )
+
+
+def response_body(provider: str, text: str, input_tokens: int) -> dict:
+    output_tokens = len(text) // 4
+    if provider == "anthropic":
+        return {"content": [{"type": "text", "text": text}],
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+    if provider == "openai":
+        return {"choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}}
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens}}
+
+
+class StubProvider:
+    """
+    ASGI app answering calls like `provider`'s API. The first `fail_first`
+    requests after configure() fail with `error_status`, then a random
+    `error_ratio` of them; a stream is cut off after `drop_stream_after`
+    text deltas. `requests`, `errors` and `dropped` count what it saw.
+    """
+
+    def __init__(self, provider: str, seed: int = 0, **behaviour):
+        self.provider = provider
+        self.rng = random.Random(seed)
+        self.configure(**behaviour)
+
+    def configure(self, latency: float = 0.05, slow_latency: float = 0.0, slow_ratio: float = 0.0,
+                  error_status: int | None = None, error_ratio: float = 0.0, retry_after: float | None = None,
+                  retry_after_ms: float | None = None, fail_first: int = 0, drop_stream_after: int | None = None,
+                  text: str = STUB_REPORT):
+        """Set how the stub behaves from now on and zero its counters."""
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_ratio = slow_ratio
+        self.error_status = error_status
+        self.error_ratio = error_ratio
+        self.retry_after = retry_after
+        self.retry_after_ms = retry_after_ms
+        self.fail_first = fail_first
+        self.drop_stream_after = drop_stream_after
+        self.text = text
+        self.requests = 0
+        self.errors = 0
+        self.dropped = 0
+
+    async def __call__(self, scope, receive, send):
+        body, more = b"", True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        self.requests += 1
+
+        if self.error_status and (self.requests <= self.fail_first or self.rng.random() < self.error_ratio):
+            self.errors += 1
+            headers = [(b"content-type", b"application/json")]
+            if self.retry_after is not None:
+                headers.append((b"retry-after", str(self.retry_after).encode()))
+            if self.retry_after_ms is not None:
+                headers.append((b"retry-after-ms", str(self.retry_after_ms).encode()))
+            await send({"type": "http.response.start", "status": self.error_status, "headers": headers})
+            await send({"type": "http.response.body", "body": b'{"error": {"type": "stub_error"}}'})
+            return
+
+        slow = self.rng.random() < self.slow_ratio
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        streaming = scope["path"].endswith(":streamGenerateContent") or json.loads(body or b"{}").get("stream")
+        if streaming:
+            await self._stream(send, len(body) // 4)
+            return
+        payload = json.dumps(response_body(self.provider, self.text, len(body) // 4)).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+
+    async def _stream(self, send, input_tokens: int):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        head, deltas, tail = stream_events(self.provider, self.text, input_tokens)
+        for i, event in enumerate(head + deltas + tail):
+            if self.drop_stream_after is not None and i == len(head) + self.drop_stream_after:
+                # Raising mid-response makes the server drop the connection
+                self.dropped += 1
+                raise ConnectionAbortedError("stub dropped the stream")
+            chunk = f"data: {json.dumps(event)}\n\n".encode()
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n" if self.provider == "openai" else b""})
+
+
+class StubBatchProvider:
+    """
+    ASGI app answering `provider`'s batch API. A batch ends `latency`
+    seconds after it is submitted (at once if cancelled); each request in
+    it fails with probability `error_ratio`, the rest succeed with `text`.
+    """
+
+    def __init__(self, provider: str, seed: int = 0, **behaviour):
+        self.provider = provider
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.files = {}
+        self.batches = {}
+        self.configure(**behaviour)
+
+    def configure(self, latency: float = 1.0, error_ratio: float = 0.0, text: str = STUB_REPORT):
+        """Set how the stub behaves from now on and zero its counters."""
+        self.latency = latency
+        self.error_ratio = error_ratio
+        self.text = text
+        self.submitted = 0
+        self.requests = 0
+        self.failed = 0
+        self.polls = 0
+        self.deleted = 0
+
+    def _submit(self, requests: list) -> dict:
+        batch = {"id": f"batch_{next(self.ids)}", "requests": requests, "at": time.monotonic(), "cancelled": False}
+        self.batches[batch["id"]] = batch
+        self.submitted += 1
+        self.requests += len(requests)
+        return batch
+
+    def _ended(self, batch: dict) -> bool:
+        return batch["cancelled"] or time.monotonic() - batch["at"] >= self.latency
+
+    def _answers(self, batch: dict):
+        """(custom_id, response body or None for a failed request) per request."""
+        if "answers" not in batch:
+            batch["answers"] = []
+            for custom_id, params in batch["requests"]:
+                failed = self.rng.random() < self.error_ratio
+                self.failed += failed
+                body = None if failed else response_body(self.provider, self.text, len(json.dumps(params)) // 4)
+                batch["answers"].append((custom_id, body))
+        return batch["answers"]
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        handler = self._anthropic if self.provider == "anthropic" else self._openai
+        await (await handler(request, request.method, request.url.path))(scope, receive, send)
+
+    async def _anthropic(self, request: Request, method: str, path: str) -> Response:
+        base = f"{request.url.scheme}://{request.url.netloc}/v1/messages/batches"
+        match = re.fullmatch(r"/v1/messages/batches(?:/([^/]+))?(?:/(cancel|results))?", path)
+        if match is None:
+            return JSONResponse({"error": {"type": "not_found_error"}}, status_code=404)
+        batch_id, action = match.groups()
+        if batch_id is None and method == "POST":
+            body = await request.json()
+            batch = self._submit([(r["custom_id"], r["params"]) for r in body["requests"]])
+            return JSONResponse({"id": batch["id"], "type": "message_batch", "processing_status": "in_progress"})
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return JSONResponse({"error": {"type": "not_found_error"}}, status_code=404)
+        if method == "DELETE":
+            self.deleted += 1
+            del self.batches[batch_id]
+            return JSONResponse({"id": batch_id, "type": "message_batch_deleted"})
+        if action == "cancel":
+            batch["cancelled"] = True
+            return JSONResponse({"id": batch_id, "processing_status": "canceling"})
+        if action == "results":
+            lines = [
+                {"custom_id": custom_id, "result": {"type": "succeeded", "message": body}} if body else
+                {"custom_id": custom_id, "result": {"type": "errored", "error": {"type": "api_error"}}}
+                for custom_id, body in self._answers(batch)
+            ]
+            return PlainTextResponse("\n".join(json.dumps(line) for line in lines))
+        self.polls += 1
+        ended = self._ended(batch)
+        return JSONResponse({
+            "id": batch_id,
+            "processing_status": "ended" if ended else "in_progress",
+            "results_url": f"{base}/{batch_id}/results" if ended else None,
+        })
+
+    async def _openai(self, request: Request, method: str, path: str) -> Response:
+        parts = path.strip("/").split("/")[1:]  # drop "v1"
+        if parts == ["files"] and method == "POST":
+            form = await request.form()
+            lines = (await form["file"].read()).decode("utf-8").splitlines()
+            file_id = f"file-{next(self.ids)}"
+            self.files[file_id] = [json.loads(line) for line in lines if line.strip()]
+            return JSONResponse({"id": file_id, "object": "file", "purpose": form["purpose"]})
+        if parts[:1] == ["files"] and len(parts) >= 2 and parts[1] in self.files:
+            if method == "DELETE":
+                self.deleted += 1
+                del self.files[parts[1]]
+                return JSONResponse({"id": parts[1], "object": "file", "deleted": True})
+            return PlainTextResponse("\n".join(json.dumps(line) for line in self.files[parts[1]]))
+        if parts == ["batches"] and method == "POST":
+            body = await request.json()
+            lines = self.files[body["input_file_id"]]
+            batch = self._submit([(line["custom_id"], line["body"]) for line in lines])
+            return JSONResponse({"id": batch["id"], "object": "batch", "status": "validating"})
+        batch = self.batches.get(parts[1]) if parts[:1] == ["batches"] and len(parts) >= 2 else None
+        if batch is None:
+            return JSONResponse({"error": {"message": "not found"}}, status_code=404)
+        if parts[2:] == ["cancel"]:
+            batch["cancelled"] = True
+            return JSONResponse({"id": batch["id"], "object": "batch", "status": "cancelling"})
+        self.polls += 1
+        if not self._ended(batch):
+            return JSONResponse({"id": batch["id"], "object": "batch", "status": "in_progress"})
+        if "output_file_id" not in batch:
+            batch["output_file_id"] = f"file-{next(self.ids)}"
+            self.files[batch["output_file_id"]] = [
+                {"custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None} if body else
+                {"custom_id": custom_id, "response": {"status_code": 500, "body": {"error": {"message": "stub"}}},
+                 "error": None}
+                for custom_id, body in self._answers(batch)
+            ]
+        return JSONResponse({
+            "id": batch["id"], "object": "batch", "status": "cancelled" if batch["cancelled"] else "completed",
+            "output_file_id": batch["output_file_id"],
+        })
+
+
+def serve(app) -> tuple:
+    """Run an ASGI app on a free localhost port in a daemon thread; (server, base URL)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def point_router_at(provider: str, base_url: str):
+    if provider == "anthropic":
+        model_router.ANTHROPIC = f"{base_url}/v1/messages"
+    elif provider == "openai":
+        model_router.OPENAI_CHAT = f"{base_url}/v1/chat/completions"
+    else:
+        model_router.GOOGLE = f"{base_url}/v1beta/models/{model_router.MODELS['gemini']}:generateContent"
+        model_router.GOOGLE_STREAM = f"{base_url}/v1beta/models/{model_router.MODELS['gemini']}:streamGenerateContent"
+
+
+def point_batches_at(provider: str, base_url: str):
+    from app.services import batch
+
+    if provider == "anthropic":
+        batch.ANTHROPIC_BATCHES = f"{base_url}/v1/messages/batches"
+    else:
+        batch.OPENAI_FILES = f"{base_url}/v1/files"
+        batch.OPENAI_BATCHES = f"{base_url}/v1/batches"
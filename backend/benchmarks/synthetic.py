@@ -0,0 +1,96 @@
+"""
+Synthetic auction legal packs for benchmarking.
+
+Packs are generated with ReportLab so they exercise the same pdfminer code
+paths as real packs, without shipping client documents in the repo.
+"""
+import random
+import zipfile
+from io import BytesIO
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+SECTIONS = [
+    ("SPECIAL CONDITIONS OF SALE", "The buyer to pay an administration fee of £1,500 plus VAT on exchange."),
+    ("LEASE", "The term of years granted is 99 years from 1 January 1985. Ground rent of £250 doubling every 25 years."),
+    ("OFFICE COPY ENTRY", "Title number AB123456. Proprietorship register: the registered proprietor is recorded below."),
+    ("TITLE PLAN", "This title plan shows the general position of the boundaries. Ordnance Survey map reference."),
+    ("REPLIES TO ENQUIRIES", "CPSE replies: the seller is not aware of any disputes with neighbours."),
+    ("LOCAL AUTHORITY SEARCH", "Drainage and water search. Environmental search reveals no contaminated land entries."),
+    ("ENERGY PERFORMANCE CERTIFICATE", "Energy performance rating D. Potential rating C."),
+    ("ADDENDUM", "Updated special conditions have been issued. Completion is 10 business days."),
+]
+
+FILLER = (
+    "The seller gives no warranty as to the accuracy of this information. "
+    "The buyer shall be deemed to have full knowledge of the contents of the documents. "
+    "Service charge balancing charges may be payable for prior years. "
+)
+
+
+def make_pdf(pages: int, seed: int = 0, lines_per_page: int = 40,
+             scanned_ratio: float = 0.0, blank_ratio: float = 0.0) -> bytes:
+    """
+    Return a PDF with `pages` pages of legal-pack style prose.
+
+    A `scanned_ratio` share of pages is drawn as shapes only (no text layer,
+    like an image scan) and a `blank_ratio` share is left empty. Output is
+    byte-for-byte the same for the same arguments.
+    """
+    rng = random.Random(seed)
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+    for n in range(pages):
+        kind = "text"
+        if scanned_ratio or blank_ratio:
+            roll = rng.random()
+            kind = "scanned" if roll < scanned_ratio else "blank" if roll < scanned_ratio + blank_ratio else "text"
+        if kind == "scanned":
+            _draw_scan(c, rng, width, height)
+        elif kind == "text":
+            heading, body = SECTIONS[(n // 5) % len(SECTIONS)]
+            c.setFont("Helvetica-Bold", 14)
+            c.drawString(50, height - 60, f"{heading} - page {n + 1}")
+            c.setFont("Helvetica", 9)
+            y = height - 90
+            for _ in range(lines_per_page):
+                text = body if rng.random() < 0.2 else FILLER
+                offset = rng.randrange(0, 40)
+                c.drawString(50, y, (text * 2)[offset:offset + 110])
+                y -= 16
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _draw_scan(c, rng: random.Random, width: float, height: float):
+    """Grey strokes where the lines of a scanned page would be."""
+    c.setFillGray(0.3)
+    y = height - 80
+    while y > 60:
+        c.rect(50, y, rng.uniform(200, width - 100), 6, stroke=0, fill=1)
+        y -= 16
+    c.setFillGray(0)
+
+
+def make_zip(pdfs: dict, layout: str = "flat") -> bytes:
+    """
+    ZIP the {name: pdf bytes} documents. `layout` "nested" spreads them over
+    sub-folders and adds non-PDF members, as agents' packs often do.
+    """
+    def member(path: str) -> zipfile.ZipInfo:
+        # Fixed timestamps keep the archive reproducible
+        info = zipfile.ZipInfo(path, date_time=(2026, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for i, (name, pdf) in enumerate(pdfs.items()):
+            path = f"pack/{['title', 'lease', 'searches'][i % 3]}/{name}" if layout == "nested" else name
+            zf.writestr(member(path), pdf)
+        if layout == "nested":
+            zf.writestr(member("pack/README.txt"), "Legal pack index\n")
+            zf.writestr(member("pack/photo.jpg"), b"\xff\xd8" + b"\0" * 4096)
+    return buffer.getvalue()
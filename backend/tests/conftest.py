@@ -0,0 +1,204 @@
+"""
+Shared fixtures. Run from the backend/ directory:
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+
+Tests that need Postgres (ROLLUP, FILTER, SKIP LOCKED) use
+TEST_DATABASE_URL and are skipped without it; every table is created
+before and dropped after each such test, so point it at a scratch database.
+"""
+import asyncio
+import os
+
+# Before anything imports app.config: no caches or real providers in tests
+os.environ.update({
+    "EXTRACT_CACHE_BACKEND": "off",
+    "RESPONSE_CACHE_BACKEND": "off",
+    "REPORT_CACHE_BACKEND": "off",
+    "USE_TEXTRACT": "false",
+    "RAG_BACKEND": "flat",
+    "RAG_EMBEDDER": "hashing",
+    "ANTHROPIC_API_KEY": "test",
+    "OPENAI_API_KEY": "test",
+    "GOOGLE_API_KEY": "",
+})
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+import app.models.extraction_cache  # noqa: F401  (registers the tables)
+import app.models.job  # noqa: F401
+import app.models.response_cache  # noqa: F401
+from app.config import settings
+from app.database import _async_url
+from app.models.analysis import Base
+
+
+@pytest.fixture
+def database_url() -> str:
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return url
+
+
+@pytest.fixture
+def sync_db(database_url):
+    """A sync Session on freshly created tables."""
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        yield db
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def run_with_db(database_url):
+    """
+    run_with_db(fn) runs `await fn(session)` in a new event loop, with an
+    AsyncSession on freshly created tables, and returns its result.
+    """
+    def run(fn):
+        async def main():
+            engine = create_async_engine(_async_url(database_url))
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.drop_all)
+                    await conn.run_sync(Base.metadata.create_all)
+                async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                    return await fn(db)
+            finally:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.drop_all)
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def override_settings():
+    """override_settings(NAME=value, ...) for the rest of the test."""
+    saved = {}
+
+    def override(**values):
+        for key, value in values.items():
+            saved.setdefault(key, getattr(settings, key))
+            setattr(settings, key, value)
+
+    yield override
+    for key, value in saved.items():
+        setattr(settings, key, value)
+
+
+@pytest.fixture(scope="session")
+def _stub_servers():
+    from benchmarks.stub_llm import StubProvider, serve
+
+    served = {}
+    for seed, provider in enumerate(("anthropic", "openai", "gemini")):
+        stub = StubProvider(provider, seed=seed)
+        server, url = serve(stub)
+        served[provider] = (stub, url, server)
+    yield served
+    for _, _, server in served.values():
+        server.should_exit = True
+
+
+@pytest.fixture
+def stub_providers(_stub_servers, monkeypatch):
+    """
+    {provider: StubProvider}, each answering like that provider's API,
+    reset to its default behaviour and reseeded, with the router pointed at them and
+    its record cleared.
+    """
+    from app.services import model_router
+    from app.services.routing import router
+    from benchmarks.stub_llm import point_router_at
+
+    for name in ("ANTHROPIC", "OPENAI_CHAT", "GOOGLE", "GOOGLE_STREAM"):
+        monkeypatch.setattr(model_router, name, getattr(model_router, name))
+    stubs = {}
+    for seed, (provider, (stub, url, _)) in enumerate(_stub_servers.items()):
+        stub.rng.seed(seed)
+        stub.configure(latency=0.01)
+        point_router_at(provider, url)
+        stubs[provider] = stub
+    router.reset()
+    yield stubs
+    router.reset()
+
+
+@pytest.fixture
+def run_async(monkeypatch):
+    """
+    run_async(coro) runs it in a new event loop, closing the provider
+    clients it opened. Ingest's worker-wide limits are made afresh, as
+    asyncio primitives stay bound to the first loop that waits on them.
+    """
+    from app.services import ingest
+    from app.services.http_clients import provider_clients
+
+    monkeypatch.setattr(ingest, "_pack_slots", asyncio.Semaphore(settings.INGEST_MAX_PACKS_PER_WORKER))
+    monkeypatch.setattr(ingest, "_memory_budget", ingest._MemoryBudget(ingest._memory_budget.limit))
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await provider_clients.aclose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def _stub_batch_servers():
+    from benchmarks.stub_llm import StubBatchProvider, serve
+
+    served = {}
+    for seed, provider in enumerate(("anthropic", "openai")):
+        stub = StubBatchProvider(provider, seed=seed)
+        server, url = serve(stub)
+        served[provider] = (stub, url, server)
+    yield served
+    for _, _, server in served.values():
+        server.should_exit = True
+
+
+@pytest.fixture
+def stub_batches(_stub_batch_servers, monkeypatch, override_settings):
+    """
+    {provider: StubBatchProvider} answering like the Anthropic and OpenAI
+    batch APIs, reseeded, ending each batch after 50 ms and polled every
+    10 ms.
+    """
+    from app.services import batch
+    from benchmarks.stub_llm import point_batches_at
+
+    for name in ("ANTHROPIC_BATCHES", "OPENAI_FILES", "OPENAI_BATCHES"):
+        monkeypatch.setattr(batch, name, getattr(batch, name))
+    override_settings(BATCH_POLL_INTERVAL_SECONDS=0.01)
+    stubs = {}
+    for seed, (provider, (stub, url, _)) in enumerate(_stub_batch_servers.items()):
+        stub.rng.seed(seed)
+        stub.configure(latency=0.05)
+        point_batches_at(provider, url)
+        stubs[provider] = stub
+    return stubs
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _process_pool():
+    """Ingest and rendering start a process pool; stop it once the session is over."""
+    from app.services.pool import shutdown_process_pool
+
+    yield
+    shutdown_process_pool()
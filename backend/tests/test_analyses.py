@@ -0,0 +1,69 @@
+from datetime import datetime
+from app.models.analysis import Analysis
+from app.services.analyses import daily_stats
+
+
+def _analysis(day: int, **fields) -> Analysis:
+    values = dict(
+        created_at=datetime(2026, 3, day, 12), filename="pack.pdf", file_size_bytes=1024 * 1024,
+        anthropic_input_tokens=0, anthropic_output_tokens=0, openai_input_tokens=0, openai_output_tokens=0,
+        gemini_input_tokens=0, gemini_output_tokens=0, anthropic_cache_read_tokens=0,
+        anthropic_cache_write_tokens=0, openai_cache_read_tokens=0, gemini_cache_read_tokens=0,
+        anthropic_cost_usd=0, openai_cost_usd=0, gemini_cost_usd=0, saved_cost_usd=0, prompt_tokens_saved=0,
+    )
+    values.update(fields)
+    return Analysis(**values)
+
+
+def test_daily_stats_totals_per_day_and_cost_per_page(run_with_db):
+    async def scenario(db):
+        db.add_all([
+            _analysis(1, page_count=40, anthropic_input_tokens=1000, anthropic_output_tokens=200,
+                      anthropic_cache_write_tokens=2000, anthropic_cost_usd=0.4, total_cost_usd=0.4,
+                      prompt_tokens_saved=300),
+            _analysis(1, page_count=10, cache_hit=True, total_cost_usd=0, saved_cost_usd=0.4),
+            _analysis(2, page_count=100, gemini_input_tokens=5000, gemini_output_tokens=500,
+                      gemini_cost_usd=1.0, total_cost_usd=1.0, gemini_model="gemini-1.5-pro"),
+            # Saved before page counts were recorded: in the cost, not in cost per page
+            _analysis(2, page_count=None, openai_cost_usd=0.3, total_cost_usd=0.3),
+        ])
+        await db.commit()
+        return await daily_stats(db)
+
+    stats = run_with_db(scenario)
+
+    assert [d["day"] for d in stats["days"]] == ["2026-03-01", "2026-03-02"]
+    first, second = stats["days"]
+    assert first["analyses"] == 2 and first["cache_hits"] == 1
+    assert first["total_cost_usd"] == 0.4
+    assert first["saved_cost_usd"] == 0.4
+    assert first["prompt_tokens_saved"] == 300
+    assert first["cost_per_page_usd"] == round(0.4 / 50, 4)
+    assert second["cost_per_page_usd"] == 0.01
+
+    totals = stats["totals"]
+    assert totals["analyses"] == 4
+    assert totals["pages"] == 150
+    assert totals["total_cost_usd"] == 1.7
+    assert totals["saved_cost_usd"] == 0.4
+    assert totals["prompt_tokens_saved"] == 300
+    assert totals["cost_per_page_usd"] == round(1.4 / 150, 4)
+    providers = totals["providers"]
+    assert providers["anthropic"]["input_tokens"] == 1000
+    assert providers["anthropic"]["cost_per_page_usd"] == 0.01
+    assert providers["anthropic"]["cache_write_tokens"] == 2000
+    # Only Anthropic records cache writes
+    assert "cache_write_tokens" not in providers["openai"] and "cache_write_tokens" not in providers["gemini"]
+    assert providers["gemini"]["cost_usd"] == 1.0
+    assert providers["gemini"]["cost_per_page_usd"] == 0.01
+    assert providers["openai"]["cost_usd"] == 0.3
+    # OpenAI's only analysis has no page count
+    assert providers["openai"]["cost_per_page_usd"] is None
+
+
+def test_daily_stats_with_no_analyses(run_with_db):
+    stats = run_with_db(daily_stats)
+    assert stats["days"] == []
+    assert stats["totals"]["analyses"] == 0
+    assert stats["totals"]["total_cost_usd"] == 0
+    assert stats["totals"]["cost_per_page_usd"] is None
@@ -0,0 +1,98 @@
+import pytest
+from app.services import response_cache
+from app.services.batch import analyze_batch
+from app.utils.cost_calculator import PROVIDERS, TOKEN_FIELDS
+from app.utils.pricing import call_cost
+from benchmarks.synthetic import make_pdf
+
+
+@pytest.fixture
+def packs(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"lot_{i + 1}.pdf"
+        path.write_bytes(make_pdf(3, seed=i))
+        paths.append(str(path))
+    return paths
+
+
+def _price(usage: dict, batch: bool) -> float:
+    return sum(
+        call_cost(p, usage[f"{p}_model"], *(usage[f"{p}_{field}"] for field in TOKEN_FIELDS), batch=batch)
+        for p in PROVIDERS if usage.get(f"{p}_model")
+    )
+
+
+def test_single_call_packs_go_through_the_batch_api(packs, stub_batches, stub_providers, run_async):
+    outcomes = run_async(analyze_batch(packs, save=False))
+
+    assert [o["path"] for o in outcomes] == packs
+    assert [o["route"] for o in outcomes] == ["batch"] * 4
+    assert not any(o["error"] for o in outcomes)
+    assert (stub_batches["anthropic"].submitted, stub_batches["anthropic"].requests) == (1, 4)
+    assert stub_batches["anthropic"].deleted == 1
+    assert sum(stub.requests for stub in stub_providers.values()) == 0
+
+
+def test_batches_on_the_first_provider_with_a_batch_api(packs, stub_batches, stub_providers, run_async,
+                                                        override_settings):
+    override_settings(ANTHROPIC_API_KEY=None, BATCH_MAX_REQUESTS=3)
+
+    outcomes = run_async(analyze_batch(packs, save=False))
+
+    assert [o["route"] for o in outcomes] == ["batch"] * 4
+    assert all(o["usage"]["provider"] == "openai" for o in outcomes)
+    assert stub_batches["anthropic"].submitted == 0
+    assert (stub_batches["openai"].submitted, stub_batches["openai"].requests) == (2, 4)
+
+
+def test_map_reduce_packs_and_packs_without_a_batch_provider_run_interactively(
+        packs, stub_batches, stub_providers, run_async, override_settings):
+    override_settings(ANALYSIS_MODE="map_reduce")
+    outcomes = run_async(analyze_batch(packs[:2], save=False))
+    assert [o["route"] for o in outcomes] == ["interactive"] * 2
+    assert stub_providers["anthropic"].requests > 0
+
+    override_settings(ANALYSIS_MODE="single", ANTHROPIC_API_KEY=None, OPENAI_API_KEY=None, GOOGLE_API_KEY="test")
+    outcomes = run_async(analyze_batch(packs[2:], save=False))
+    assert [o["route"] for o in outcomes] == ["interactive"] * 2
+    assert stub_providers["gemini"].requests == 2
+    assert stub_batches["anthropic"].submitted == stub_batches["openai"].submitted == 0
+
+
+def test_failed_batch_requests_fall_back_to_interactive(packs, stub_batches, stub_providers, run_async):
+    stub_batches["anthropic"].configure(latency=0.05, error_ratio=0.5)
+
+    outcomes = run_async(analyze_batch(packs, save=False))
+
+    failed = stub_batches["anthropic"].failed
+    assert 0 < failed < 4
+    assert [o["route"] for o in outcomes].count("interactive") == failed
+    assert stub_providers["anthropic"].requests == failed
+    assert not any(o["error"] for o in outcomes)
+
+
+def test_batch_answers_are_priced_at_batch_rates(packs, stub_batches, stub_providers, run_async):
+    stub_batches["anthropic"].configure(latency=0.05, error_ratio=0.5)
+
+    outcomes = run_async(analyze_batch(packs, save=False))
+
+    for outcome in outcomes:
+        batched = outcome["route"] == "batch"
+        assert outcome["cost_usd"] == pytest.approx(_price(outcome["usage"], batch=batched), abs=1e-6)
+        if batched:
+            assert outcome["cost_usd"] < _price(outcome["usage"], batch=False)
+    assert {o["route"] for o in outcomes} == {"batch", "interactive"}
+
+
+def test_lots_analysed_before_come_from_the_response_cache(packs, stub_batches, stub_providers, run_async,
+                                                          override_settings, tmp_path, monkeypatch):
+    override_settings(RESPONSE_CACHE_BACKEND="disk", RESPONSE_CACHE_DIR=str(tmp_path / "responses"))
+    monkeypatch.setattr(response_cache, "_cache", None)
+    run_async(analyze_batch(packs[:2], save=False))
+
+    outcomes = run_async(analyze_batch(packs, save=False))
+
+    assert [o["route"] for o in outcomes] == ["cache", "cache", "batch", "batch"]
+    assert [o["cost_usd"] for o in outcomes[:2]] == [0, 0]
+    assert stub_batches["anthropic"].requests == 2 + 2
@@ -0,0 +1,94 @@
+import pytest
+from app.services.chunker import chunk_documents
+from app.utils.tokens import estimate_tokens
+
+
+def _doc(page: int, text: str, type_: str = "Lease", source: str = "pack.pdf") -> dict:
+    return {"page": page, "text": text, "type": type_, "source": source}
+
+
+def _clauses(count: int, words: int = 12) -> str:
+    return " ".join(f"Clause {n} " + " ".join(["covenant"] * words) + "." for n in range(count))
+
+
+def _paragraphs(count: int, words: int = 12) -> str:
+    return "\n\n".join(f"Paragraph {n} " + " ".join(["easement"] * words) for n in range(count))
+
+
+@pytest.mark.parametrize("text", [_paragraphs(20), _clauses(40)])
+def test_offsets_map_back_to_the_page_and_cover_it_once(text):
+    chunks = list(chunk_documents([_doc(4, text)], max_tokens=100, overlap_tokens=0))
+
+    assert len(chunks) > 2
+    last = 0
+    for chunk in chunks:
+        meta = chunk["meta"]
+        assert chunk["content"] == text[meta["char_start"]:meta["char_end"]]
+        assert (meta["page"], meta["page_end"], meta["source"], meta["doc_type"]) == (4, 4, "pack.pdf", "Lease")
+        assert meta["tokens"] <= 100
+        # Nothing dropped or repeated between windows, only the separators skipped
+        assert meta["char_start"] >= last
+        assert not text[last:meta["char_start"]].strip()
+        last = meta["char_end"]
+    assert not text[last:].strip()
+
+
+def test_windows_repeat_the_trailing_clauses_within_the_overlap():
+    text = _clauses(40)
+
+    chunks = list(chunk_documents([_doc(1, text)], max_tokens=100, overlap_tokens=40))
+
+    for prev, nxt in zip(chunks, chunks[1:]):
+        prev_meta, next_meta = prev["meta"], nxt["meta"]
+        assert prev_meta["char_start"] < next_meta["char_start"] < prev_meta["char_end"] <= next_meta["char_end"]
+        repeated = text[next_meta["char_start"]:prev_meta["char_end"]]
+        assert prev["content"].endswith(repeated)
+        assert nxt["content"].startswith(repeated)
+        assert 0 < estimate_tokens(repeated) <= 40
+        # Whole clauses are repeated
+        assert repeated.startswith("Clause ") and repeated.endswith(".")
+
+
+def test_short_pages_of_one_type_and_source_are_merged(override_settings):
+    override_settings(CHUNK_MIN_PAGE_TOKENS=150)
+    short = ["Title number AB123.", "Proprietorship register.", "Charges register."]
+    docs = [_doc(n + 1, text, "Office Copy Entry") for n, text in enumerate(short)]
+    docs += [_doc(4, "Special conditions apply.", "Special Conditions"),
+             _doc(5, "Special conditions continue.", "Special Conditions", source="other.pdf")]
+
+    chunks = list(chunk_documents(docs, max_tokens=500, overlap_tokens=50))
+
+    assert [c["content"] for c in chunks] == ["\n\n".join(short), docs[3]["text"], docs[4]["text"]]
+    meta = chunks[0]["meta"]
+    assert (meta["page"], meta["page_end"], meta["char_start"], meta["char_end"]) == (1, 3, 0, len(short[-1]))
+    assert meta["tokens"] == sum(estimate_tokens(text) for text in short)
+    assert [c["meta"]["source"] for c in chunks] == ["pack.pdf", "pack.pdf", "other.pdf"]
+
+
+def test_a_page_past_the_minimum_is_not_merged_into(override_settings):
+    override_settings(CHUNK_MIN_PAGE_TOKENS=10)
+    docs = [_doc(1, _paragraphs(2)), _doc(2, "Schedule of dilapidations.")]
+
+    chunks = list(chunk_documents(docs, max_tokens=500, overlap_tokens=0))
+
+    assert [(c["meta"]["page"], c["meta"]["page_end"]) for c in chunks] == [(1, 1), (2, 2)]
+
+
+def test_long_paragraphs_fall_back_to_clauses_then_words():
+    clause = "Clause 1 " + " ".join(["covenant"] * 8) + "."
+    long_clause = " ".join(["restrictive"] * 100)
+    text = f"{clause}\n\n{clause} {long_clause}\n\n{'x' * 500}"
+
+    chunks = list(chunk_documents([_doc(1, text)], max_tokens=30, overlap_tokens=0))
+
+    assert all(c["meta"]["tokens"] <= 30 for c in chunks)
+    # The short paragraph, then the clause split off the long paragraph, kept whole
+    assert [c["content"] for c in chunks[:2]] == [clause, clause]
+    # The long clause is cut between words, the unbroken run at the budget
+    words = [c["content"].split(" ") for c in chunks[2:-5]]
+    assert sum(len(w) for w in words) == 100 and all(set(w) == {"restrictive"} for w in words)
+    assert [c["content"] for c in chunks[-5:]] == ["x" * 120] * 4 + ["x" * 20]
+
+
+def test_blank_pages_yield_nothing():
+    assert list(chunk_documents([_doc(1, ""), _doc(2, " \n\f "), {"page": 3, "text": None}])) == []
@@ -0,0 +1,59 @@
+import math
+import pytest
+from app.services.classify import DOC_TYPES, NEIGHBOUR_WEIGHT, classify_documents, score_pages
+
+LN2 = math.log(2)
+
+
+def _page(n: int, text: str, source: str) -> dict:
+    return {"page": n, "text": text, "source": source}
+
+
+PACK = [
+    _page(1, "SPECIAL CONDITIONS. The buyer to pay an administration fee.", "contract.pdf"),
+    _page(2, "Continued overleaf.", "contract.pdf"),
+    _page(3, "Continued overleaf.", "searches.pdf"),
+    _page(4, "Drainage. " * 5 + "The lease reserves a ground rent and a service charge.", "searches.pdf"),
+    _page(5, "Nothing to see here.", "plans.pdf"),
+]
+
+
+def test_representative_pages_are_pinned():
+    docs = classify_documents(PACK)
+
+    assert [d["type"] for d in docs] == ["Special Conditions", "Special Conditions", "Lease", "Lease", "Other"]
+    assert [(d["page"], d["source"]) for d in docs] == [(p["page"], p["source"]) for p in PACK]
+    assert docs[0]["scores"]["Special Conditions"] == 1.0
+    assert all(share == 0.0 for share in docs[4]["scores"].values())
+
+
+def test_label_scores_sum_log1p_of_each_keywords_hits():
+    scores = score_pages(PACK)
+    lease, searches = DOC_TYPES.index("Lease"), DOC_TYPES.index("Searches")
+
+    # Three keywords once each
+    assert scores[0, DOC_TYPES.index("Special Conditions")] == pytest.approx(3 * LN2)
+    # Five hits of one keyword score less than three distinct keywords
+    assert scores[3, searches] == pytest.approx(math.log(6))
+    assert scores[3, lease] == pytest.approx(3 * LN2)
+    assert scores[3, lease] > scores[3, searches]
+
+
+def test_smoothing_stays_within_a_source():
+    scores = score_pages(PACK)
+
+    # Page 2 borrows from page 1 (same PDF); page 3 from page 4 only
+    assert scores[1].sum() == pytest.approx(NEIGHBOUR_WEIGHT * 3 * LN2)
+    assert scores[2].sum() == pytest.approx(NEIGHBOUR_WEIGHT * (3 * LN2 + math.log(6)))
+    assert scores[4].sum() == 0.0
+
+
+def test_keywords_do_not_match_across_pages():
+    pages = [_page(1, "Schedule of special", "a.pdf"), _page(2, "conditions apply", "b.pdf")]
+
+    assert [d["type"] for d in classify_documents(pages)] == ["Other", "Other"]
+
+
+def test_empty_pack():
+    assert classify_documents([]) == []
+    assert score_pages([]).shape == (0, len(DOC_TYPES))
@@ -0,0 +1,46 @@
+import pytest
+from app.services import extract_cache
+from app.services.extract_cache import extract_with_cache
+
+PDF = b"%PDF-1.4 pack"
+
+
+@pytest.fixture(autouse=True)
+def disk_cache(tmp_path, override_settings, monkeypatch):
+    override_settings(EXTRACT_CACHE_BACKEND="disk", EXTRACT_CACHE_DIR=str(tmp_path))
+    monkeypatch.setattr(extract_cache, "_cache", None)
+
+
+class Extractor:
+    def __init__(self, *pages):
+        self.pages = pages
+        self.calls = 0
+
+    def __call__(self, pdf_content, filename: str = ""):
+        self.calls += 1
+        return [dict(p, page=n + 1, source=filename) for n, p in enumerate(self.pages)]
+
+
+def test_a_good_extraction_is_served_from_the_cache():
+    extract = Extractor({"text": "Title register"}, {"text": ""})
+
+    extract_with_cache(extract, PDF, "a.pdf")
+    pages, hit = extract_with_cache(extract, PDF, "b.pdf")
+
+    assert hit and extract.calls == 1
+    assert pages == [{"page": 1, "text": "Title register", "source": "b.pdf"},
+                     {"page": 2, "text": "", "source": "b.pdf"}]
+
+
+@pytest.mark.parametrize("pages", [
+    (),
+    ({"text": ""}, {"text": " \f"}),
+    ({"text": "Title register"}, {"text": "", "ocr_failed": True}),
+])
+def test_empty_or_partly_ocrd_extractions_are_not_cached(pages):
+    extract = Extractor(*pages)
+
+    extract_with_cache(extract, PDF)
+    _, hit = extract_with_cache(extract, PDF)
+
+    assert not hit and extract.calls == 2
@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from datetime import datetime, timedelta
+from app.models.job import AnalysisJob
+from app.services import jobs
+from app.services.jobs import claim_next_job, enqueue_job, heartbeat, run_job
+
+
+def _job(tmp_path, name: str, **fields) -> AnalysisJob:
+    upload = tmp_path / f"{name}.upload"
+    upload.write_bytes(b"%PDF")
+    values = dict(
+        status="queued", upload_sha256=name.ljust(64, "0"), upload_path=str(upload), filename=f"{name}.pdf",
+        file_size_bytes=4, attempts=0, max_attempts=3, run_after=datetime.utcnow() - timedelta(seconds=1),
+    )
+    values.update(fields)
+    return AnalysisJob(**values)
+
+
+def _stale(minutes: int = 31) -> datetime:
+    return datetime.utcnow() - timedelta(minutes=minutes)
+
+
+def test_claims_a_stale_running_job_again(sync_db, tmp_path):
+    sync_db.add(_job(tmp_path, "a", status="running", attempts=1, locked_at=_stale(), locked_by="dead-worker"))
+    sync_db.commit()
+
+    job = claim_next_job(sync_db, "w2")
+
+    assert job.status == "running"
+    assert job.attempts == 2
+    assert job.locked_by == "w2"
+
+
+def test_fails_a_stale_job_on_its_last_attempt_and_claims_the_next(sync_db, tmp_path):
+    crashed = _job(tmp_path, "a", status="running", attempts=3, locked_at=_stale(), locked_by="dead-worker")
+    queued = _job(tmp_path, "b")
+    sync_db.add_all([crashed, queued])
+    sync_db.commit()
+
+    job = claim_next_job(sync_db, "w2")
+
+    assert job.id == queued.id
+    sync_db.refresh(crashed)
+    assert crashed.status == "failed"
+    assert crashed.attempts == 3
+    assert "dead-worker" in crashed.error
+    assert not (tmp_path / "a.upload").exists()
+
+
+def test_running_job_with_a_fresh_lock_is_left_alone(sync_db, tmp_path):
+    sync_db.add(_job(tmp_path, "a", status="running", attempts=1, locked_at=_stale(5), locked_by="w1"))
+    sync_db.commit()
+
+    assert claim_next_job(sync_db, "w2") is None
+
+
+def test_heartbeat_refreshes_the_lock_only_for_its_owner(sync_db, tmp_path):
+    job = _job(tmp_path, "a", status="running", attempts=1, locked_at=_stale(), locked_by="w1")
+    sync_db.add(job)
+    sync_db.commit()
+
+    assert heartbeat(sync_db, job)
+    sync_db.refresh(job)
+    assert job.locked_at > _stale(1)
+    assert claim_next_job(sync_db, "w2") is None
+
+    # Taken over by another worker: the first one's heartbeat must not steal it back
+    sync_db.query(AnalysisJob).filter_by(id=job.id).update({"locked_by": "w2"})
+    sync_db.commit()
+    assert not heartbeat(sync_db, SimpleNamespace(id=job.id, locked_by="w1"))
+
+
+def test_long_analysis_keeps_its_lock_fresh(sync_db, tmp_path, monkeypatch, override_settings):
+    override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+    sync_db.add(_job(tmp_path, "a"))
+    sync_db.commit()
+    job = claim_next_job(sync_db, "w1")
+    claimed_at = job.locked_at
+    seen = []
+
+    async def slow_analysis(spooled, emit=None):
+        for _ in range(4):
+            await asyncio.sleep(0.06)
+            sync_db.expire_all()
+            seen.append(sync_db.get(AnalysisJob, job.id).locked_at)
+        return {"analysis_id": None}
+
+    monkeypatch.setattr(jobs, "analyze_spooled", slow_analysis)
+    asyncio.run(run_job(sync_db, job))
+
+    assert job.status == "succeeded"
+    assert seen[-1] > claimed_at
+    assert len(set(seen)) > 1
+
+
+def _spool(tmp_path, name: str) -> dict:
+    path = tmp_path / f"{name}.spool"
+    path.write_bytes(b"%PDF")
+    return {"path": str(path), "size": 4, "sha256": "c" * 64, "filename": "pack.pdf"}
+
+
+def test_concurrent_uploads_of_one_file_share_a_job(run_with_db, tmp_path, override_settings):
+    override_settings(JOB_STORAGE_DIR=str(tmp_path / "jobs"))
+
+    async def scenario(db):
+        async with async_sessionmaker(db.bind, expire_on_commit=False)() as other:
+            return await asyncio.gather(
+                enqueue_job(db, _spool(tmp_path, "a")), enqueue_job(other, _spool(tmp_path, "b"))
+            )
+
+    (first, first_created), (second, second_created) = run_with_db(scenario)
+
+    assert first.id == second.id
+    assert sorted([first_created, second_created]) == [False, True]
+    assert len(list((tmp_path / "jobs").iterdir())) == 1
+
+
+def test_a_failed_job_does_not_block_a_new_one(run_with_db, tmp_path, override_settings):
+    override_settings(JOB_STORAGE_DIR=str(tmp_path / "jobs"))
+
+    async def scenario(db):
+        failed = _job(tmp_path, "a", status="failed", upload_sha256="c" * 64)
+        db.add(failed)
+        await db.commit()
+        job, created = await enqueue_job(db, _spool(tmp_path, "b"))
+        return failed, job, created
+
+    failed, job, created = run_with_db(scenario)
+
+    assert created and job.id != failed.id and job.status == "queued"
+
+
+def test_worker_processes_split_the_ingest_pool(monkeypatch, override_settings):
+    from app.services import pool
+
+    monkeypatch.setattr(pool, "_sharing", 1)
+    monkeypatch.setattr(pool.os, "cpu_count", lambda: 8)
+    override_settings(INGEST_PROCESSES=None)
+
+    pool.share_cpus(3)
+    assert pool.pool_size() == 2
+    pool.share_cpus(16)
+    assert pool.pool_size() == 1
+    override_settings(INGEST_PROCESSES=5)
+    assert pool.pool_size() == 5
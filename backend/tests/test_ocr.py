@@ -0,0 +1,102 @@
+import io
+import threading
+import time
+from pypdf import PdfReader, PdfWriter
+from app.services.ocr import ocr_fallback
+
+
+def _pdf(pages: int) -> bytes:
+    """Blank pages told apart by width: page n is 100 + n points wide."""
+    writer = PdfWriter()
+    for n in range(1, pages + 1):
+        writer.add_blank_page(width=100 + n, height=200)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class FakeTextract:
+    """detect_document_text that reads back which page it was sent, slowly."""
+
+    def __init__(self, fail_pages=(), delay: float = 0.02):
+        self.fail_pages = set(fail_pages)
+        self.delay = delay
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def detect_document_text(self, Document):
+        reader = PdfReader(io.BytesIO(Document["Bytes"]))
+        assert len(reader.pages) == 1
+        page = int(reader.pages[0].mediabox.width) - 100
+        with self._lock:
+            self.sent.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if page in self.fail_pages:
+                raise RuntimeError("ThrottlingException")
+            return {"Blocks": [
+                {"BlockType": "PAGE"},
+                {"BlockType": "LINE", "Text": f"Scanned page {page}"},
+                {"BlockType": "WORD", "Text": "Scanned"},
+                {"BlockType": "LINE", "Text": "Special conditions"},
+            ]}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _pages(texts) -> list:
+    return [{"page": i + 1, "text": text, "source": "pack.pdf"} for i, text in enumerate(texts)]
+
+
+def test_only_pages_without_text_are_sent_and_land_on_their_page():
+    pages = _pages(["Title register", "\f", "Searches", "", "  \n", "Lease"])
+    client = FakeTextract()
+
+    result = ocr_fallback(_pdf(6), pages, filename="pack.pdf", client=client)
+
+    assert result is pages
+    assert sorted(client.sent) == [2, 4, 5]
+    assert [p["text"] for p in pages] == [
+        "Title register",
+        "Scanned page 2\nSpecial conditions",
+        "Searches",
+        "Scanned page 4\nSpecial conditions",
+        "Scanned page 5\nSpecial conditions",
+        "Lease",
+    ]
+
+
+def test_a_page_textract_fails_on_keeps_its_empty_text():
+    pages = _pages(["", "", "Searches", ""])
+
+    ocr_fallback(_pdf(4), pages, client=FakeTextract(fail_pages={2}))
+
+    assert [p["text"] for p in pages] == ["Scanned page 1\nSpecial conditions", "", "Searches",
+                                          "Scanned page 4\nSpecial conditions"]
+    assert [bool(p.get("ocr_failed")) for p in pages] == [False, True, False, False]
+
+
+def test_requests_stay_within_textract_concurrency(override_settings):
+    override_settings(TEXTRACT_CONCURRENCY=3)
+    pages = _pages([""] * 12)
+    client = FakeTextract(delay=0.05)
+
+    ocr_fallback(_pdf(12), pages, client=client)
+
+    assert sorted(client.sent) == list(range(1, 13))
+    assert client.max_in_flight == 3
+
+
+def test_nothing_is_sent_when_every_page_has_text():
+    pages = _pages(["Title register", "Searches"])
+    client = FakeTextract()
+
+    ocr_fallback(_pdf(2), pages, client=client)
+
+    assert client.sent == []
+    assert [p["text"] for p in pages] == ["Title register", "Searches"]
@@ -0,0 +1,95 @@
+import pytest
+from pydantic import ValidationError
+from app.config import Settings
+from app.services.map_reduce import needs_map_reduce
+from app.services.prompts import PromptBudgetError, build_prompt, check_prompt_budget
+from app.services.rag import KNOWLEDGE_BASE
+
+
+def _chunk(doc_type: str, page: int, words: int = 200) -> dict:
+    return {"content": " ".join(["clause"] * words), "meta": {"doc_type": doc_type, "page": page}}
+
+
+def _context(*chunks) -> dict:
+    return {"chunks": list(chunks), "kb": KNOWLEDGE_BASE}
+
+
+def _fixed(provider: str) -> int:
+    """Tokens of a prompt with no extracts: system prompt, knowledge base and framing."""
+    return build_prompt(_context(), provider)["stats"]["tokens"]
+
+
+def test_budget_trims_lowest_priority_extracts_first():
+    chunks = [_chunk("Searches", 1), _chunk("Special Conditions", 2), _chunk("EPC", 3), _chunk("Lease", 4)]
+    whole = build_prompt(_context(*chunks), "anthropic")["stats"]["tokens"]
+    per_chunk = (whole - _fixed("anthropic")) // 4
+
+    prompt = build_prompt(_context(*chunks), "anthropic", whole - per_chunk // 2)
+
+    assert prompt["stats"]["trimmed"] == 1
+    assert "[EPC, p.3]" not in prompt["user"]
+    assert prompt["stats"]["tokens"] <= whole - per_chunk // 2
+    assert prompt["stats"]["untrimmed_tokens"] >= whole
+
+
+@pytest.mark.parametrize("room", [-1000, 0, 10])
+def test_budget_with_no_room_for_an_extract_is_an_error(room):
+    budget = _fixed("anthropic") + room
+
+    with pytest.raises(PromptBudgetError):
+        build_prompt(_context(_chunk("Special Conditions", 1)), "anthropic", budget)
+
+
+def test_budget_is_not_an_error_for_a_pack_without_extracts():
+    prompt = build_prompt(_context(), "anthropic", 10)
+
+    assert prompt["stats"]["trimmed"] == 0
+
+
+def test_startup_check_rejects_a_budget_below_the_fixed_prefix(override_settings):
+    check_prompt_budget(KNOWLEDGE_BASE)
+
+    override_settings(PROMPT_TOKEN_BUDGET=_fixed("openai"))
+    with pytest.raises(PromptBudgetError):
+        check_prompt_budget(KNOWLEDGE_BASE)
+
+    override_settings(PROMPT_TOKEN_BUDGET=0)
+    check_prompt_budget(KNOWLEDGE_BASE)
+
+
+def test_budget_above_the_map_reduce_threshold_is_rejected_in_auto_mode():
+    assert Settings().PROMPT_TOKEN_BUDGET <= Settings().MAP_REDUCE_THRESHOLD_TOKENS
+    with pytest.raises(ValidationError, match="MAP_REDUCE_THRESHOLD_TOKENS"):
+        Settings(ANALYSIS_MODE="auto", MAP_REDUCE_THRESHOLD_TOKENS=150_000, PROMPT_TOKEN_BUDGET=180_000)
+
+    assert Settings(ANALYSIS_MODE="single", PROMPT_TOKEN_BUDGET=180_000).PROMPT_TOKEN_BUDGET == 180_000
+    assert Settings(ANALYSIS_MODE="auto", PROMPT_TOKEN_BUDGET=0).PROMPT_TOKEN_BUDGET == 0
+
+
+def test_pack_between_budget_and_threshold_is_trimmed_not_map_reduced(override_settings):
+    chunks = [_chunk("Special Conditions", 1), _chunk("Other", 2)]
+    whole = build_prompt(_context(*chunks), "anthropic")["stats"]["tokens"]
+    override_settings(ANALYSIS_MODE="auto", MAP_REDUCE_THRESHOLD_TOKENS=whole + 1)
+
+    prompt = build_prompt(_context(*chunks), "anthropic", whole - 10)
+
+    assert prompt["stats"]["trimmed"] == 1
+    assert not needs_map_reduce(prompt)
+
+
+def test_savings_count_trimmed_extracts_as_sent_when_map_reduced(override_settings):
+    from app.services.prompts import assemble_prompt
+
+    chunks = [_chunk("Special Conditions", 1), {"content": "Knotweed in the garden. " * 40,
+                                                "meta": {"doc_type": "Other", "page": 2}}]
+    whole = build_prompt(_context(*chunks), "anthropic")["stats"]["tokens"]
+    override_settings(PROMPT_TOKEN_BUDGET=whole - 10)
+
+    override_settings(ANALYSIS_MODE="single")
+    _, single = assemble_prompt(_context(*chunks), "anthropic")
+    override_settings(ANALYSIS_MODE="map_reduce")
+    _, mapped = assemble_prompt(_context(*chunks), "anthropic")
+
+    assert single["stats"]["trimmed"] == mapped["stats"]["trimmed"] == 1
+    assert single["stats"]["tokens_saved"] > 0
+    assert mapped["stats"]["tokens_saved"] == single["stats"]["tokens_saved"] - single["stats"]["trimmed_tokens"]
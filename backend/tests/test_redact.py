@@ -0,0 +1,66 @@
+import pytest
+from app.services.redact import redact_chunks, redact_sensitive, redact_text
+from benchmarks.bench_redact import legacy_redact, make_chunks
+
+# Edge cases where pass order matters, matches overlap or sit next to each
+# other, and text that is not plain ASCII, with what the legacy four-pass
+# redaction makes of them
+GOLDEN = [
+    ("", ""),
+    ("No personal data here at all.", "No personal data here at all."),
+    ("NI number AB123456C and ab123456d in lower case.",
+     "NI number [REDACTED_NI] and [REDACTED_NI] in lower case."),
+    ("Account 12345678, sort code 12-34-56.", "Account [REDACTED_ACCT], sort code 12-34-56."),
+    ("Contact john.smith@example.co.uk or (jane@firm.com).", "Contact [REDACTED_EMAIL] or ([REDACTED_EMAIL])."),
+    ("Call +447700900123 or 02079460000 today.", "Call +[REDACTED_PHONE] or [REDACTED_PHONE] today."),
+    # Overlapping patterns: an earlier pass takes its part, later ones the rest
+    ("a.12345678@x.com", "a.[REDACTED_ACCT]@x.com"),
+    ("AB123456C@x.com", "[REDACTED_NI]@x.com"),
+    ("12345678@example.com 123456789", "[REDACTED_ACCT]@example.com [REDACTED_PHONE]"),
+    ("x12345678@y.com", "[REDACTED_EMAIL]"),
+    ("Ref QQ123456A-12345678-foo@bar.baz", "Ref QQ123456A-[REDACTED_ACCT][REDACTED_EMAIL]"),
+    ("NI: ab123456c12345678", "NI: ab123456c12345678"),
+    ("12345678-87654321", "[REDACTED_ACCT]-[REDACTED_ACCT]"),
+    # Emails right next to phone numbers
+    ("john12345678@x.com +1234567", "[REDACTED_EMAIL] +[REDACTED_PHONE]"),
+    ("Email jane@firm.com+447700900123 now", "Email [REDACTED_EMAIL]+[REDACTED_PHONE] now"),
+    ("jane@firm.com,02079460000", "[REDACTED_EMAIL],[REDACTED_PHONE]"),
+    ("tel:07700900123/jane@x.co", "tel:[REDACTED_PHONE]/[REDACTED_EMAIL]"),
+    # Whitespace other than spaces, and Unicode
+    ("tabs\tand\nnewlines 12345678\r\n user@host", "tabs\tand\nnewlines [REDACTED_ACCT]\r\n [REDACTED_EMAIL]"),
+    ("unicode café 12345678 naïve@exämple.fr", "unicode café [REDACTED_ACCT] [REDACTED_EMAIL]"),
+    ("Zoë Ångström zoë@exämple.fr", "Zoë Ångström [REDACTED_EMAIL]"),
+    ("full width ０１２３４５６７", "full width [REDACTED_ACCT]"),
+    ("١٢٣٤٥٦٧٨ arabic digits", "[REDACTED_ACCT] arabic digits"),
+    ("12345678\u00a012345678", "[REDACTED_ACCT]\u00a0[REDACTED_ACCT]"),
+    ("@@ @ x@ @y .-@-. 1234567.89", "@@ @ x@ @y [REDACTED_EMAIL] [REDACTED_PHONE].89"),
+]
+
+
+@pytest.mark.parametrize("text,expected", GOLDEN)
+def test_golden_cases_match_the_legacy_redaction(text, expected):
+    assert legacy_redact({"content": text})["content"] == expected
+    assert redact_text(text)[0] == expected
+    assert redact_sensitive({"content": text, "page": 3}) == {"content": expected, "page": 3}
+
+
+def test_generated_chunks_match_the_legacy_redaction():
+    chunks = make_chunks(500, seed=7)
+
+    safe_chunks, report = redact_chunks(chunks)
+
+    assert safe_chunks == [legacy_redact(chunk) for chunk in chunks]
+    assert sum(report["counts"].values()) == len(report["spans"]) > 0
+
+
+@pytest.mark.parametrize("text", [text for text, _ in GOLDEN])
+def test_spans_point_into_the_original_text(text):
+    redacted, spans = redact_text(text)
+
+    # Swapping each span for its placeholder rebuilds the redacted text
+    rebuilt, last = [], 0
+    for name, start, end in spans:
+        assert last <= start < end <= len(text)
+        rebuilt += [text[last:start], f"[REDACTED_{name}]"]
+        last = end
+    assert "".join(rebuilt) + text[last:] == redacted
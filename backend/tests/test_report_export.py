@@ -0,0 +1,78 @@
+import io
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import datetime
+from app.models.analysis import Analysis
+from app.services import report_export
+from app.services.report_export import count_exports, iter_exports, stream_export_zip
+
+
+def _analysis(day: int, address: str) -> Analysis:
+    return Analysis(
+        created_at=datetime(2026, 3, day, 12), filename="pack.pdf", file_size_bytes=1024,
+        property_address=address, summary_text=f"Report for {address}",
+    )
+
+
+def _use_session(monkeypatch, db):
+    @asynccontextmanager
+    async def session():
+        yield db
+
+    monkeypatch.setattr(report_export, "AsyncSessionLocal", session)
+
+
+async def _pdf(analysis_id, summary_text, property_address, created_at) -> bytes:
+    if property_address == "13 Broken Lane":
+        raise ValueError("cannot render")
+    return f"%PDF {analysis_id} {summary_text}".encode()
+
+
+def test_export_streams_every_matching_row_in_batches(run_with_db, monkeypatch, override_settings):
+    override_settings(EXPORT_BATCH_SIZE=3)
+    monkeypatch.setattr(report_export, "get_report_pdf", _pdf)
+    monkeypatch.setattr(report_export, "pool_size", lambda: 2)
+    queries = []
+
+    async def scenario(db):
+        db.add_all([_analysis(1 + i % 4, f"{i} High Street") for i in range(7)] + [_analysis(2, "13 Broken Lane")])
+        await db.commit()
+        _use_session(monkeypatch, db)
+        execute = db.execute
+
+        async def counting_execute(query, *args, **kwargs):
+            result = await execute(query, *args, **kwargs)
+            queries.append(query)
+            return result
+
+        monkeypatch.setattr(db, "execute", counting_execute)
+        return b"".join([chunk async for chunk in stream_export_zip(iter_exports(since=datetime(2026, 3, 1)))])
+
+    archive = zipfile.ZipFile(io.BytesIO(run_with_db(scenario)))
+
+    names = archive.namelist()
+    assert len(names) == 8
+    assert [int(name.split("_")[0]) for name in names[:-1]] == [1, 2, 3, 4, 5, 6, 7]
+    assert archive.read(names[0]) == b"%PDF 1 Report for 0 High Street"
+    assert archive.read("errors.txt").decode() == "8: ValueError: cannot render\n"
+    # 8 rows, 3 a query
+    assert len(queries) == 3
+
+
+def test_export_selects_by_ids_and_range(run_with_db, monkeypatch):
+    async def scenario(db):
+        db.add_all([_analysis(day, f"{day} Mill Road") for day in (1, 2, 3, 4)])
+        await db.commit()
+        _use_session(monkeypatch, db)
+        rows = [row async for row in iter_exports(ids=[1, 2, 3], since=datetime(2026, 3, 2))]
+        counts = (
+            await count_exports(db, ids=[1, 2, 3], since=datetime(2026, 3, 2)),
+            await count_exports(db, until=datetime(2026, 3, 4)),
+            await count_exports(db, ids=[99]),
+        )
+        return rows, counts
+
+    rows, counts = run_with_db(scenario)
+
+    assert [row.id for row in rows] == [2, 3]
+    assert counts == (2, 3, 0)
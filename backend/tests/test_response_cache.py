@@ -0,0 +1,91 @@
+import pytest
+from app.services import response_cache
+from app.services.model_router import MODELS
+from app.services.pipeline import run_model
+from app.services.routing import router
+
+PROMPT = {"system": "You review property packs.", "user": "Lot 12: title, searches and lease."}
+META = {"size": 40}
+
+
+@pytest.fixture
+def disk_cache(tmp_path, override_settings, monkeypatch):
+    override_settings(RESPONSE_CACHE_BACKEND="disk", RESPONSE_CACHE_DIR=str(tmp_path), ROUTER_MAX_RETRIES=0)
+    monkeypatch.setattr(response_cache, "_cache", None)
+    return response_cache.get_response_cache()
+
+
+def _entry(cache, provider: str) -> dict | None:
+    return cache.get(response_cache.response_key(provider, MODELS[provider], PROMPT["system"], PROMPT["user"]))
+
+
+def test_fallback_answer_is_cached_under_the_provider_that_wrote_it(disk_cache, stub_providers, run_async):
+    stub_providers["anthropic"].configure(error_status=500, error_ratio=1.0)
+    stub_providers["openai"].configure(latency=0.01, text="OpenAI's report")
+
+    result = run_async(run_model({}, PROMPT, META))
+
+    assert result["text"] == "OpenAI's report"
+    assert result["usage"]["provider"] == "openai"
+    assert _entry(disk_cache, "anthropic") is None
+    entry = _entry(disk_cache, "openai")
+    assert (entry["provider"], entry["model"], entry["report_text"]) == ("openai", MODELS["openai"], "OpenAI's report")
+
+
+def test_fallback_answer_is_not_served_as_the_preferred_providers(disk_cache, stub_providers, run_async):
+    stub_providers["anthropic"].configure(error_status=500, error_ratio=1.0)
+    run_async(run_model({}, PROMPT, META))
+
+    stub_providers["anthropic"].configure(latency=0.01, text="Anthropic's report")
+    result = run_async(run_model({}, PROMPT, META))
+
+    assert not result["cache_hit"]
+    assert result["text"] == "Anthropic's report"
+    assert stub_providers["anthropic"].requests == 1
+
+
+def test_lookup_does_not_depend_on_router_health(disk_cache, stub_providers, run_async, override_settings):
+    run_async(run_model({}, PROMPT, META))
+    assert _entry(disk_cache, "anthropic") is not None
+
+    # Anthropic's circuit opens: the router now sends new calls to OpenAI first
+    override_settings(ROUTER_BREAKER_FAILURES=1)
+    router.reset()
+    router.breaker("anthropic").failure()
+    assert router.order(["anthropic", "openai"]) == ["openai"]
+
+    result = run_async(run_model({}, PROMPT, META))
+
+    assert result["cache_hit"]
+    assert stub_providers["openai"].requests == 0
+
+
+def _pack(other_extract: str) -> tuple:
+    from app.services.prompts import assemble_prompt
+    from app.services.rag import KNOWLEDGE_BASE
+
+    chunks = [
+        {"content": "Buyer pays the seller's legal costs of £1,500 plus VAT. " * 20,
+         "meta": {"doc_type": "Special Conditions", "page": 3}},
+        {"content": other_extract, "meta": {"doc_type": "Other", "page": 9}},
+    ]
+    return assemble_prompt({"chunks": chunks, "kb": KNOWLEDGE_BASE}, "anthropic")
+
+
+def test_map_reduce_runs_are_keyed_on_every_extract_not_the_trimmed_prompt(
+        disk_cache, stub_providers, run_async, override_settings):
+    # Room for the special conditions only: "Other" is trimmed from the single-call prompt
+    _, probe = _pack("x")
+    override_settings(ANALYSIS_MODE="map_reduce", PROMPT_TOKEN_BUDGET=probe["stats"]["tokens"] - 1)
+    context_a, prompt_a = _pack("Boundary dispute with the neighbour at number 14. " * 20)
+    context_b, prompt_b = _pack("Japanese knotweed found in the rear garden. " * 20)
+    assert prompt_a["stats"]["trimmed"] == prompt_b["stats"]["trimmed"] == 1
+    assert prompt_a["user"] == prompt_b["user"]
+
+    run_async(run_model(context_a, prompt_a, META))
+    stub_providers["anthropic"].configure(latency=0.01, text="Report on the knotweed")
+    result = run_async(run_model(context_b, prompt_b, META))
+
+    assert not result["cache_hit"]
+    assert result["text"] == "Report on the knotweed"
+    assert run_async(run_model(context_a, prompt_a, META))["cache_hit"]
@@ -0,0 +1,76 @@
+import numpy as np
+from app.services import rag
+from app.services.rag import checklist_queries, select_evidence
+from app.services.retrieval import FlatIndex, HashingEmbedder, retrieve
+
+FILLER = [
+    f"Schedule {n}: the parties agree that clause {n} of the standard conditions applies without amendment."
+    for n in range(40)
+]
+RED_FLAGS = [
+    "The ground rent of £300 doubles every 25 years.",
+    "The chancel repair liability search revealed a potential liability.",
+    "The environmental search places the property in flood zone 3.",
+    "Overage: an uplift clause entitles the seller to 30% of any increase in value.",
+]
+
+
+def _chunks(texts) -> list:
+    return [{"content": text, "meta": {"page": n + 1}} for n, text in enumerate(texts)]
+
+
+def test_hashing_embedder_is_deterministic_and_normalised(run_async):
+    embedder = HashingEmbedder(256)
+
+    first = run_async(embedder.embed(["Ground rent doubling", "Flood zone 3", ""]))
+    second = run_async(embedder.embed(["Ground rent doubling"]))
+
+    assert first.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(first[:2], axis=1), 1.0)
+    assert not first[2].any()
+    assert np.array_equal(first[0], second[0])
+
+
+def test_flat_index_returns_the_nearest_in_score_order(run_async):
+    vectors = np.eye(4, dtype=np.float32)
+    queries = np.array([[0.1, 0.9, 0.3, 0.0], [1.0, 0.0, 0.0, 0.2]], dtype=np.float32)
+    index = FlatIndex()
+    run_async(index.add(vectors))
+
+    assert run_async(index.search(queries, 2)) == [[1, 2], [0, 3]]
+    assert run_async(index.search(queries[:1], 10)) == [[1, 2, 0, 3]]
+
+
+def test_empty_flat_index_finds_nothing(run_async):
+    assert run_async(FlatIndex().search(np.ones((2, 4), dtype=np.float32), 3)) == [[], []]
+
+
+def test_checklist_queries_retrieve_the_red_flag_chunks(run_async):
+    chunks = _chunks(FILLER[:20] + RED_FLAGS + FILLER[20:])
+
+    selected = run_async(retrieve(chunks, checklist_queries(), 2))
+
+    assert set(range(20, 24)) <= set(selected)
+    assert selected == sorted(selected) and len(selected) < len(chunks)
+
+
+def test_large_pack_keeps_only_retrieved_chunks(run_async, override_settings):
+    override_settings(RAG_BACKEND="flat", RAG_EMBEDDER="hashing", RAG_MIN_CHUNKS=10, RAG_TOP_K=2)
+    chunks = _chunks(FILLER[:20] + RED_FLAGS + FILLER[20:])
+
+    evidence = run_async(select_evidence(chunks))
+
+    assert all(any(chunk is c for c in evidence) for chunk in chunks[20:24])
+    assert len(evidence) < len(chunks)
+
+
+def test_small_pack_skips_retrieval(run_async, override_settings, monkeypatch):
+    override_settings(RAG_BACKEND="flat", RAG_MIN_CHUNKS=10)
+
+    async def no_retrieval(*args):
+        raise AssertionError("retrieval ran for a small pack")
+
+    monkeypatch.setattr(rag, "retrieve", no_retrieval)
+    chunks = _chunks(FILLER[:10]) + [{"content": "", "meta": {"page": 11}}]
+
+    assert run_async(select_evidence(chunks)) == chunks[:10]
@@ -0,0 +1,152 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.services.model_router import analyze_with_router, stream_with_router
+from app.services.routing import router
+from benchmarks.stub_llm import STUB_REPORT
+
+PROMPT = {"system": "You review property packs.", "user": "Lot 12: title, searches and lease."}
+META = {"size": 40}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(override_settings):
+    # Retries without a Retry-After hint go straight away
+    override_settings(ROUTER_RETRY_BASE_SECONDS=0.0)
+
+
+def _timed(run_async, coro) -> tuple:
+    start = time.perf_counter()
+    result = run_async(coro)
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.parametrize("hint", [{"retry_after": 0.3}, {"retry_after_ms": 300}])
+def test_retry_waits_for_the_providers_retry_after(stub_providers, run_async, hint):
+    stub_providers["anthropic"].configure(latency=0.01, error_status=429, fail_first=1, **hint)
+
+    (text, usage), elapsed = _timed(run_async, analyze_with_router(PROMPT, META))
+
+    assert usage["provider"] == "anthropic"
+    assert stub_providers["anthropic"].requests == 2
+    assert stub_providers["openai"].requests == 0
+    assert elapsed >= 0.3
+
+
+def test_retry_after_past_the_cap_moves_on_to_the_next_provider(stub_providers, run_async, override_settings):
+    override_settings(ROUTER_RETRY_MAX_SECONDS=1.0)
+    stub_providers["anthropic"].configure(latency=0.01, error_status=429, fail_first=1, retry_after=5)
+
+    (text, usage), elapsed = _timed(run_async, analyze_with_router(PROMPT, META))
+
+    assert usage["provider"] == "openai"
+    assert stub_providers["anthropic"].requests == 1
+    assert elapsed < 1.0
+
+
+def test_circuit_opens_half_opens_and_closes(stub_providers, run_async, override_settings):
+    override_settings(ROUTER_MAX_RETRIES=0, ROUTER_BREAKER_FAILURES=2, ROUTER_BREAKER_COOLDOWN_SECONDS=0.2)
+    router.reset()
+    anthropic = stub_providers["anthropic"]
+    anthropic.configure(latency=0.01, error_status=500, error_ratio=1.0)
+
+    for _ in range(2):
+        text, usage = run_async(analyze_with_router(PROMPT, META))
+        assert usage["provider"] == "openai"
+    assert router.breaker("anthropic").state == "open"
+
+    # Open: anthropic is skipped without a request
+    run_async(analyze_with_router(PROMPT, META))
+    assert anthropic.requests == 2
+
+    # Half-open: one probe, which fails and re-opens the circuit
+    time.sleep(0.2)
+    assert router.breaker("anthropic").state == "half_open"
+    text, usage = run_async(analyze_with_router(PROMPT, META))
+    assert usage["provider"] == "openai"
+    assert anthropic.requests == 3
+    assert router.breaker("anthropic").state == "open"
+
+    # Half-open again: a probe that succeeds closes it
+    time.sleep(0.2)
+    anthropic.configure(latency=0.01)
+    text, usage = run_async(analyze_with_router(PROMPT, META))
+    assert usage["provider"] == "anthropic"
+    assert router.breaker("anthropic").state == "closed"
+
+
+def test_hedge_loser_is_cancelled(stub_providers, run_async, override_settings):
+    override_settings(ROUTER_HEDGE_PERCENTILE=0.5, ROUTER_HEDGE_MIN_SECONDS=0.05, ROUTER_MIN_SAMPLES=1)
+    run_async(analyze_with_router(PROMPT, META))  # one fast anthropic call to hedge against
+    stub_providers["anthropic"].configure(latency=2.0)
+
+    async def hedged():
+        result = await analyze_with_router(PROMPT, META)
+        left = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        await asyncio.gather(*left, return_exceptions=True)
+        return result, left
+
+    ((text, usage), left), elapsed = _timed(run_async, hedged())
+
+    assert usage["provider"] == "openai"
+    assert stub_providers["anthropic"].requests == 1
+    # The slow anthropic attempt, cancelled rather than left to finish
+    assert len(left) == 1 and left[0].cancelled()
+    assert elapsed < 1.0
+    # The cancelled call counts as neither a success nor a failure
+    assert len(router.stats("anthropic").outcomes) == 1
+    assert router.breaker("anthropic").state == "closed"
+
+
+def test_stream_is_retried_before_the_first_token(stub_providers, run_async):
+    stub_providers["anthropic"].configure(latency=0.01, error_status=529, fail_first=1)
+    tokens = []
+
+    async def on_token(text):
+        tokens.append(text)
+
+    text, usage = run_async(stream_with_router(PROMPT, META, on_token))
+
+    assert text == "".join(tokens) == STUB_REPORT
+    assert usage["provider"] == "anthropic"
+    assert stub_providers["anthropic"].requests == 2
+
+
+def test_stream_is_not_retried_after_the_first_token(stub_providers, run_async):
+    stub_providers["anthropic"].configure(latency=0.01, drop_stream_after=3)
+    tokens = []
+
+    async def on_token(text):
+        tokens.append(text)
+
+    with pytest.raises(httpx.TransportError):
+        run_async(stream_with_router(PROMPT, META, on_token))
+
+    assert len(tokens) == 3
+    assert stub_providers["anthropic"].requests == 1
+    assert stub_providers["openai"].requests == 0
+
+
+def test_bad_request_does_not_count_against_the_provider(stub_providers, run_async, override_settings):
+    override_settings(ROUTER_BREAKER_FAILURES=1)
+    router.reset()
+    stub_providers["anthropic"].configure(latency=0.01, error_status=400, error_ratio=1.0)
+
+    text, usage = run_async(analyze_with_router(PROMPT, META))
+
+    assert usage["provider"] == "openai"
+    assert stub_providers["anthropic"].requests == 1
+    assert len(router.stats("anthropic").outcomes) == 0
+    assert router.breaker("anthropic").state == "closed"
+
+
+def test_rejected_credentials_count_against_the_provider(stub_providers, run_async, override_settings):
+    override_settings(ROUTER_BREAKER_FAILURES=1)
+    router.reset()
+    stub_providers["anthropic"].configure(latency=0.01, error_status=401, error_ratio=1.0)
+
+    run_async(analyze_with_router(PROMPT, META))
+
+    assert router.stats("anthropic").outcomes.count(False) == 1
+    assert router.breaker("anthropic").state == "open"
@@ -1,14 +1,45 @@
 import React, { useState } from 'react'
 
-async function uploadPack(file: File) {
+type StreamHandlers = {
+  onStage: (stage: string, status: string) => void
+  onToken: (text: string) => void
+}
+
+// POST /analyze/pack/stream and dispatch its Server-Sent Events
+async function uploadPackStream(file: File, handlers: StreamHandlers) {
   const fd = new FormData();
   fd.append('file', file);
-  const res = await fetch('/api/analyze/pack', {
+  const res = await fetch('/api/analyze/pack/stream', {
     method: 'POST',
     body: fd
   });
-  if (!res.ok) throw new Error(await res.text());
-  return await res.json();
+  if (!res.ok || !res.body) throw new Error(await res.text());
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: any = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+
+      if (event === 'stage') handlers.onStage(data.stage, data.status);
+      else if (event === 'token') handlers.onToken(data.text);
+      else if (event === 'result') result = data;
+      else if (event === 'error') throw new Error(data.detail);
+    }
+  }
+  if (!result) throw new Error('Analysis ended unexpectedly');
+  return result;
 }
 
 export default function App() {
@@ -17,20 +48,26 @@ export default function App() {
   const [report, setReport] = useState<string | null>(null)
   const [analysisId, setAnalysisId] = useState<number | null>(null)
   const [error, setError] = useState<string | null>(null)
+  const [stage, setStage] = useState<string | null>(null)
 
   const onSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
     if (!file) return
     setError(null)
     setLoading(true)
+    setReport(null)
+    setAnalysisId(null)
     try {
-      const data = await uploadPack(file)
-      setReport(data.report_markdown)
+      const data = await uploadPackStream(file, {
+        onStage: (name, status) => setStage(status === 'started' ? `${name}…` : `${name} ✓`),
+        onToken: text => setReport(prev => (prev || '') + text),
+      })
       setAnalysisId(data.analysis_id)
     } catch (err: any) {
       setError(err.message || 'Upload failed')
     } finally {
       setLoading(false)
+      setStage(null)
     }
   }
 
@@ -55,6 +92,8 @@ export default function App() {
         </button>
       </form>
       
+      {loading && stage && <p style={{ color: '#6c757d' }}>{stage}</p>}
+
       {error && <p style={{ color: 'red' }}>{error}</p>}
       
       {report && (
@@ -63,6 +102,7 @@ export default function App() {
             <h2 style={{ margin: 0 }}>Report</h2>
             <button 
               onClick={downloadPDF}
+              disabled={!analysisId}
               style={{
                 padding: '12px 24px',
                 background: '#2c3e50',